@@ -0,0 +1,126 @@
+"""Batch parsing of network requests across a process pool.
+
+Parses large backlogs of request strings (for example historical ticket descriptions) with the
+offline parser, in chunks, and streams one result per request back in input order. Failures are
+reported per item instead of aborting the batch.
+
+Usage:
+    python BatchParser.py requests.txt --output topologies.jsonl --workers 8
+"""
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from NetworkParser import parse_network_text
+
+def _parse_chunk(chunk):
+    """Worker: parse a list of (index, text) pairs, capturing errors per item.
+
+    The parser reports requests it can't understand as {'error': ...}; those become item errors too.
+    """
+    results = []
+    for index, text in chunk:
+        try:
+            result = parse_network_text(text)
+        except Exception as e:
+            results.append({"index": index, "request": text, "error": f"{type(e).__name__}: {e}"})
+            continue
+        if "error" in result:
+            results.append({"index": index, "request": text, "error": result["error"]})
+        else:
+            results.append({"index": index, "request": text, "result": result})
+    return results
+
+def _chunks(requests, chunksize):
+    iterator = enumerate(requests)
+    while True:
+        chunk = list(islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+def parse_requests(requests, workers=None, chunksize=64, max_pending=None):
+    """Parse many requests and yield the results in input order.
+
+    The input is consumed lazily, so arbitrarily long iterables (or open files) can be streamed;
+    at most `max_pending` chunks are in flight at any time.
+
+    Args:
+        requests: Iterable of request strings
+        workers: Worker processes (default: CPU count); 0 or 1 parses in this process
+        chunksize: Requests sent to a worker per task
+        max_pending: Chunks queued ahead of the consumer (default: 2 per worker)
+
+    Yields:
+        {'index', 'request', 'result'} per request, or {'index', 'request', 'error'} if parsing failed
+        (the parser raised or did not understand the request)
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for chunk in _chunks(requests, chunksize):
+            yield from _parse_chunk(chunk)
+        return
+
+    max_pending = max_pending or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in _chunks(requests, chunksize):
+            pending.append(pool.submit(_parse_chunk, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def parse_request_file(path, workers=None, chunksize=64, max_pending=None):
+    """Parse a file with one request per line (blank lines and '#' comments are skipped).
+
+    Args:
+        path: Text file of requests
+        workers, chunksize, max_pending: See parse_requests
+
+    Yields:
+        Same items as parse_requests; 'index' counts requests, not file lines
+    """
+    with open(path, "r") as f:
+        lines = (line.strip() for line in f)
+        yield from parse_requests(
+            (line for line in lines if line and not line.startswith("#")),
+            workers=workers, chunksize=chunksize, max_pending=max_pending
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Text file with one request per line ('-' for stdin)")
+    parser.add_argument("--output", help="JSONL file to write (default: stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=64)
+    args = parser.parse_args()
+
+    if args.input == "-":
+        lines = (line.strip() for line in sys.stdin)
+        results = parse_requests((line for line in lines if line and not line.startswith("#")), args.workers, args.chunksize)
+    else:
+        results = parse_request_file(args.input, args.workers, args.chunksize)
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    parsed = failed = 0
+    try:
+        for item in results:
+            out.write(json.dumps(item) + "\n")
+            if "error" in item:
+                failed += 1
+            else:
+                parsed += 1
+    finally:
+        if args.output:
+            out.close()
+    print(f"Parsed {parsed} requests, {failed} failed", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
 import os
 from virl2_client import ClientLibrary
 from NetworkValidator import NetworkValidator
+from NetworkPorts import port_limit_errors
+
+# Config lines only nxosv9000 nodes understand; stripped from every other node
+VXLAN_KEYWORDS = ["vxlan", "evpn", "nve", "vn-segment", "l2vpn", "l3vni"]
+
+def strip_vxlan_lines(lines):
+    """Drop VXLAN/EVPN lines from a list of config lines (for nodes that are not nxosv9000)."""
+    return [line for line in lines if not any(proto in line.lower() for proto in VXLAN_KEYWORDS)]
 
 class CMLManager:
     def __init__(self):
@@ -11,6 +19,7 @@ class CMLManager:
         if not server or not username or not password:
             raise ValueError("CML_SERVER, CML_USERNAME, and CML_PASSWORD must be set as environment variables.")
         self.client = ClientLibrary(server, username, password, ssl_verify=False)
+        self._credentials = (username, password)
 
     def create_lab_from_mcp(self, mcp_model, lab_title=None):
         """Create a new lab based on the MCP network model."""
@@ -20,6 +29,11 @@ class CMLManager:
             mcp_model["network_design"]["links"]
         )
         validation_results = validator.validate_topology()
+
+        # Refuse to build a lab whose nodes can't hold all their links
+        limit_errors = port_limit_errors(mcp_model["network_design"]["devices"], mcp_model["network_design"]["links"])
+        if limit_errors:
+            raise ValueError("Interface limits exceeded: " + "; ".join(limit_errors))
         
         if lab_title:
             lab = self.client.create_lab(title=lab_title)
@@ -42,9 +56,7 @@ class CMLManager:
             if ("vxlan" in config.lower() or "evpn" in config.lower()) and node_definition != "nxosv9000":
                 unsupported_vxlan_nodes.append(label)
             if node_definition != "nxosv9000":
-                config_lines = config.splitlines()
-                filtered_lines = [line for line in config_lines if not any(proto in line.lower() for proto in ["vxlan", "evpn", "nve", "vn-segment", "l2vpn", "l3vni"])]
-                config = "\n".join(filtered_lines)
+                config = "\n".join(strip_vxlan_lines(config.splitlines()))
             node = lab.create_node(label=label, node_definition=node_definition, x=x, y=y)
             node.config = config
             device_mapping[label] = node
@@ -62,7 +74,12 @@ class CMLManager:
                 continue
             node_a = device_mapping[link["endpoints"][0]]
             node_b = device_mapping[link["endpoints"][1]]
-            lab.connect_two_nodes(node_a, node_b)
+            slots = link.get("slots") or [None, None]
+            if None in slots:
+                lab.connect_two_nodes(node_a, node_b)
+            else:
+                # Wire the ports the addressing step allocated, so configs match the cabling
+                lab.create_link(self._interface_at_slot(node_a, slots[0]), self._interface_at_slot(node_b, slots[1]))
 
         lab.sync()
         lab.start()
@@ -80,6 +97,67 @@ class CMLManager:
         
         return lab, warning_msg, validation_results, health_results
 
+    @staticmethod
+    def _interface_at_slot(node, slot):
+        """Existing interface of a node at a CML slot, created if the node doesn't have it yet."""
+        try:
+            interface = node.get_interface_by_slot(slot)
+        except Exception:
+            interface = None
+        return interface if interface is not None else node.create_interface(slot=slot)
+
+    def apply_config_changes(self, lab_id, diff, devices):
+        """Push config change sets (see ConfigDiff.diff_device_configs) to the nodes of a lab.
+
+        Booted nodes get the change set in configuration mode over pyATS, so nothing has to be
+        rebooted; their startup config is updated after the push succeeds. Nodes that are not booted,
+        or cloud-init hosts ('reload'), only get the new startup config and pick it up on their next boot.
+
+        Args:
+            lab_id: ID of the deployed lab
+            diff: Result of diff_device_configs(deployed devices, edited devices)
+            devices: Edited devices (for their node definitions)
+
+        Returns:
+            Dictionary with the nodes whose change set was 'applied' live, the ones only 'staged'
+            as startup config, the 'skipped' ones (not in the lab) and per-node 'errors' (a node can
+            be both applied and in errors when only storing its startup config failed)
+        """
+        lab = self.client.join_existing_lab(lab_id)
+        nodes = {node.label: node for node in lab.nodes()}
+        node_definitions = {dev["name"]: dev.get("node_definition", "iosv") for dev in devices}
+        results = {"applied": [], "staged": [], "skipped": [], "errors": {}}
+        pyats_ready = False
+        for name, change in diff["changes"].items():
+            node = nodes.get(name)
+            if node is None:
+                results["skipped"].append(name)
+                continue
+            config, commands = change["config"], change["commands"]
+            if node_definitions.get(name) != "nxosv9000":
+                config = "\n".join(strip_vxlan_lines(config.splitlines()))
+                commands = strip_vxlan_lines(commands)
+            try:
+                # Booted nodes take the change set live; others (still booting, stopped) only store it
+                if change["reload"] or not commands or not node.is_booted():
+                    node.config = config
+                    results["staged"].append(name)
+                    continue
+                if not pyats_ready:
+                    lab.pyats.sync_testbed(*self._credentials)
+                    pyats_ready = True
+                node.run_pyats_config_command("\n".join(commands))
+                results["applied"].append(name)
+            except Exception as e:
+                results["errors"][name] = f"{type(e).__name__}: {e}"
+                continue
+            # The startup config is stored once the live push worked; CML may refuse it on a running node
+            try:
+                node.config = config
+            except Exception as e:
+                results["errors"][name] = f"Applied live, but the startup config was not stored: {type(e).__name__}: {e}"
+        return results
+
     def start_lab(self, lab_id):
         """Start an existing lab."""
         lab = self.client.join_existing_lab(lab_id)
@@ -0,0 +1,150 @@
+"""Section-level diffs between rendered device configs.
+
+Configs are parsed into their CLI hierarchy (a top-level line such as "interface GigabitEthernet0/1"
+or "router bgp 65000" owns the more-indented lines below it) and compared section by section. The
+result is the minimal set of commands that turns the running config into the new one, for pushing
+edits to an already deployed lab instead of rebuilding it.
+"""
+
+# Top-level commands that replace their previous value instead of accumulating
+REPLACED_COMMANDS = ("hostname ",)
+
+# Interfaces that can be deleted; physical ones are reset with "default interface"
+LOGICAL_INTERFACES = ("loopback", "tunnel", "vlan", "nve", "port-channel", "bdi")
+
+def parse_config_sections(config):
+    """Parse a CLI config into nested {line: children} dictionaries, in config order.
+
+    Repeated sections (e.g. two "router bgp 65000" blocks) are merged, as the device would.
+    Blank lines, "!" separators and "end" are ignored.
+
+    Args:
+        config: Config string
+
+    Returns:
+        Ordered dictionary of stripped top-level lines to their (recursively parsed) children
+    """
+    root = {}
+    stack = [(-1, root)]
+    for raw in (config or "").splitlines():
+        line = raw.rstrip()
+        stripped = line.strip()
+        if not stripped or stripped == "!" or stripped == "end":
+            continue
+        indent = len(line) - len(line.lstrip())
+        while stack[-1][0] >= indent:
+            stack.pop()
+        children = stack[-1][1].setdefault(stripped, {})
+        stack.append((indent, children))
+    return root
+
+def negate(line):
+    """CLI command that undoes a line ("no shutdown" -> "shutdown", "network x" -> "no network x")."""
+    return line[3:] if line.startswith("no ") else "no " + line
+
+def _remove_section(line):
+    if line.startswith(REPLACED_COMMANDS):
+        return None
+    if line.startswith("interface "):
+        name = line[len("interface "):]
+        return f"no {line}" if name.lower().startswith(LOGICAL_INTERFACES) else f"default {line}"
+    return negate(line)
+
+def _section_lines(line, children, depth):
+    lines = [" " * depth + line]
+    for child, grandchildren in children.items():
+        lines.extend(_section_lines(child, grandchildren, depth + 1))
+    return lines
+
+def _diff_children(old, new, depth):
+    """Commands inside a section present in both configs (removals first, then additions)."""
+    indent = " " * depth
+    # A removed "no shutdown" is undone by an added "shutdown" (and vice versa), not twice
+    lines = [indent + negate(line) for line in old if line not in new and negate(line) not in new]
+    for line, children in new.items():
+        if line not in old:
+            lines.extend(_section_lines(line, children, depth))
+        elif children != old[line]:
+            nested = _diff_children(old[line], children, depth + 1)
+            if nested:
+                lines.append(indent + line)
+                lines.extend(nested)
+                lines.append(indent + "exit")
+    return lines
+
+def diff_configs(old_config, new_config):
+    """Minimal change set between two configs of one device.
+
+    Args:
+        old_config: Config currently on the device
+        new_config: Desired config
+
+    Returns:
+        Dictionary with the 'commands' to paste in configuration mode, the top-level section lines
+        that were 'added', 'removed' and 'changed', and 'reload' (True for cloud-init hosts, whose
+        config only applies at boot)
+    """
+    result = {"commands": [], "added": [], "removed": [], "changed": [], "reload": False}
+    if (old_config or "") == (new_config or ""):
+        return result
+    if (new_config or "").startswith("#cloud-config") or (old_config or "").startswith("#cloud-config"):
+        result["reload"] = True
+        return result
+
+    old = parse_config_sections(old_config)
+    new = parse_config_sections(new_config)
+    commands = result["commands"]
+    for line in old:
+        if line not in new:
+            result["removed"].append(line)
+            command = _remove_section(line)
+            if command:
+                commands.append(command)
+    for line, children in new.items():
+        if line not in old:
+            result["added"].append(line)
+            commands.extend(_section_lines(line, children, 0))
+        elif children != old[line]:
+            result["changed"].append(line)
+            commands.append(line)
+            commands.extend(_diff_children(old[line], children, 1))
+    return result
+
+def diff_device_configs(old_devices, new_devices):
+    """Change sets for every device whose config differs between two versions of a model.
+
+    Devices whose config string is unchanged are skipped without parsing.
+
+    Args:
+        old_devices: Devices as deployed
+        new_devices: Devices after editing
+
+    Returns:
+        Dictionary with 'changes' ({device name: diff_configs result plus the new 'config'}), the
+        'added_devices' and 'removed_devices' (these need a redeploy) and the 'unchanged_devices'
+    """
+    old_map = {dev["name"]: dev for dev in old_devices}
+    new_names = {dev["name"] for dev in new_devices}
+    changes = {}
+    added = []
+    unchanged = []
+    for dev in new_devices:
+        old = old_map.get(dev["name"])
+        if old is None:
+            added.append(dev["name"])
+            continue
+        if dev.get("config", "") == old.get("config", ""):
+            unchanged.append(dev["name"])
+            continue
+        change = diff_configs(old.get("config", ""), dev.get("config", ""))
+        if change["commands"] or change["reload"]:
+            change["config"] = dev.get("config", "")
+            changes[dev["name"]] = change
+        else:
+            unchanged.append(dev["name"])
+    return {
+        "changes": changes,
+        "added_devices": added,
+        "removed_devices": [name for name in old_map if name not in new_names],
+        "unchanged_devices": unchanged
+    }
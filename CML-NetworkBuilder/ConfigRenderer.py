@@ -0,0 +1,431 @@
+"""Template-based device config rendering.
+
+Every platform (CML node definition) has a table of section templates that are compiled once, at
+import, into bound str.format callables. A device is rendered from a plain render context:
+
+    {
+        "hostname": "R1",
+        "platform": "iosv",
+        "ipv6_routing": True (optional, defaults to "any interface has IPv6"),
+        "interfaces": [{"name", "description", "ip", "mask", "ipv6", "ipv6_prefix", "vlan", "is_loopback", "igp", "area"}],
+        "ospf": {"process_id", "area", "networks": ["10.0.0.0/30"], "router_id", "network_areas": {network: area},
+                 "ranges": [(area, prefix)]} or None,
+        "ospfv3": {"process_id", "area", "router_id"} or None,
+        "eigrp": {"as_number", "networks": [...]} or None,
+        "bgp": {"asn", "router_id", "neighbors": [{"address", "remote_as", "description", "update_source",
+                "rr_client", "next_hop_self"}], "networks": [...], "ipv6_networks": [...]} or None,
+        "static_routes": [(destination, mask, next_hop)],
+        "static_routes6": [(prefix, next_hop)],
+        "vxlan": {"l2vnis", "vtep_ip", "evpn_neighbor"} or None
+    }
+
+Interfaces with "igp": False (eBGP links) are left out of the interface-level OSPF/EIGRP commands.
+OSPF networks and interfaces default to the process "area" unless "network_areas" / the
+interface's "area" say otherwise (multi-area designs); "ranges" summarize areas at an ABR.
+Neighbor keys other than address and remote_as are optional.
+
+Both generate_device_configs (model-driven) and the device editor in the Frontend (form-driven)
+build such a context and render it here, so they produce the same syntax for the same intent.
+"""
+from NetworkAddressing import int_to_ipv4
+from NetworkPorts import select_node_definition
+
+# --- Mask tables (prefix length -> dotted mask), built once ---
+NETMASKS = [int_to_ipv4((0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF) for prefix in range(33)]
+WILDCARDS = [int_to_ipv4(~(0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF) for prefix in range(33)]
+PREFIX_BY_NETMASK = {mask: prefix for prefix, mask in enumerate(NETMASKS)}
+
+def split_ipv4_network(cidr):
+    """('network address', prefix) of an IPv4 CIDR string (host bits cleared), or None if invalid."""
+    address, _, prefix = cidr.strip().partition("/")
+    try:
+        octets = [int(octet) for octet in address.split(".")]
+        prefix = int(prefix)
+    except ValueError:
+        return None
+    if len(octets) != 4 or not all(0 <= octet <= 255 for octet in octets) or not 0 <= prefix <= 32:
+        return None
+    value = (octets[0] << 24) | (octets[1] << 16) | (octets[2] << 8) | octets[3]
+    return int_to_ipv4(value & ((0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF)), prefix
+
+# --- Platform templates ---
+# IOS / IOS-XE (iosv, csr1000v)
+IOS_TEMPLATES = {
+    "header": "hostname {hostname}",
+    "ipv6_routing": "ipv6 unicast-routing",
+    "interface": "interface {name}",
+    "description": " description {description}",
+    "encapsulation": " encapsulation dot1Q {vlan}",
+    "ip_address": " ip address {ip} {mask}",
+    "ipv6_address": " ipv6 address {ipv6}/{ipv6_prefix}",
+    "ospfv3_interface": " ipv6 ospf {process_id} area {area}",
+    "no_shutdown": " no shutdown",
+    "ospfv3": "ipv6 router ospf {process_id}\n router-id {router_id}",
+    "ospf": "router ospf {process_id}",
+    "ospf_network": " network {address} {wildcard} area {area}",
+    "ospf_raw_network": " network {network} area {area}",
+    "ospf_range": " area {area} range {address} {mask}",
+    "eigrp": "router eigrp {as_number}",
+    "eigrp_network": " network {address} {wildcard}",
+    "eigrp_raw_network": " network {network}",
+    "eigrp_end": " no auto-summary",
+    "bgp": "router bgp {asn}",
+    "bgp_router_id": " bgp router-id {router_id}",
+    "bgp_neighbor": " neighbor {address} remote-as {remote_as}",
+    "bgp_neighbor_description": " neighbor {address} description {description}",
+    "bgp_update_source": " neighbor {address} update-source {interface}",
+    "bgp_rr_client": " neighbor {address} route-reflector-client",
+    "bgp_next_hop_self": " neighbor {address} next-hop-self",
+    "bgp_network": " network {address} mask {mask}",
+    "bgp_raw_network": " network {network}",
+    "bgp_ipv6": " address-family ipv6 unicast",
+    "bgp_ipv6_network": "  network {prefix}",
+    "bgp_ipv6_activate": "  neighbor {address} activate",
+    "bgp_ipv6_rr_client": "  neighbor {address} route-reflector-client",
+    "bgp_ipv6_next_hop_self": "  neighbor {address} next-hop-self",
+    "bgp_ipv6_end": " exit-address-family",
+    "static_route": "ip route {destination} {mask} {next_hop}",
+    "static_route6": "ipv6 route {prefix} {next_hop}",
+}
+
+# IOSvL2: routed ports must leave switchport mode first
+IOSVL2_TEMPLATES = dict(
+    IOS_TEMPLATES,
+    header="hostname {hostname}\nspanning-tree mode rapid-pvst",
+    routed_port=" no switchport",
+)
+
+# NX-OS: features, prefix-length addressing and interface-level routing processes
+NXOS_TEMPLATES = {
+    "header": "hostname {hostname}",
+    "feature": "feature {feature}",
+    "interface": "interface {name}",
+    "description": " description {description}",
+    "encapsulation": " encapsulation dot1q {vlan}",
+    "routed_port": " no switchport",
+    "ip_address": " ip address {ip}/{prefix}",
+    "ipv6_address": " ipv6 address {ipv6}/{ipv6_prefix}",
+    "ospf_interface": " ip router ospf {process_id} area {area}",
+    "ospfv3_interface": " ipv6 router ospfv3 {process_id} area {area}",
+    "eigrp_interface": " ip router eigrp {as_number}",
+    "no_shutdown": " no shutdown",
+    "ospf": "router ospf {process_id}",
+    "ospf_router_id": " router-id {router_id}",
+    "ospf_range": " area {area} range {address}/{prefix}",
+    "ospfv3": "router ospfv3 {process_id}\n router-id {router_id}",
+    "eigrp": "router eigrp {as_number}",
+    "bgp": "router bgp {asn}",
+    "bgp_router_id": " router-id {router_id}",
+    "bgp_ipv4": " address-family ipv4 unicast",
+    "bgp_network": "  network {address}/{prefix}",
+    "bgp_ipv6": " address-family ipv6 unicast",
+    "bgp_ipv6_network": "  network {prefix}",
+    "bgp_neighbor": " neighbor {address}\n  remote-as {remote_as}",
+    "bgp_neighbor_description": "  description {description}",
+    "bgp_update_source": "  update-source {interface}",
+    "bgp_neighbor_af": "  address-family {family} unicast",
+    "bgp_neighbor_rr_client": "   route-reflector-client",
+    "bgp_neighbor_next_hop_self": "   next-hop-self",
+    "static_route": "ip route {destination}/{prefix} {next_hop}",
+    "static_route6": "ipv6 route {prefix} {next_hop}",
+}
+
+# ASAv: named interfaces, netmasks (not wildcards) in OSPF and address families in BGP
+ASA_TEMPLATES = {
+    "header": "hostname {hostname}\nsame-security-traffic permit inter-interface",
+    "interface": "interface {name}",
+    "description": " description {description}",
+    "nameif": " nameif {nameif}\n security-level 100",
+    "ip_address": " ip address {ip} {mask}",
+    "ipv6_address": " ipv6 address {ipv6}/{ipv6_prefix}",
+    "no_shutdown": " no shutdown",
+    "ospf": "router ospf {process_id}",
+    "ospf_network": " network {address} {mask} area {area}",
+    "ospf_range": " area {area} range {address} {mask}",
+    "eigrp": "router eigrp {as_number}",
+    "eigrp_network": " network {address} {mask}",
+    "bgp": "router bgp {asn}",
+    "bgp_router_id": " bgp router-id {router_id}",
+    "bgp_ipv4": " address-family ipv4 unicast",
+    "bgp_neighbor": "  neighbor {address} remote-as {remote_as}",
+    "bgp_network": "  network {address} mask {mask}",
+    "bgp_ipv4_end": " exit-address-family",
+    "static_route": "route {nameif} {destination} {mask} {next_hop}",
+}
+
+# Ubuntu and other Linux hosts: cloud-init user data with a netplan file
+CLOUD_INIT_TEMPLATES = {
+    "header": "#cloud-config\nhostname: {hostname}",
+    "netplan": "write_files:\n  - path: /etc/netplan/60-lab.yaml\n    content: |\n      network:\n        version: 2\n        ethernets:",
+    "netplan_interface": "          {name}:\n            addresses: [{addresses}]",
+    "runcmd": "runcmd:\n  - netplan apply",
+    "static_route": "  - ip route add {destination}/{prefix} via {next_hop}",
+}
+
+def _compile(templates):
+    """Bind every template's str.format once, so rendering is a dict lookup plus a format call."""
+    return {section: template.format for section, template in templates.items()}
+
+# --- Section renderers ---
+def _render_interfaces(t, ctx, lines):
+    interfaces = ctx.get("interfaces", [])
+    ospf = ctx.get("ospf")
+    ospfv3 = ctx.get("ospfv3")
+    eigrp = ctx.get("eigrp")
+    if "ipv6_routing" in t and ctx.get("ipv6_routing", any(iface.get("ipv6") for iface in interfaces)):
+        lines.append(t["ipv6_routing"]())
+    for i, iface in enumerate(interfaces):
+        lines.append(t["interface"](name=iface["name"]))
+        if iface.get("description"):
+            lines.append(t["description"](description=iface["description"]))
+        if iface.get("vlan") and "encapsulation" in t:
+            lines.append(t["encapsulation"](vlan=iface["vlan"]))
+        if "nameif" in t:
+            lines.append(t["nameif"](nameif=iface.get("nameif") or f"link{i}"))
+        if "routed_port" in t and not iface.get("is_loopback"):
+            lines.append(t["routed_port"]())
+        if iface.get("ip"):
+            mask = iface.get("mask") or NETMASKS[30]
+            lines.append(t["ip_address"](ip=iface["ip"], mask=mask, prefix=PREFIX_BY_NETMASK.get(mask, 32)))
+            if ospf and "ospf_interface" in t and iface.get("igp", True):
+                lines.append(t["ospf_interface"](process_id=ospf["process_id"], area=iface.get("area", ospf["area"])))
+            if eigrp and "eigrp_interface" in t and iface.get("igp", True):
+                lines.append(t["eigrp_interface"](as_number=eigrp["as_number"]))
+        if iface.get("ipv6") and "ipv6_address" in t:
+            lines.append(t["ipv6_address"](ipv6=iface["ipv6"], ipv6_prefix=iface.get("ipv6_prefix", 127)))
+            if ospfv3 and "ospfv3_interface" in t and iface.get("igp", True):
+                lines.append(t["ospfv3_interface"](process_id=ospfv3["process_id"], area=iface.get("area", ospfv3["area"])))
+        if not iface.get("is_loopback"):
+            lines.append(t["no_shutdown"]())
+
+def _render_cloud_init_interfaces(t, ctx, lines):
+    interfaces = [iface for iface in ctx.get("interfaces", []) if not iface.get("is_loopback") and (iface.get("ip") or iface.get("ipv6"))]
+    if not interfaces:
+        return
+    lines.append(t["netplan"]())
+    for iface in interfaces:
+        addresses = []
+        if iface.get("ip"):
+            addresses.append(f"{iface['ip']}/{PREFIX_BY_NETMASK.get(iface.get('mask') or NETMASKS[30], 32)}")
+        if iface.get("ipv6"):
+            addresses.append(f"{iface['ipv6']}/{iface.get('ipv6_prefix', 127)}")
+        lines.append(t["netplan_interface"](name=iface["name"], addresses=", ".join(addresses)))
+
+def _render_ospfv3(t, ctx, lines):
+    ospfv3 = ctx.get("ospfv3")
+    if ospfv3 and "ospfv3" in t:
+        lines.append(t["ospfv3"](process_id=ospfv3["process_id"], router_id=ospfv3["router_id"]))
+
+def _render_ospf(t, ctx, lines):
+    ospf = ctx.get("ospf")
+    if not ospf:
+        return
+    lines.append(t["ospf"](process_id=ospf["process_id"]))
+    if ospf.get("router_id") and "ospf_router_id" in t:
+        lines.append(t["ospf_router_id"](router_id=ospf["router_id"]))
+    if "ospf_network" in t:
+        network_areas = ospf.get("network_areas") or {}
+        for network in ospf.get("networks", []):
+            if not network:
+                continue
+            area = network_areas.get(network, ospf["area"])
+            parsed = split_ipv4_network(network)
+            if parsed:
+                address, prefix = parsed
+                lines.append(t["ospf_network"](address=address, wildcard=WILDCARDS[prefix], mask=NETMASKS[prefix], area=area))
+            elif "ospf_raw_network" in t:
+                lines.append(t["ospf_raw_network"](network=network, area=area))
+    for area, network in ospf.get("ranges") or []:
+        parsed = split_ipv4_network(network)
+        if parsed and "ospf_range" in t:
+            lines.append(t["ospf_range"](area=area, address=parsed[0], mask=NETMASKS[parsed[1]], prefix=parsed[1]))
+
+def _render_eigrp(t, ctx, lines):
+    eigrp = ctx.get("eigrp")
+    if not eigrp:
+        return
+    lines.append(t["eigrp"](as_number=eigrp["as_number"]))
+    if "eigrp_network" in t:
+        for network in eigrp.get("networks", []):
+            if not network:
+                continue
+            parsed = split_ipv4_network(network)
+            if parsed:
+                lines.append(t["eigrp_network"](address=parsed[0], mask=NETMASKS[parsed[1]], wildcard=WILDCARDS[parsed[1]]))
+            elif "eigrp_raw_network" in t:
+                lines.append(t["eigrp_raw_network"](network=network))
+    if "eigrp_end" in t:
+        lines.append(t["eigrp_end"]())
+
+def _render_bgp(t, ctx, lines):
+    bgp = ctx.get("bgp")
+    if not bgp:
+        return
+    lines.append(t["bgp"](asn=bgp["asn"]))
+    if bgp.get("router_id"):
+        lines.append(t["bgp_router_id"](router_id=bgp["router_id"]))
+    networks = []
+    for network in bgp.get("networks", []):
+        if not network:
+            continue
+        parsed = split_ipv4_network(network)
+        if parsed:
+            networks.append(t["bgp_network"](address=parsed[0], mask=NETMASKS[parsed[1]], prefix=parsed[1]))
+        elif "bgp_raw_network" in t:
+            networks.append(t["bgp_raw_network"](network=network))
+    # IPv6 neighbors only on platforms with an IPv6 address family
+    all_neighbors = bgp.get("neighbors", [])
+    neighbors4 = [neighbor for neighbor in all_neighbors if ":" not in neighbor["address"]]
+    neighbors6 = [neighbor for neighbor in all_neighbors if ":" in neighbor["address"]] if "bgp_ipv6" in t else []
+    if "bgp_ipv4_end" in t:
+        # ASA: everything IPv4 lives in the address family
+        lines.append(t["bgp_ipv4"]())
+        lines.extend(_bgp_neighbor_lines(t, neighbors4, "ipv4"))
+        lines.extend(networks)
+        lines.append(t["bgp_ipv4_end"]())
+    elif "bgp_ipv4" in t:
+        # NX-OS: address families first, then neighbors
+        if networks:
+            lines.append(t["bgp_ipv4"]())
+            lines.extend(networks)
+        lines.extend(_bgp_ipv6_lines(t, bgp, neighbors6))
+        lines.extend(_bgp_neighbor_lines(t, neighbors4, "ipv4"))
+        lines.extend(_bgp_neighbor_lines(t, neighbors6, "ipv6"))
+        return
+    else:
+        # IOS: IPv4 neighbors are active in the default address family; IPv6 ones are activated in theirs
+        lines.extend(_bgp_neighbor_lines(t, neighbors4, "ipv4"))
+        lines.extend(_bgp_neighbor_lines(t, neighbors6, "ipv6"))
+        lines.extend(networks)
+    lines.extend(_bgp_ipv6_lines(t, bgp, neighbors6))
+
+def _bgp_neighbor_lines(t, neighbors, family):
+    lines = []
+    for neighbor in neighbors:
+        address = neighbor["address"]
+        lines.append(t["bgp_neighbor"](address=address, remote_as=neighbor["remote_as"]))
+        if neighbor.get("description") and "bgp_neighbor_description" in t:
+            lines.append(t["bgp_neighbor_description"](address=address, description=neighbor["description"]))
+        if neighbor.get("update_source") and "bgp_update_source" in t:
+            lines.append(t["bgp_update_source"](address=address, interface=neighbor["update_source"]))
+        if "bgp_neighbor_af" in t:
+            # NX-OS: every neighbor activates its address family
+            lines.append(t["bgp_neighbor_af"](family=family))
+            if neighbor.get("rr_client"):
+                lines.append(t["bgp_neighbor_rr_client"]())
+            if neighbor.get("next_hop_self"):
+                lines.append(t["bgp_neighbor_next_hop_self"]())
+        elif family == "ipv4" and "bgp_rr_client" in t:
+            if neighbor.get("rr_client"):
+                lines.append(t["bgp_rr_client"](address=address))
+            if neighbor.get("next_hop_self"):
+                lines.append(t["bgp_next_hop_self"](address=address))
+    return lines
+
+def _bgp_ipv6_lines(t, bgp, neighbors6=()):
+    ipv6_networks = bgp.get("ipv6_networks") or []
+    if not (ipv6_networks or neighbors6) or "bgp_ipv6" not in t:
+        return []
+    lines = [t["bgp_ipv6"]()]
+    lines.extend(t["bgp_ipv6_network"](prefix=prefix) for prefix in ipv6_networks)
+    if "bgp_ipv6_activate" in t:
+        for neighbor in neighbors6:
+            lines.append(t["bgp_ipv6_activate"](address=neighbor["address"]))
+            if neighbor.get("rr_client"):
+                lines.append(t["bgp_ipv6_rr_client"](address=neighbor["address"]))
+            if neighbor.get("next_hop_self"):
+                lines.append(t["bgp_ipv6_next_hop_self"](address=neighbor["address"]))
+    if "bgp_ipv6_end" in t:
+        lines.append(t["bgp_ipv6_end"]())
+    return lines
+
+def _render_static(t, ctx, lines):
+    routes = ctx.get("static_routes") or []
+    nameif = next((iface.get("nameif") for iface in ctx.get("interfaces", []) if iface.get("nameif")), "link0")
+    for destination, mask, next_hop in routes:
+        lines.append(t["static_route"](destination=destination, mask=mask, prefix=PREFIX_BY_NETMASK.get(mask, 32), next_hop=next_hop, nameif=nameif))
+    if "static_route6" in t:
+        for prefix, next_hop in ctx.get("static_routes6") or []:
+            lines.append(t["static_route6"](prefix=prefix, next_hop=next_hop))
+
+def _render_cloud_init_static(t, ctx, lines):
+    routes = ctx.get("static_routes") or []
+    if not routes and not any(iface.get("ip") or iface.get("ipv6") for iface in ctx.get("interfaces", []) if not iface.get("is_loopback")):
+        return
+    lines.append(t["runcmd"]())
+    _render_static(t, ctx, lines)
+
+def _render_vxlan(t, ctx, lines):
+    vxlan = ctx.get("vxlan")
+    if not vxlan:
+        return
+    l2vnis = vxlan.get("l2vnis", [])
+    # Configure VXLAN features
+    lines.extend(["nv overlay evpn", "feature vn-segment-vlan-based", "feature nv overlay", "feature bgp", "feature interface-vlan"])
+    # Configure VLANs for VNIs
+    for i, vni in enumerate(l2vnis):
+        lines.extend([f"vlan {100 + i}", f" name VXLAN-{vni}", f" vn-segment {vni}"])
+    # Configure BGP for EVPN
+    if vxlan.get("vtep_ip"):
+        lines.extend([
+            "router bgp 65000",
+            f" router-id {vxlan['vtep_ip']}",
+            f" neighbor {vxlan.get('evpn_neighbor', '192.168.100.1')} remote-as 65000",
+            " address-family l2vpn evpn",
+            "  send-community both"
+        ])
+    # Configure NVE interface
+    lines.extend(["interface nve1", " no shutdown", " source-interface loopback0"])
+    for vni in l2vnis:
+        lines.extend([f" member vni {vni}", "  ingress-replication protocol bgp"])
+
+def _render_nxos_features(t, ctx, lines):
+    features = [name for name, key in (("ospf", "ospf"), ("ospfv3", "ospfv3"), ("eigrp", "eigrp"), ("bgp", "bgp")) if ctx.get(key)]
+    lines.extend(t["feature"](feature=feature) for feature in features)
+
+# Block order per platform; each block is rendered into its own list of lines
+IOS_SECTIONS = [_render_interfaces, _render_ospfv3, _render_ospf, _render_eigrp, _render_bgp, _render_static, _render_vxlan]
+NXOS_SECTIONS = [_render_nxos_features, _render_interfaces, _render_ospf, _render_ospfv3, _render_eigrp, _render_bgp, _render_static, _render_vxlan]
+ASA_SECTIONS = [_render_interfaces, _render_ospf, _render_eigrp, _render_bgp, _render_static]
+CLOUD_INIT_SECTIONS = [_render_cloud_init_interfaces, _render_cloud_init_static]
+
+_IOS = (_compile(IOS_TEMPLATES), IOS_SECTIONS)
+_CLOUD_INIT = (_compile(CLOUD_INIT_TEMPLATES), CLOUD_INIT_SECTIONS)
+PLATFORMS = {
+    "iosv": _IOS,
+    "csr1000v": _IOS,
+    "iosvl2": (_compile(IOSVL2_TEMPLATES), IOS_SECTIONS),
+    "nxosv9000": (_compile(NXOS_TEMPLATES), NXOS_SECTIONS),
+    "asav": (_compile(ASA_TEMPLATES), ASA_SECTIONS),
+    "ubuntu": _CLOUD_INIT,
+    "alpine": _CLOUD_INIT,
+    "ext-server": _CLOUD_INIT,
+    "win10-desktop": _CLOUD_INIT,
+}
+
+def platform_for(device):
+    """Template platform of a device: its node definition, else the default one for its type."""
+    return device.get("node_definition") or select_node_definition(device.get("type", "router"), 0)[0]
+
+def render_blocks(context, header=True):
+    """Render a context into config blocks (lists of lines), skipping empty ones.
+
+    Args:
+        context: Render context (see module docstring)
+        header: Include the platform header (hostname etc.) as the first block
+
+    Returns:
+        List of non-empty blocks in platform order
+    """
+    templates, sections = PLATFORMS.get(context.get("platform"), _IOS)
+    blocks = [[templates["header"](hostname=context["hostname"])]] if header else []
+    for section in sections:
+        lines = []
+        section(templates, context, lines)
+        if lines:
+            blocks.append(lines)
+    return blocks
+
+def render_config(context):
+    """Full device config for a render context."""
+    return "\n".join(line for block in render_blocks(context) for line in block)
@@ -0,0 +1,193 @@
+"""Parsed device configs shared by the validator, the topology view and the summary tabs.
+
+Every consumer used to re-scan the raw config text with substring tests and regexes, on every
+Streamlit rerun. Here a config is parsed once into its CLI section tree (see
+ConfigDiff.parse_config_sections) and cached by content hash; callers query the tree instead.
+The queries understand the IOS, IOS-XE, NX-OS and ASA syntax rendered by ConfigRenderer.
+"""
+import hashlib
+from collections import OrderedDict
+from ConfigDiff import parse_config_sections
+
+# Parsed configs kept in memory (least recently used are evicted first); fits a 10k-device model
+CACHE_SIZE = 16384
+
+# Top-level sections of each routing protocol (IPv4 and IPv6 processes)
+PROTOCOL_SECTIONS = {
+    "OSPF": ("router ospf ", "router ospfv3 ", "ipv6 router ospf "),
+    "EIGRP": ("router eigrp ", "ipv6 router eigrp "),
+    "BGP": ("router bgp ",),
+}
+# Static routes: IOS / NX-OS ("ip route", "ipv6 route") and ASA ("route <nameif> ...")
+STATIC_ROUTE_COMMANDS = ("ip route ", "ipv6 route ", "route ")
+
+_cache = OrderedDict()
+
+def config_key(config):
+    """Content hash of a config, the cache key of its parsed tree."""
+    return hashlib.sha256((config or "").encode("utf-8")).hexdigest()
+
+def parse_config(config):
+    """Parsed tree of a config, from the cache when the same text was parsed before.
+
+    Args:
+        config: Config string (None or non-strings parse as an empty config)
+
+    Returns:
+        ParsedConfig (shared between callers; treat it as read-only)
+    """
+    if not isinstance(config, str):
+        config = ""
+    key = config_key(config)
+    parsed = _cache.get(key)
+    if parsed is not None:
+        _cache.move_to_end(key)
+        return parsed
+    parsed = ParsedConfig(parse_config_sections(config))
+    _cache[key] = parsed
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return parsed
+
+def clear_cache():
+    """Drop every parsed config (for benchmarks and memory pressure)."""
+    _cache.clear()
+
+def _arguments(line, command):
+    """Rest of `line` after `command` ("network 10.0.0.0 mask ..." -> "10.0.0.0 mask ...")."""
+    return line[len(command):].strip()
+
+class ParsedConfig:
+    """Query interface over one config's section tree ({line: children}, in config order).
+
+    Query results are computed on first use and kept, like the tree itself.
+    """
+
+    def __init__(self, sections):
+        self.sections = sections
+        self._results = {}
+
+    def _memo(self, name, compute):
+        if name not in self._results:
+            self._results[name] = compute()
+        return self._results[name]
+
+    def find_sections(self, *prefixes):
+        """Top-level (line, children) pairs whose line starts with any of the prefixes."""
+        return [(line, children) for line, children in self.sections.items() if line.startswith(prefixes)]
+
+    def protocols(self):
+        """Routing protocols configured: a subset of OSPF, EIGRP, BGP and Static, in that order."""
+        def compute():
+            found = [protocol for protocol, prefixes in PROTOCOL_SECTIONS.items() if self.find_sections(*prefixes)]
+            if self.static_routes():
+                found.append("Static")
+            return found
+        return self._memo("protocols", compute)
+
+    def process_id(self, protocol):
+        """Process ID / AS number of the first IPv4 process of a protocol ("" if not configured)."""
+        sections = self.find_sections(PROTOCOL_SECTIONS[protocol][0])
+        return sections[0][0].split()[-1] if sections else ""
+
+    def networks(self, protocol):
+        """Arguments of the IPv4 and IPv6 "network" statements of a protocol, in config order.
+
+        Includes statements inside BGP address families. For example "10.0.0.0 0.0.0.3 area 0"
+        (OSPF), "10.0.0.0 mask 255.255.255.252" (IOS BGP) or "10.0.0.0/30" (NX-OS BGP).
+        """
+        def compute():
+            found = []
+            for _, children in self.find_sections(*PROTOCOL_SECTIONS[protocol]):
+                for line, grandchildren in children.items():
+                    if line.startswith("network "):
+                        found.append(_arguments(line, "network "))
+                    elif line.startswith("address-family "):
+                        found.extend(_arguments(child, "network ") for child in grandchildren if child.startswith("network "))
+            return found
+        return self._memo(("networks", protocol), compute)
+
+    def neighbors(self):
+        """BGP neighbors as (address, remote AS) pairs, in config order.
+
+        IOS puts "neighbor <address> remote-as <asn>" in the process; NX-OS opens a
+        "neighbor <address>" section with a "remote-as <asn>" line; ASA nests them in an address family.
+        """
+        def compute():
+            found = {}
+            for _, children in self.find_sections("router bgp "):
+                lines = list(children.items())
+                for line, grandchildren in children.items():
+                    if line.startswith("address-family "):
+                        lines.extend(grandchildren.items())
+                for line, grandchildren in lines:
+                    words = line.split()
+                    if words[0] != "neighbor" or len(words) < 2:
+                        continue
+                    if len(words) == 4 and words[2] == "remote-as":
+                        found.setdefault(words[1], words[3])
+                    elif len(words) == 2:
+                        remote_as = next((child.split()[1] for child in grandchildren if child.startswith("remote-as ")), None)
+                        if remote_as:
+                            found.setdefault(words[1], remote_as)
+            return list(found.items())
+        return self._memo("neighbors", compute)
+
+    def interfaces(self):
+        """{interface name: children} of every interface section, in config order."""
+        return self._memo("interfaces", lambda: {
+            _arguments(line, "interface "): children for line, children in self.find_sections("interface ")
+        })
+
+    def ospf_interfaces(self):
+        """Names of the interfaces that enable IPv4 OSPF themselves (NX-OS "ip router ospf 1 area 0",
+        IOS "ip ospf 1 area 0") instead of being matched by network statements."""
+        return self._memo("ospf_interfaces", lambda: [
+            name for name, children in self.interfaces().items()
+            if any(child.startswith("ip router ospf ") or (child.startswith("ip ospf ") and " area " in child) for child in children)
+        ])
+
+    def interface_addresses(self):
+        """(interface name, first IPv4 address or None) per interface; NX-OS addresses keep their /prefix."""
+        def compute():
+            found = []
+            for name, children in self.interfaces().items():
+                address = next((child.split()[2] for child in children if child.startswith("ip address ") and len(child.split()) > 2), None)
+                found.append((name, address))
+            return found
+        return self._memo("interface_addresses", compute)
+
+    def vlans(self):
+        """VLAN IDs (strings, sorted numerically) from VLAN sections, dot1Q subinterfaces and access ports."""
+        def compute():
+            found = set()
+            for line in self.sections:
+                if line.startswith("vlan "):
+                    found.update(vlan for vlan in _arguments(line, "vlan ").split(",") if vlan.isdigit())
+            for children in self.interfaces().values():
+                for child in children:
+                    words = child.split()
+                    if len(words) == 3 and words[0] == "encapsulation" and words[1].lower() == "dot1q":
+                        found.add(words[2])
+                    elif len(words) == 4 and words[:3] == ["switchport", "access", "vlan"]:
+                        found.add(words[3])
+            return sorted((vlan for vlan in found if vlan.isdigit()), key=int)
+        return self._memo("vlans", compute)
+
+    def trunk_ports(self):
+        """Names of the interfaces in "switchport mode trunk", in config order."""
+        return self._memo("trunk_ports", lambda: [
+            name for name, children in self.interfaces().items() if "switchport mode trunk" in children
+        ])
+
+    def static_routes(self):
+        """Arguments of every static route ("10.0.0.4 255.255.255.252 10.0.0.2"), IPv4 then IPv6."""
+        def compute():
+            routes = {command: [] for command in STATIC_ROUTE_COMMANDS}
+            for line in self.sections:
+                for command in STATIC_ROUTE_COMMANDS:
+                    if line.startswith(command):
+                        routes[command].append(_arguments(line, command))
+                        break
+            return routes["ip route "] + routes["route "] + routes["ipv6 route "]
+        return self._memo("static_routes", compute)
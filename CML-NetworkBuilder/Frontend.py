@@ -3,14 +3,10 @@ import pandas as pd
 from dotenv import load_dotenv
 load_dotenv()  # Ensure .env is loaded immediately at startup
 import json
+import copy
 from datetime import datetime
 import os
-from langgraph.graph import StateGraph, END
-from typing import TypedDict
-from langchain_openai import ChatOpenAI
-from langchain.agents import create_tool_calling_agent, AgentExecutor
 from langchain_core.tools import tool
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 import time
 import base64
 from io import BytesIO
@@ -18,418 +14,23 @@ import yaml
 import traceback
 from PIL import Image
 from NetworkValidator import NetworkValidator
-from NetworkParser import parse_network_request
+from NetworkTemplates import create_template_topology, detect_topology_pattern
+from TopologyPatterns import concrete_topology, count_links, has_links
+from NetworkAgent import (
+    SYSTEM_PROMPT, STRUCTURED_SYSTEM_PROMPT, build_agent_runnable, build_network_graph, cached_agent_node,
+    is_valid_topology_dict, normalize_links, select_best_topology, stream_network_request
+)
+from LLMCache import LLMResponseCache
+from LLMBackends import create_chat_model
+from NetworkIPAM import compact_design, concrete_design, update_ip_addresses
+from NetworkAddressing import L2VNI_RANGE, L3VNI, VTEP_LOOPBACK_NETWORK, VXLANFabricAllocator
+from NetworkPorts import CML_NODE_INTERFACE_LIMITS, build_port_index, select_node_definition
+from NetworkConfigGenerator import update_device_configs
+from ConfigRenderer import render_config
+from ConfigDiff import diff_device_configs
+from ConfigTree import parse_config
 from IPython.display import display
 from NetworkVisualization import draw_network_topology, draw_network_topology_plotly
-import re
-
-# --- Template-based topology generators for reliable network creation ---
-def create_template_topology(topology_type, num_devices, protocol=None, device_type="router"):
-    """Generate a standard topology based on common topology patterns.
-    
-    Args:
-        topology_type: String, one of: 'ring', 'star', 'mesh', 'bus', 'line'
-        num_devices: Number of devices to include
-        protocol: Optional routing protocol (OSPF, EIGRP, BGP, etc.)
-        device_type: Type of device to create (router, switch, etc.)
-        
-    Returns:
-        Dictionary with 'devices' and 'links' lists ready for the topology builder
-    """
-    devices = []
-    links = []
-    
-    # Create the devices
-    for i in range(1, num_devices + 1):
-        devices.append({
-            "name": f"{device_type.capitalize()}{i}",
-            "type": device_type.lower()
-        })
-    
-    # Create the links based on topology type
-    if topology_type.lower() == "ring":
-        # Each device connects to the next, and the last connects to the first
-        for i in range(num_devices):
-            next_idx = (i + 1) % num_devices
-            link = {
-                "endpoints": [devices[i]["name"], devices[next_idx]["name"]],
-                "link_type": "ethernet"  # Default link type
-            }
-            links.append(link)
-    
-    elif topology_type.lower() == "star":
-        # First device is the hub, all others connect to it
-        hub = devices[0]["name"]
-        for i in range(1, num_devices):
-            link = {
-                "endpoints": [hub, devices[i]["name"]],
-                "link_type": "ethernet"  # Default link type
-            }
-            links.append(link)
-    
-    elif topology_type.lower() == "mesh":
-        # Every device connects to every other device
-        for i in range(num_devices):
-            for j in range(i + 1, num_devices):
-                link = {
-                    "endpoints": [devices[i]["name"], devices[j]["name"]],
-                    "link_type": "ethernet"  # Default link type
-                }
-                links.append(link)
-    
-    elif topology_type.lower() == "bus" or topology_type.lower() == "line":
-        # Devices connect in a line
-        for i in range(num_devices - 1):
-            link = {
-                "endpoints": [devices[i]["name"], devices[i+1]["name"]],
-                "link_type": "ethernet"  # Default link type
-            }
-            links.append(link)
-    
-    topology = {
-        "devices": devices,
-        "links": links
-    }
-    
-    # Add protocol if specified
-    if protocol:
-        topology["protocol"] = protocol.upper()
-    
-    return topology
-
-def detect_topology_pattern(text):
-    """Detect if the user is requesting a common topology pattern.
-    
-    Args:
-        text: User's input text
-        
-    Returns:
-        Tuple of (topology_type, num_devices, protocol, device_type) or None if no pattern detected
-    """
-    
-    # Look for topology type keywords
-    topology_type = None
-    if re.search(r'\b(ring|loop|circular|circle)\b', text, re.IGNORECASE):
-        topology_type = "ring"
-    elif re.search(r'\b(star|hub.+spoke|hub|spoke|central|radial)\b', text, re.IGNORECASE):
-        topology_type = "star"
-    elif re.search(r'\b(full.?mesh|mesh|fully.connected|complete)\b', text, re.IGNORECASE):
-        topology_type = "mesh"
-    elif re.search(r'\b(bus|line|linear|daisy.?chain|in.?a.?row|chain)\b', text, re.IGNORECASE):
-        topology_type = "bus"
-    
-    # Look for numbers of devices
-    num_match = re.search(r'(\d+)\s+(router|switch|firewall|device|computer|server|host)', text, re.IGNORECASE)
-    if not num_match:
-        # Try alternate patterns if the first one didn't match
-        num_match = re.search(r'(\d+)[\s-]+(node|device|equipment)', text, re.IGNORECASE)
-    if not num_match:
-        # Just look for any number followed by a word
-        num_match = re.search(r'(\d+)', text, re.IGNORECASE)
-    
-    num_devices = int(num_match.group(1)) if num_match else None
-    
-    # Look for device type
-    device_type = "router"  # Default
-    if re.search(r'\bswitch', text, re.IGNORECASE):
-        device_type = "switch"
-    elif re.search(r'\bfirewall', text, re.IGNORECASE):
-        device_type = "firewall"
-    
-    # Look for protocol
-    protocol = None
-    if re.search(r'\bOSPF\b', text, re.IGNORECASE):
-        protocol = "OSPF"
-    elif re.search(r'\bEIGRP\b', text, re.IGNORECASE):
-        protocol = "EIGRP"
-    elif re.search(r'\bBGP\b', text, re.IGNORECASE):
-        protocol = "BGP"
-    elif re.search(r'\bRIP\b', text, re.IGNORECASE):
-        protocol = "RIP"
-    elif re.search(r'\bstatic\b', text, re.IGNORECASE):
-        protocol = "STATIC"
-    
-    # If no specific topology mentioned but we have devices, default to ring topology
-    # Ring is a good default as it's commonly used in network designs
-    if not topology_type and num_devices:
-        if num_devices == 2:
-            topology_type = "bus"  # For 2 devices, a simple line makes sense
-        elif num_devices <= 6:
-            topology_type = "ring"  # Ring works well for small to medium networks
-        else:
-            topology_type = "star"  # Star is better for larger number of devices
-    
-    # Return None if we couldn't detect both topology type and number of devices
-    if not topology_type or not num_devices:
-        return None
-    
-    return (topology_type, num_devices, protocol, device_type)
-
-# --- Place the function here ---
-def assign_ip_addresses(devices, links, base_network="10.0.0.0/8", subnet_prefix=30):
-    import ipaddress
-    device_map = {dev["name"]: dev for dev in devices}
-    network = ipaddress.ip_network(base_network, strict=False)
-    subnet_gen = network.subnets(new_prefix=subnet_prefix)
-    link_count = 0
-    
-    # Check if this is a VXLAN topology
-    vxlan_enabled = any("VTEP" in dev["name"] for dev in devices) or any(link.get("link_type") == "vxlan" for link in links)
-    
-    # If VXLAN enabled, assign loopback IPs for VTEPs
-    if vxlan_enabled:
-        loopback_network = ipaddress.ip_network("192.168.100.0/24")
-        loopback_ips = list(loopback_network.hosts())
-        vtep_devices = [d for d in devices if "VTEP" in d["name"] or (d["type"] == "switch" and any("VTEP" in link_dev for link_dev in [l["endpoints"][0] for l in links] + [l["endpoints"][1] for l in links] if d["name"] in link_dev))]
-        
-        for i, dev in enumerate(vtep_devices):
-            if "interfaces" not in dev:
-                dev["interfaces"] = []
-            dev["interfaces"].append({
-                "name": "Loopback0",
-                "ip": str(loopback_ips[i]),
-                "mask": "255.255.255.255",
-                "description": "VTEP IP for VXLAN",
-                "is_loopback": True
-            })
-    
-    # Process physical links first
-    physical_links = [link for link in links if link.get("is_overlay") != True]
-    for link in physical_links:
-        try:
-            subnet = next(subnet_gen)
-        except StopIteration:
-            print("Ran out of subnets for links! Not all links will be assigned IPs.")
-            break
-        endpoints = link["endpoints"]
-        ips = list(subnet.hosts())
-        if len(endpoints) != 2 or len(ips) < 2:
-            continue
-        for i, dev_name in enumerate(endpoints):
-            dev = device_map.get(dev_name)
-            if dev is not None:
-                if "interfaces" not in dev:
-                    dev["interfaces"] = []
-                iface_name = f"GigabitEthernet0/{link_count}"
-                dev["interfaces"].append({
-                    "name": iface_name,
-                    "ip": str(ips[i]),
-                    "mask": str(subnet.netmask),
-                    "link_to": endpoints[1-i]
-                })
-        link["subnet"] = str(subnet)
-        link["ips"] = [str(ip) for ip in ips]
-        link_count += 1
-    
-    # Now handle overlay/VXLAN links
-    vxlan_links = [link for link in links if link.get("is_overlay") == True]
-    for link in vxlan_links:
-        link["vxlan_tunnel"] = True
-        # These don't get physical interfaces, but we record the VNI
-        # We'll use this later to generate the appropriate VXLAN config
-        
-    # If VXLAN enabled, add L2VNI and L3VNI info to the topology
-    if vxlan_enabled:
-        # Assign L2 VNIs for broadcast domains
-        l2vni_base = 10000
-        # Assign L3 VNI for L3 routing
-        l3vni_base = 50000
-        
-        for i, dev in enumerate(vtep_devices):
-            dev_vnis = []
-            for link in vxlan_links:
-                if dev["name"] in link["endpoints"]:
-                    dev_vnis.append(link.get("vni", l2vni_base + i))
-            
-            if dev_vnis:
-                if "vxlan_config" not in dev:
-                    dev["vxlan_config"] = {}
-                dev["vxlan_config"]["l2vnis"] = dev_vnis
-                dev["vxlan_config"]["l3vni"] = l3vni_base
-    
-    return vxlan_enabled
-
-# --- Protocol Configuration Generator ---
-def generate_device_configs(devices, links, requested_protocol=None):
-    """
-    Generate device configurations based on the requested routing protocol.
-    
-    Args:
-        devices: List of device dictionaries
-        links: List of link dictionaries
-        requested_protocol: Routing protocol to configure (OSPF, EIGRP, BGP, STATIC)
-        
-    Returns:
-        Updated list of device dictionaries with configuration
-    """
-    if not requested_protocol:
-        return devices  # No protocol requested, return devices unchanged
-    
-    # Create a map of device names to their objects for easier lookup
-    device_map = {dev["name"]: dev for dev in devices}
-    
-    # Get connected networks for each device
-    device_networks = {}
-    for link in links:
-        if "subnet" in link:
-            subnet = link["subnet"]
-            endpoints = link.get("endpoints", [])
-            
-            # Add this subnet to each connected device's list
-            for endpoint in endpoints:
-                if endpoint in device_map:
-                    if endpoint not in device_networks:
-                        device_networks[endpoint] = []
-                    device_networks[endpoint].append(subnet)
-    
-    # Generate configs based on protocol
-    if requested_protocol == "OSPF":
-        # Use process ID 1 and area 0 for simplicity
-        process_id = 1
-        area = 0
-        
-        for dev_name, networks in device_networks.items():
-            if dev_name in device_map and device_map[dev_name]["type"] == "router":
-                device = device_map[dev_name]
-                
-                # Start with the device's existing config or create a basic one
-                if "config" not in device or not device["config"]:
-                    device["config"] = f"hostname {dev_name}\n"
-                
-                # Add OSPF configuration
-                ospf_config = [f"router ospf {process_id}"]
-                
-                # Add network statements for each connected subnet
-                for network in networks:
-                    if network:
-                        try:
-                            # Parse the subnet to get the network address and mask
-                            import ipaddress
-                            subnet_obj = ipaddress.IPv4Network(network, strict=False)
-                            network_addr = str(subnet_obj.network_address)
-                            wildcard = str(ipaddress.IPv4Address(int(subnet_obj.hostmask)))
-                            ospf_config.append(f" network {network_addr} {wildcard} area {area}")
-                        except Exception as e:
-                            # Fall back to simple format if parsing fails
-                            ospf_config.append(f" network {network} area {area}")
-                
-                # Append the OSPF config to the device config
-                device["config"] += "\n" + "\n".join(ospf_config)
-    
-    elif requested_protocol == "EIGRP":
-        # Use AS 100 for simplicity
-        as_number = 100
-        
-        for dev_name, networks in device_networks.items():
-            if dev_name in device_map and device_map[dev_name]["type"] == "router":
-                device = device_map[dev_name]
-                
-                # Start with the device's existing config or create a basic one
-                if "config" not in device or not device["config"]:
-                    device["config"] = f"hostname {dev_name}\n"
-                
-                # Add EIGRP configuration
-                eigrp_config = [f"router eigrp {as_number}"]
-                
-                # Add network statements for each connected subnet
-                for network in networks:
-                    if network:
-                        try:
-                            # Parse the subnet to get the network address
-                            import ipaddress
-                            subnet_obj = ipaddress.IPv4Network(network, strict=False)
-                            network_addr = str(subnet_obj.network_address)
-                            eigrp_config.append(f" network {network_addr}")
-                        except Exception as e:
-                            # Fall back to simple format if parsing fails
-                            eigrp_config.append(f" network {network}")
-                
-                eigrp_config.append(" no auto-summary")
-                
-                # Append the EIGRP config to the device config
-                device["config"] += "\n" + "\n".join(eigrp_config)
-    
-    elif requested_protocol == "BGP":
-        # Use ASN 65000 for simplicity
-        asn = 65000
-        
-        for dev_name, networks in device_networks.items():
-            if dev_name in device_map and device_map[dev_name]["type"] == "router":
-                device = device_map[dev_name]
-                
-                # Start with the device's existing config or create a basic one
-                if "config" not in device or not device["config"]:
-                    device["config"] = f"hostname {dev_name}\n"
-                
-                # Get router ID from first interface if possible
-                router_id = None
-                if "interfaces" in device:
-                    for iface in device["interfaces"]:
-                        if "ip" in iface and iface["ip"]:
-                            router_id = iface["ip"]
-                            break
-                
-                # Add BGP configuration
-                bgp_config = [f"router bgp {asn}"]
-                if router_id:
-                    bgp_config.append(f" bgp router-id {router_id}")
-                
-                # Add network statements for each connected subnet
-                for network in networks:
-                    if network:
-                        try:
-                            # Parse the subnet to get the network address and mask
-                            import ipaddress
-                            subnet_obj = ipaddress.IPv4Network(network, strict=False)
-                            network_addr = str(subnet_obj.network_address)
-                            mask = str(subnet_obj.netmask)
-                            bgp_config.append(f" network {network_addr} mask {mask}")
-                        except Exception as e:
-                            # Fall back to simpler format if parsing fails
-                            bgp_config.append(f" network {network}")
-                
-                # Append the BGP config to the device config
-                device["config"] += "\n" + "\n".join(bgp_config)
-                
-    elif requested_protocol == "STATIC":
-        # This is more complex and would require knowledge of the desired topology
-        # For now, just add a default route to each device pointing to the first connected device
-        for dev_name, networks in device_networks.items():
-            if dev_name in device_map and device_map[dev_name]["type"] == "router":
-                device = device_map[dev_name]
-                
-                # Start with the device's existing config or create a basic one
-                if "config" not in device or not device["config"]:
-                    device["config"] = f"hostname {dev_name}\n"
-                
-                # Find connected devices through links
-                connected_devices = []
-                for link in links:
-                    endpoints = link.get("endpoints", [])
-                    if dev_name in endpoints:
-                        # Get the other endpoint
-                        other_device = endpoints[0] if endpoints[1] == dev_name else endpoints[1]
-                        connected_devices.append(other_device)
-                
-                # Add static routes for demonstration
-                static_config = []
-                if connected_devices:
-                    # Get the next hop IP if possible
-                    next_hop = None
-                    if "interfaces" in device_map[connected_devices[0]]:
-                        for iface in device_map[connected_devices[0]]["interfaces"]:
-                            if "ip" in iface and iface["ip"]:
-                                next_hop = iface["ip"]
-                                break
-                    
-                    if next_hop:
-                        static_config.append(f"ip route 0.0.0.0 0.0.0.0 {next_hop}")
-                
-                # Append the static config to the device config
-                if static_config:
-                    device["config"] += "\n" + "\n".join(static_config)
-    
-    return devices
 
 # --- Logo helper for base64 encoding ---
 import base64
@@ -442,72 +43,6 @@ def logo_to_base64(img):
 
 load_dotenv()
 
-# --- Helper functions for topology generation ---
-def create_vxlan_multisite_topology(num_sites, internet_connected=True):
-    """
-    Creates a VXLAN multi-site topology with a main datacenter and remote sites.
-    - num_sites: Total number of sites (including main DC)
-    - internet_connected: If True, sites are connected via "internet" links, otherwise direct links
-    """
-    devices = []
-    links = []
-    
-    # Create main datacenter (site 0)
-    dc_router = {"name": "DC_Border_Router", "type": "router"}
-    dc_spine1 = {"name": "DC_Spine1", "type": "switch"}
-    dc_spine2 = {"name": "DC_Spine2", "type": "switch"}
-    dc_leaf1 = {"name": "DC_Leaf1_VTEP", "type": "switch"}
-    dc_leaf2 = {"name": "DC_Leaf2_VTEP", "type": "switch"}
-    dc_server1 = {"name": "DC_Server1", "type": "server"}
-    dc_server2 = {"name": "DC_Server2", "type": "server"}
-    
-    devices.extend([dc_router, dc_spine1, dc_spine2, dc_leaf1, dc_leaf2, dc_server1, dc_server2])
-    
-    # Connect DC devices
-    links.append({"endpoints": [dc_router["name"], dc_spine1["name"]], "link_type": "ethernet"})
-    links.append({"endpoints": [dc_router["name"], dc_spine2["name"]], "link_type": "ethernet"})
-    links.append({"endpoints": [dc_spine1["name"], dc_leaf1["name"]], "link_type": "ethernet"})
-    links.append({"endpoints": [dc_spine1["name"], dc_leaf2["name"]], "link_type": "ethernet"})
-    links.append({"endpoints": [dc_spine2["name"], dc_leaf1["name"]], "link_type": "ethernet"})
-    links.append({"endpoints": [dc_spine2["name"], dc_leaf2["name"]], "link_type": "ethernet"})
-    links.append({"endpoints": [dc_leaf1["name"], dc_server1["name"]], "link_type": "ethernet"})
-    links.append({"endpoints": [dc_leaf2["name"], dc_server2["name"]], "link_type": "ethernet"})
-    
-    # Create branch sites
-    for i in range(1, num_sites):
-        site_name = f"Site{i}"
-        site_router = {"name": f"{site_name}_Router", "type": "router"}
-        site_switch = {"name": f"{site_name}_Switch_VTEP", "type": "switch"}
-        site_server = {"name": f"{site_name}_Server", "type": "server"}
-        
-        devices.extend([site_router, site_switch, site_server])
-        
-        # Connect site components
-        links.append({"endpoints": [site_router["name"], site_switch["name"]], "link_type": "ethernet"})
-        links.append({"endpoints": [site_switch["name"], site_server["name"]], "link_type": "ethernet"})
-        
-        # Connect to DC Router (WAN/Internet links)
-        link_type = "internet" if internet_connected else "ethernet"
-        links.append({"endpoints": [dc_router["name"], site_router["name"]], "link_type": link_type})
-        
-        # Add logical VXLAN overlay links (these won't be actual interfaces but represent the overlay)
-        # In a real network, these would be VXLAN tunnels over the internet/WAN
-        links.append({
-            "endpoints": [dc_leaf1["name"], site_switch["name"]], 
-            "link_type": "vxlan", 
-            "vni": 10000 + i,
-            "is_overlay": True
-        })
-    
-    # Add EVPN/BGP protocol for VXLAN control plane
-    return {
-        "devices": devices, 
-        "links": links,
-        "vxlan_enabled": True,
-        "evpn_enabled": True,
-        "protocol": "BGP"
-    }
-
 # --- Helper: Safe CMLManager lazy loader with error handling ---
 def get_cml_manager():
     try:
@@ -520,94 +55,35 @@ def get_cml_manager():
             st.warning(f"⚠️ Could not connect to CML server: {e}")
         return None
 
-# CML node interface limits and preferred node definitions
-CML_NODE_INTERFACE_LIMITS = {
-    "iosv": 4,
-    "csr1000v": 10,
-    "iosvl2": 8,
-    "nxosv9000": 32,
-    "asav": 10,
-    "ubuntu": 4,
-    "ext-server": 4,
-    "alpine": 4,
-    "win10-desktop": 4,
-}
+# --- Helper: Model with concrete links for consumers of individual links ---
+def concrete_model(mcp_model):
+    """Model whose links include the expanded mesh patterns, with their addresses and interfaces.
 
-# Preferred node definition selection logic
-PREFERRED_ROUTER = [
-    (4, "iosv"),
-    (10, "csr1000v"),
-]
-PREFERRED_SWITCH = [
-    (8, "iosvl2"),
-    (32, "nxosv9000"),
-]
-PREFERRED_SERVER = [
-    (4, "ubuntu"),
-]
-
-# Helper to select node definition based on type and interface count
-def select_node_definition(dev_type, iface_count):
-    if dev_type == "router":
-        for max_if, node_def in PREFERRED_ROUTER:
-            if iface_count <= max_if:
-                return node_def, CML_NODE_INTERFACE_LIMITS[node_def]
-        return "csr1000v", CML_NODE_INTERFACE_LIMITS["csr1000v"]
-    elif dev_type == "switch":
-        for max_if, node_def in PREFERRED_SWITCH:
-            if iface_count <= max_if:
-                return node_def, CML_NODE_INTERFACE_LIMITS[node_def]
-        return "nxosv9000", CML_NODE_INTERFACE_LIMITS["nxosv9000"]
-    elif dev_type in ["server", "ext-server", "alpine", "win10-desktop"]:
-        return "ubuntu", CML_NODE_INTERFACE_LIMITS["ubuntu"]
-    elif dev_type == "firewall":
-        return "asav", CML_NODE_INTERFACE_LIMITS["asav"]
+    The session keeps meshes compact (see NetworkIPAM.compact_design); validation, the port
+    index, the device tables, the plot and deployment need every link. The concrete design is
+    cached, so reruns don't expand the mesh again.
+    """
+    network_design = mcp_model.get("network_design", {})
+    if not network_design.get("link_patterns"):
+        return mcp_model
+    return {**mcp_model, "network_design": concrete_design(network_design, vxlan_fabric)}
+
+def apply_device_edits(mcp_model, edited_devices):
+    """Store devices edited on the concrete model; meshes stay compact in the session model."""
+    network_design = mcp_model["network_design"]
+    if network_design.get("link_patterns"):
+        design = {**concrete_design(network_design, vxlan_fabric), "devices": edited_devices}
+        mcp_model["network_design"] = compact_design(design, network_design["link_patterns"])
     else:
-        return dev_type, 4  # Default fallback
+        network_design["devices"] = edited_devices
 
 def edit_devices_ui(devices, node_definitions, valid_types, context_prefix="chat"): 
     import re
     editable_devices = []
-    # Build link map for interface counting
-    link_map = {}
-    for dev in devices:
-        link_map[dev["name"]] = 0
-    # Count links per device
-    for dev in devices:
-        dev_name = dev["name"]
-        for other_dev in devices:
-            if "links" in dev and other_dev["name"] in dev["links"]:
-                link_map[dev_name] += 1
-    # Or, more robustly, count from global links if available
-    global_links = st.session_state.get('last_mcp_model', {}).get('network_design', {}).get('links', [])
-    for link in global_links:
-        for endpoint in link.get("endpoints", []):
-            if endpoint in link_map:
-                link_map[endpoint] += 1
-    # Build a reverse link map for interface descriptions, including remote interface names
-    endpoint_links = {}
-    endpoint_iface_map = {}
-    for link in global_links:
-        endpoints = link.get("endpoints", [])
-        if len(endpoints) == 2:
-            dev_a, dev_b = endpoints
-            # Map device to its connected device and link index
-            if dev_a not in endpoint_links:
-                endpoint_links[dev_a] = []
-            if dev_b not in endpoint_links:
-                endpoint_links[dev_b] = []
-            endpoint_links[dev_a].append(dev_b)
-            endpoint_links[dev_b].append(dev_a)
-            # Store link index for interface mapping
-            if dev_a not in endpoint_iface_map:
-                endpoint_iface_map[dev_a] = {}
-            if dev_b not in endpoint_iface_map:
-                endpoint_iface_map[dev_b] = {}
-            # Assume interface index matches order of links for now
-            idx_a = endpoint_links[dev_a].index(dev_b)
-            idx_b = endpoint_links[dev_b].index(dev_a)
-            endpoint_iface_map[dev_a][dev_b] = idx_a
-            endpoint_iface_map[dev_b][dev_a] = idx_b
+    # One pass over the links: connected ports per device, named for each device's node definition
+    global_links = concrete_model(st.session_state.get('last_mcp_model') or {}).get('network_design', {}).get('links', [])
+    port_index = build_port_index(devices, global_links)
+    loopbacks = [(dev["name"], iface["ip"]) for dev in devices for iface in dev.get("interfaces", []) if iface.get("is_loopback") and iface.get("ip")]
 
     # Determine which protocols were requested in the parsed model
     requested_protocol = None
@@ -618,8 +94,13 @@ def edit_devices_ui(devices, node_definitions, valid_types, context_prefix="chat
 
     for idx, device in enumerate(devices):
         dev_type = device.get("type", "router")
-        iface_count = link_map.get(device["name"], 1)
+        ports = port_index.get(device["name"], [])
+        iface_count = len(ports)
         node_def, max_ifaces = select_node_definition(dev_type, iface_count)
+        if device.get("node_definition") in CML_NODE_INTERFACE_LIMITS:
+            # Keep the node definition the ports were allocated for
+            node_def = device["node_definition"]
+            max_ifaces = CML_NODE_INTERFACE_LIMITS[node_def]
         # UI warning if interface count exceeds any supported node definition
         if dev_type == "router" and iface_count > max_ifaces:
             st.warning(f"Device {device['name']} requires {iface_count} interfaces, but the max supported for routers is {max_ifaces} (CSR1000v). Reduce links or split the device.")
@@ -641,32 +122,31 @@ def edit_devices_ui(devices, node_definitions, valid_types, context_prefix="chat
             st.caption(f"💡 Max interfaces for {node_def}: {max_ifaces}")
             interface_count = min(iface_count, max_ifaces)
             interface_configs = []
-            existing_ifaces = device.get("interfaces", [])
-            # Get connected devices for this node
-            connected_devices = endpoint_links.get(device["name"], [])
-            for i in range(interface_count):
-                iface_prefix = "eth" if dev_type in ["server", "ext-server", "alpine", "win10-desktop"] else "GigabitEthernet0"
-                iface = f"{iface_prefix}/{i}" if "GigabitEthernet" in iface_prefix else f"{iface_prefix}{i}"
-                ip = st.text_input(f"IP for {iface}", value=existing_ifaces[i]["ip"] if i < len(existing_ifaces) else f"192.168.{idx}.{i+1}", key=f"{context_prefix}_iface_{idx}_{i}")
-                # Enhanced auto-desc: include remote device and remote interface name if possible
-                auto_desc = ""
-                if i < len(connected_devices):
-                    remote_dev = connected_devices[i]
-                    remote_iface_idx = endpoint_iface_map.get(remote_dev, {}).get(device["name"], None)
-                    if remote_iface_idx is not None:
-                        remote_iface_prefix = "eth" if dev_type in ["server", "ext-server", "alpine", "win10-desktop"] else "GigabitEthernet0"
-                        remote_iface = f"{remote_iface_prefix}/{remote_iface_idx}" if "GigabitEthernet" in remote_iface_prefix else f"{remote_iface_prefix}{remote_iface_idx}"
-                        auto_desc = f"Connection to {remote_dev} ({remote_iface})"
-                    else:
-                        auto_desc = f"Connection to {remote_dev}"
-                iface_desc = st.text_input(f"Description for {iface}", value=existing_ifaces[i]["desc"] if i < len(existing_ifaces) and "desc" in existing_ifaces[i] else auto_desc, key=f"{context_prefix}_desc_{idx}_{i}")
-                interface_configs.append((iface, ip, None, iface_desc))
-            raw_config = device.get("config", "")
-            has_ospf_config = "router ospf" in raw_config
-            has_eigrp_config = "router eigrp" in raw_config
-            has_bgp_config = "router bgp" in raw_config
+            existing_ifaces = [iface for iface in device.get("interfaces", []) if not iface.get("is_loopback")]
+            existing_by_name = {iface.get("name"): iface for iface in existing_ifaces}
+            for i, port in enumerate(ports[:interface_count]):
+                iface = port["name"]
+                existing = existing_by_name.get(iface) or (existing_ifaces[i] if i < len(existing_ifaces) else {})
+                ip = st.text_input(f"IP for {iface}", value=existing.get("ip", f"192.168.{idx}.{i+1}"), key=f"{context_prefix}_iface_{idx}_{i}")
+                # Auto-desc includes the remote device and its interface on this link
+                auto_desc = f"Connection to {port['peer']} ({port['peer_interface']})"
+                iface_desc = st.text_input(f"Description for {iface}", value=existing.get("desc", auto_desc), key=f"{context_prefix}_desc_{idx}_{i}")
+                interface_configs.append({
+                    "name": iface,
+                    "description": iface_desc,
+                    "ip": ip,
+                    "mask": existing.get("mask", "255.255.255.0"),
+                    "ipv6": existing.get("ipv6"),
+                    "ipv6_prefix": existing.get("ipv6_prefix", 127)
+                })
+            configured = parse_config(device.get("config", "")).protocols()
+            has_ospf_config = "OSPF" in configured
+            has_eigrp_config = "EIGRP" in configured
+            has_bgp_config = "BGP" in configured
             ospf_config = {}
             eigrp_config = {}
+            # Generated BGP designs (see NetworkBGP) prefill the form
+            bgp_design = device.get("bgp") or {}
             bgp_config = {}
             # --- Protocol auto-enable logic ---
             auto_enable_ospf = (requested_protocol == "OSPF" and device.get("type") == "router")
@@ -717,12 +197,12 @@ def edit_devices_ui(devices, node_definitions, valid_types, context_prefix="chat
             if enable_bgp:
                 bgp_asn = st.text_input(
                     f"BGP Autonomous System Number",
-                    value=bgp_config.get("asn", "65001"),
+                    value=str(bgp_design.get("asn", "65001")),
                     key=f"{context_prefix}_bgp_asn_{idx}"
                 )
                 bgp_neighbors = st.text_area(
                     f"BGP Neighbors (one IP per line)",
-                    value="\n".join(bgp_config.get("neighbors", ["192.0.2.2"])),
+                    value="\n".join([neighbor["address"] for neighbor in bgp_design.get("neighbors", [])] or ["192.0.2.2"]),
                     key=f"{context_prefix}_bgp_neighbors_{idx}"
                 )
                 bgp_networks = st.text_area(
@@ -745,99 +225,40 @@ def edit_devices_ui(devices, node_definitions, valid_types, context_prefix="chat
             updated_device["name"] = name
             updated_device["type"] = dev_type
             updated_device["node_definition"] = node_def
-            default_configs = {
-                "router": "hostname {hostname}\n",
-                "switch": "hostname {hostname}\nspanning-tree mode rapid-pvst\n",
-                "firewall": "hostname {hostname}\n",
-                "server": "#cloud-config\nhostname: {hostname}\n",
-                "ext-server": "#cloud-config\nhostname: {hostname}\n"
+            # Render the form through the same platform templates as generate_device_configs
+            platform = node_def if dev_type == device.get("type", "router") else select_node_definition(dev_type, iface_count)[0]
+            designed_neighbors = {neighbor["address"]: neighbor for neighbor in bgp_design.get("neighbors", [])}
+            context = {
+                "hostname": name,
+                "platform": platform,
+                "interfaces": interface_configs,
+                "ospf": dict(ospf_config, networks=[network for network in ospf_config["networks"] if "/" in network]) if ospf_config else None,
+                "eigrp": dict(eigrp_config, networks=[network for network in eigrp_config["networks"] if "/" in network]) if eigrp_config else None,
+                "bgp": {
+                    "asn": bgp_config["asn"],
+                    # Neighbors from the design keep their AS, source interface and reflector role
+                    "neighbors": [designed_neighbors.get(neighbor.strip(), {"address": neighbor.strip(), "remote_as": bgp_config["asn"]})
+                                  for neighbor in bgp_config["neighbors"] if neighbor.strip()],
+                    "networks": [network for network in bgp_config["networks"] if "/" in network]
+                } if bgp_config else None,
+                "static_routes": [tuple(static_entry) for static_entry in static_config]
             }
-            base_config = default_configs.get(dev_type, "hostname {hostname}\n")
-            config_lines = [base_config.format(hostname=name).strip()]
-            for iface, ip, vlan, desc in interface_configs:
-                config_lines.append(f"interface {iface}")
-                if desc:
-                    config_lines.append(f" description {desc}")
-                if vlan:
-                    config_lines.append(f" encapsulation dot1Q {vlan}")
-                config_lines.append(f" ip address {ip} 255.255.255.0")
-                config_lines.append(" no shutdown")
-            if ospf_config:
-                config_lines.append(f"router ospf {ospf_config['process_id']}")
-                for network in ospf_config["networks"]:
-                    if "/" in network:
-                        ip, mask_length = network.split("/")
-                        mask = {
-                            "8": "255.0.0.0",
-                            "16": "255.255.0.0",
-                            "24": "255.255.255.0",
-                            "30": "255.255.255.252"
-                        }.get(mask_length, "255.255.255.0")
-                        config_lines.append(f" network {ip} {mask} area {ospf_config['area']}")
-            if eigrp_config:
-                config_lines.append(f"router eigrp {eigrp_config['as_number']}")
-                for network in eigrp_config["networks"]:
-                    if "/" in network:
-                        ip, _ = network.split("/")
-                        config_lines.append(f" network {ip}")
-                config_lines.append(" no auto-summary")
-            if bgp_config:
-                config_lines.append(f"router bgp {bgp_config['asn']}")
-                for neighbor in bgp_config["neighbors"]:
-                    config_lines.append(f" neighbor {neighbor} remote-as {bgp_config['asn']}")
-                for network in bgp_config["networks"]:
-                    if "/" in network:
-                        ip, mask_length = network.split("/")
-                        mask = {
-                            "8": "255.0.0.0",
-                            "16": "255.255.0.0",
-                            "24": "255.255.255.0",
-                            "30": "255.255.255.252"
-                        }.get(mask_length, "255.255.255.0")
-                        config_lines.append(f" network {ip} mask {mask}")
-            for static_entry in static_config:
-                dest, mask, next_hop = static_entry
-                config_lines.append(f"ip route {dest} {mask} {next_hop}")
-                
+
             # Add VXLAN configuration if necessary
             if "VTEP" in name or "vxlan_config" in updated_device:
                 vxlan_config = updated_device.get("vxlan_config", {})
-                l2vnis = vxlan_config.get("l2vnis", [])
-                l3vni = vxlan_config.get("l3vni", 50000)
-                
-                # Configure VXLAN features
-                config_lines.append("nv overlay evpn")
-                config_lines.append("feature vn-segment-vlan-based")
-                config_lines.append("feature nv overlay")
-                config_lines.append("feature bgp")
-                config_lines.append("feature interface-vlan")
-                
-                # Configure VLANs for VNIs
-                for i, vni in enumerate(l2vnis):
-                    vlan_id = 100 + i
-                    config_lines.append(f"vlan {vlan_id}")
-                    config_lines.append(f" name VXLAN-{vni}")
-                    config_lines.append(f" vn-segment {vni}")
-                
-                # Configure BGP for EVPN
-                loopback_ips = [iface for iface in updated_device.get("interfaces", []) if iface.get("is_loopback")]
-                if loopback_ips:
-                    vtep_ip = loopback_ips[0]["ip"]
-                    config_lines.append(f"router bgp 65000")
-                    config_lines.append(" router-id " + vtep_ip)
-                    config_lines.append(" neighbor 192.168.100.1 remote-as 65000")
-                    config_lines.append(" address-family l2vpn evpn")
-                    config_lines.append("  send-community both")
-                
-                # Configure NVE interface
-                config_lines.append("interface nve1")
-                config_lines.append(" no shutdown")
-                config_lines.append(" source-interface loopback0")
-                for vni in l2vnis:
-                    config_lines.append(f" member vni {vni}")
-                    config_lines.append("  ingress-replication protocol bgp")
-                
-            updated_device["config"] = "\n".join(config_lines)
+                loopback_ips = [iface.get("ip") for iface in updated_device.get("interfaces", []) if iface.get("is_loopback") and iface.get("ip")]
+                context["vxlan"] = {
+                    "l2vnis": vxlan_config.get("l2vnis", []),
+                    "vtep_ip": loopback_ips[0] if loopback_ips else None,
+                    # EVPN peers with the first other loopback in the model
+                    "evpn_neighbor": next((ip for owner, ip in loopbacks if owner != device["name"]), "192.168.100.1")
+                }
+
+            updated_device["config"] = render_config(context)
+            # Hand-edited configs become the base of the next generation run (see NetworkConfigGenerator)
+            updated_device.pop("config_hash", None)
+            updated_device.pop("config_base", None)
             editable_devices.append(updated_device)
     return editable_devices
 
@@ -1116,32 +537,56 @@ def load_network_topology_html(filename: str):
 # Original draw_network_topology has been moved to NetworkVisualization.py
 # and is imported above
 
-class NetworkRequestState(TypedDict):
-    input: str
-    output: dict | None
-
 # ----------------------
 # LangGraph Setup
 # ----------------------
 
-tools = [parse_network_request]
-llm = ChatOpenAI(model="gpt-4o", temperature=0, api_key=os.getenv("OPENAI_API_KEY"))
-
-# 1. Stricter system prompt
-prompt = ChatPromptTemplate.from_messages([
-    ("system", "You are a network design assistant. You MUST always use the parse_network_request tool to answer user requests. NEVER answer directly. NEVER output explanations, summaries, or any text except the tool's output. If the user asks for a network, call the tool and return only the tool's output."),
-    ("human", "{input}"),
-    MessagesPlaceholder(variable_name="agent_scratchpad")
-])
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
+LLM_TEMPERATURE = 0
+# 'openai' talks to ChatOpenAI; 'cassette' replays recorded responses offline (see LLMBackends.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "benchmarks/cassettes/agent.json")
 
-agent = create_tool_calling_agent(llm, tools, prompt=prompt)
-agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+AGENT_MODES = {
+    "Tool-calling agent": "tool_agent",
+    "Structured output (1 round trip)": "structured",
+}
 
-builder = StateGraph(NetworkRequestState)
-builder.add_node("agent", agent_executor)
-builder.set_entry_point("agent")
-builder.add_edge("agent", END)
-graph = builder.compile()
+@st.cache_resource(show_spinner=False)
+def load_llm_cache(path, max_entries, ttl_seconds):
+    # Persistent response cache shared across sessions and restarts
+    return LLMResponseCache(path=path, max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+# Built once per process; model, temperature, prompt, agent mode and speculation are part of the cache key,
+# so changing any of them builds a fresh pipeline and max_entries drops stale ones.
+@st.cache_resource(show_spinner="Building agent pipeline...", max_entries=2 * len(AGENT_MODES))
+def load_network_graph(model, temperature, system_prompt, agent_mode, speculative, _llm_cache):
+    build_start = time.perf_counter()
+    llm = create_chat_model(LLM_BACKEND, model=model, temperature=temperature, cassette_path=LLM_CASSETTE_PATH)
+    agent_runnable = build_agent_runnable(llm, system_prompt, agent_mode=agent_mode)
+
+    # Recognizable requests are answered by the offline parser; the agent is only a fallback.
+    # With speculative execution the parser and the agent race instead of running one after the other
+    graph = build_network_graph(cached_agent_node(agent_runnable, _llm_cache, model, temperature, system_prompt, LLM_BACKEND), speculative=speculative)
+    return graph, time.perf_counter() - build_start
+
+llm_cache = load_llm_cache(
+    os.getenv("LLM_CACHE_PATH", "saved_models/llm_response_cache.sqlite"),
+    int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500")),
+    int(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600
+)
+agent_mode_label = st.sidebar.selectbox(
+    "🤖 Agent Mode",
+    list(AGENT_MODES.keys()),
+    help="Structured output asks the model for the topology JSON directly, halving LLM round trips."
+)
+agent_mode = AGENT_MODES[agent_mode_label]
+stream_progress = st.sidebar.toggle("📡 Stream Progress", value=True, help="Show pipeline steps and an early diagram while the topology is generated.")
+speculative_execution = st.sidebar.toggle("🏁 Speculative Execution", value=False, help="Run the offline parser and the LLM agent at the same time; the first valid topology wins.")
+active_system_prompt = STRUCTURED_SYSTEM_PROMPT if agent_mode == "structured" else SYSTEM_PROMPT
+lookup_start = time.perf_counter()
+graph, graph_build_seconds = load_network_graph(LLM_MODEL, LLM_TEMPERATURE, active_system_prompt, agent_mode, speculative_execution, llm_cache)
+graph_lookup_seconds = time.perf_counter() - lookup_start
 
 # ----------------------
 # Streamlit UI with Chat History
@@ -1155,7 +600,34 @@ st.session_state['dark_mode_active'] = dark_mode # Store in session state
 design_mode = st.sidebar.toggle("💡 Design Mode (Offline Templates)", value=False)
 st.session_state["design_mode"] = design_mode
 
-logo_light = Image.open("assets/graph2lab_logo.png")
+# Address families for generated topologies (IPv6 uses /127 links and /128 loopbacks)
+ADDRESSING_MODES = {"IPv4": "ipv4", "Dual-stack (IPv4 + IPv6)": "dual", "IPv6 only": "ipv6"}
+address_family = ADDRESSING_MODES[st.sidebar.selectbox("🌐 Addressing", list(ADDRESSING_MODES.keys()))]
+# Collapse contiguous link subnets in OSPF/EIGRP/BGP network statements (off = one exact statement per link)
+summarize_routes = st.sidebar.toggle("📉 Summarize Network Statements", value=True)
+# BGP: iBGP through route reflectors; optionally one AS per site with eBGP between sites
+bgp_options = {"ebgp_per_site": st.sidebar.toggle("🔀 eBGP Between Sites", value=False)}
+# OSPF: backbone area 0 between core routers, one area per site (summarized at the ABRs with summarization on)
+ospf_options = {"multi_area": st.sidebar.toggle("🗺️ Multi-Area OSPF", value=False), "area_ranges": summarize_routes}
+
+# VXLAN fabric: VTEP loopback pool and VNI ranges (defaults from the environment, see README)
+with st.sidebar.expander("🧵 VXLAN Fabric", expanded=False):
+    vtep_loopback_network = st.text_input(
+        "VTEP Loopback Pool", value=os.getenv("VTEP_LOOPBACK_NETWORK", VTEP_LOOPBACK_NETWORK),
+        help="One /32 per VTEP; a /16 holds 65534 VTEPs. Only used for models without a loopback pool yet."
+    )
+    l2vni_first, l2vni_last = (int(vni) for vni in os.getenv("VXLAN_L2VNI_RANGE", f"{L2VNI_RANGE[0]}-{L2VNI_RANGE[1]}").split("-"))
+    l2vni_columns = st.columns(2)
+    l2vni_first = l2vni_columns[0].number_input("First L2 VNI", min_value=1, max_value=0xFFFFFF, value=l2vni_first)
+    l2vni_last = l2vni_columns[1].number_input("Last L2 VNI", min_value=1, max_value=0xFFFFFF, value=l2vni_last)
+    l3vni = st.number_input("L3 VNI", min_value=1, max_value=0xFFFFFF, value=int(os.getenv("VXLAN_L3VNI", L3VNI)))
+    try:
+        vxlan_fabric = VXLANFabricAllocator(vtep_loopback_network, (int(l2vni_first), int(l2vni_last)), int(l3vni))
+    except ValueError as e:
+        st.error(f"Invalid VXLAN fabric settings, using the defaults: {e}")
+        vxlan_fabric = VXLANFabricAllocator()
+
+logo_light = Image.open("assets/Graph2Lab_Logo.png")
 logo_dark_path = "assets/graph2lab_logo_dark.png"
 logo_dark = logo_light  # Default fallback
 
@@ -1306,20 +778,16 @@ if template_choice != "Select...":
     # --- Quick Summary Panel Below Template Selector ---
     summary = selected_template.get("network_design", {})
     devices = summary.get("devices", [])
-    links = summary.get("links", [])
     device_types = [dev.get("type", "unknown") for dev in devices]
     protocols = set()
     for dev in devices:
-        config = dev.get("config", "")
-        if "ospf" in config: protocols.add("OSPF")
-        if "eigrp" in config: protocols.add("EIGRP")
-        if "bgp" in config: protocols.add("BGP")
+        protocols.update(protocol for protocol in parse_config(dev.get("config", "")).protocols() if protocol != "Static")
 
     st.sidebar.markdown("### 🧾 Template Summary")
     st.sidebar.markdown(f"**Devices:** {len(devices)}")
     for dev_type in set(device_types):
         st.sidebar.markdown(f"- {dev_type.title()}: {device_types.count(dev_type)}")
-    st.sidebar.markdown(f"**Links:** {len(links)}")
+    st.sidebar.markdown(f"**Links:** {count_links(summary)}")
     st.sidebar.markdown(f"**Protocols:** {', '.join(protocols) if protocols else 'None detected'}")
 
     tab1, tab2, tab3, tab4 = st.tabs(["🖼 Topology Viewer", "🛠 Customize Devices", "📋 Deployment Summary", "🔍 Validation & Health"])
@@ -1333,11 +801,11 @@ if template_choice != "Select...":
         
         with st.spinner("Rendering network diagram..."):
             # Always call Plotly version, passing dark_mode
-            draw_network_topology_plotly(selected_template, dark_mode=st.session_state.get('dark_mode_active', False))
+            draw_network_topology_plotly(concrete_model(selected_template), dark_mode=st.session_state.get('dark_mode_active', False))
             
         # --- Show device interface/IP table ---
         st.markdown("### Device Interface Details")
-        for dev in devices:
+        for dev in concrete_model(selected_template)["network_design"].get("devices", []):
             st.markdown(f"**{dev['name']} ({dev['type']})**")
             if "interfaces" in dev and dev["interfaces"]:
                 st.table([
@@ -1372,7 +840,8 @@ if template_choice != "Select...":
         st.subheader("🛠️ Customize Device Configurations Before Deployment")
         mcp_model = st.session_state.get('last_mcp_model', None)
         if mcp_model is not None:
-            devices = mcp_model["network_design"].get("devices", [])
+            # Edit the devices with all their interfaces, mesh links included
+            devices = concrete_model(mcp_model)["network_design"].get("devices", [])
             if devices:
                 available_defs = {
                     "router": "iosv",
@@ -1389,10 +858,10 @@ if template_choice != "Select...":
                 node_definitions = available_defs
                 edited_devices = edit_devices_ui(devices, node_definitions, valid_types, context_prefix="chat")
                 if st.button("💾 Apply Edits to Devices (Chat)"):
-                    mcp_model["network_design"]["devices"] = edited_devices
+                    apply_device_edits(mcp_model, edited_devices)
                     st.success("✅ Updated device configurations applied.")
                     # Use Plotly for visualization, passing dark_mode
-                    draw_network_topology_plotly(mcp_model, dark_mode=st.session_state.get('dark_mode_active', False))
+                    draw_network_topology_plotly(concrete_model(mcp_model), dark_mode=st.session_state.get('dark_mode_active', False))
                 if st.button("🔄 Reset Device Edits (Chat)"):
                     st.rerun()
             else:
@@ -1403,7 +872,6 @@ if template_choice != "Select...":
     with tab3:
         st.markdown("### 📋 Full Deployment Summary")
 
-        import re
         if edited_devices:
             summary_data = []
             def format_protocol_badges(protocol_list):
@@ -1419,71 +887,29 @@ if template_choice != "Select...":
                 name = dev.get("name", "Unnamed")
                 dev_type = dev.get("type", "unknown").title()
                 definition = dev.get("node_definition", "iosv")
-                config = dev.get("config", "")
-                protocols = []
-                vlans = set()
-                interfaces = []
-                ospf_pid = ospf_area = ""
-                ospf_networks = []
+                parsed = parse_config(dev.get("config", ""))
+                protocols = parsed.protocols()
+                vlans = parsed.vlans()
+                interfaces = [f"{iface} ({ip})" if ip else iface for iface, ip in parsed.interface_addresses()]
+
+                # --- OSPF ---
+                ospf_pid = parsed.process_id("OSPF")
+                ospf_networks = [f"network {network}" for network in parsed.networks("OSPF") if " area " in network]
+                ospf_area = ospf_networks[-1].split("area")[-1].strip() if ospf_networks else ""
 
                 # --- Protocol variables for EIGRP, BGP, Static ---
-                eigrp_as = ""
-                eigrp_networks = []
-                bgp_asn = ""
-                bgp_neighbors = []
-                bgp_networks = []
-                static_route_lines = []
-
-                current_iface = None
-                for line in config.splitlines():
-                    stripped = line.strip()
-                    if stripped.startswith("interface"):
-                        iface = stripped.split("interface")[-1].strip()
-                        interfaces.append(iface)
-                        current_iface = iface
-                    elif "ip address" in stripped:
-                        ip = stripped.split("ip address")[-1].strip().split()[0]
-                        if interfaces:
-                            interfaces[-1] = f"{interfaces[-1]} ({ip})"
-                    elif "encapsulation dot1Q" in stripped:
-                        vlan_id = stripped.split()[-1]
-                        vlans.add(vlan_id)
-                    elif stripped.startswith("router ospf"):
-                        ospf_pid = stripped.split()[-1]
-                    elif "area" in stripped and "network" in stripped:
-                        ospf_area = stripped.split("area")[-1].strip()
-                        ospf_networks.append(stripped.strip())
-
-                # Protocol detection
-                if "router ospf" in config: protocols.append("OSPF")
-                if "router eigrp" in config: protocols.append("EIGRP")
-                if "router bgp" in config: protocols.append("BGP")
-                if "ip route" in config: protocols.append("Static")
-
-                # --- Parse EIGRP ---
-                if "router eigrp" in config:
-                    eigrp_as_match = re.search(r"router eigrp (\d+)", config)
-                    eigrp_as = eigrp_as_match.group(1) if eigrp_as_match else ""
-                    eigrp_networks = re.findall(r"network (\d+\.\d+\.\d+\.\d+)", config)
-
-                # --- Parse BGP ---
-                if "router bgp" in config:
-                    bgp_asn_match = re.search(r"router bgp (\d+)", config)
-                    bgp_asn = bgp_asn_match.group(1) if bgp_asn_match else ""
-                    bgp_neighbors = re.findall(r"neighbor (\S+) remote-as \d+", config)
-                    bgp_network_matches = re.findall(r"network (\d+\.\d+\.\d+\.\d+) mask (\d+\.\d+\.\d+\.\d+)", config)
-                    for ip, mask in bgp_network_matches:
-                        bgp_networks.append(f"{ip} {mask}")
-
-                # --- Parse Static Routes ---
-                static_routes = re.findall(r"ip route (\d+\.\d+\.\d+\.\d+) (\d+\.\d+\.\d+\.\d+) (\d+\.\d+\.\d+\.\d+)", config)
-                static_route_lines = [f"{dest} {mask} {nh}" for dest, mask, nh in static_routes]
+                eigrp_as = parsed.process_id("EIGRP")
+                eigrp_networks = [network.split()[0] for network in parsed.networks("EIGRP")]
+                bgp_asn = parsed.process_id("BGP")
+                bgp_neighbors = [address for address, _ in parsed.neighbors()]
+                bgp_networks = [network.replace(" mask ", " ") for network in parsed.networks("BGP")]
+                static_route_lines = parsed.static_routes()
 
                 row = {
                     "Device": name,
                     "Type": dev_type,
                     "Image": definition,
-                    "VLANs": ", ".join(sorted(vlans)) if vlans else "-",
+                    "VLANs": ", ".join(vlans) if vlans else "-",
                     "Protocols": format_protocol_badges(protocols) if protocols else "None",
                     "OSPF PID": ospf_pid,
                     "OSPF Area": ospf_area,
@@ -1557,10 +983,8 @@ if template_choice != "Select...":
         
         if 'last_mcp_model' in st.session_state and st.session_state['last_mcp_model']:
             # Create validator instance
-            validator = NetworkValidator(
-                st.session_state['last_mcp_model']["network_design"]["devices"],
-                st.session_state['last_mcp_model']["network_design"]["links"]
-            )
+            validation_design = concrete_model(st.session_state['last_mcp_model'])["network_design"]
+            validator = NetworkValidator(validation_design["devices"], validation_design["links"])
             
             # Run validation
             validation_results = validator.validate_topology()
@@ -1644,6 +1068,30 @@ with st.sidebar.expander("💾 Save Topology as JSON Snapshot", expanded=False):
         st.info("ℹ️ No MCP model available to save.")
 
 
+# ----------------------
+# LLM Response Cache (Sidebar)
+# ----------------------
+with st.sidebar.expander("🗄 LLM Response Cache", expanded=False):
+    cache_stats = llm_cache.stats()
+    st.markdown(f"**Entries:** {cache_stats['entries']}")
+    st.markdown(f"**Hits / Misses:** {cache_stats['hits']} / {cache_stats['misses']} ({cache_stats['hit_rate']:.0%} hit rate)")
+    if st.button("🧹 Clear LLM Cache"):
+        llm_cache.clear()
+        st.success("✅ LLM response cache cleared.")
+
+# ----------------------
+# Agent Pipeline (Sidebar)
+# ----------------------
+with st.sidebar.expander("⚙️ Agent Pipeline", expanded=False):
+    st.markdown(f"**Model:** {LLM_MODEL} (temperature {LLM_TEMPERATURE}, backend {LLM_BACKEND})")
+    st.markdown(f"**Mode:** {agent_mode_label}")
+    st.markdown(f"**One-time build:** {graph_build_seconds * 1000:.0f} ms")
+    st.markdown(f"**This rerun:** {graph_lookup_seconds * 1000:.1f} ms")
+    st.caption(f"Saved about {max(graph_build_seconds - graph_lookup_seconds, 0) * 1000:.0f} ms of setup on every rerun after the first.")
+    if st.button("♻️ Rebuild Agent Pipeline"):
+        load_network_graph.clear()
+        st.rerun()
+
 # ----------------------
 # Lab Name: Move to Sidebar
 # ----------------------
@@ -1668,25 +1116,41 @@ if user_input:
     with st.spinner("Thinking..."):
         try:
             # Avoid global declaration issues by always using st.session_state
-            result = graph.invoke({"input": user_input})
+            if stream_progress:
+                # Surface pipeline events as they happen instead of waiting on the whole run
+                pipeline_status = st.status("Routing request...", expanded=True)
+                result = {}
+                for event, payload in stream_network_request(graph, user_input):
+                    if event == "node_finished" and payload["node"] == "fast_path":
+                        if payload.get("route") == "fast_path":
+                            pipeline_status.write("⚡ Matched by the offline parser")
+                        else:
+                            pipeline_status.write("🤖 Handing request to the LLM agent")
+                    elif event == "speculation_won":
+                        pipeline_status.write(f"🏁 Speculative race won by `{payload['winner']}`")
+                    elif event == "cache_hit":
+                        pipeline_status.write("🗄 Found a cached LLM response")
+                    elif event == "llm_started":
+                        pipeline_status.update(label=f"Waiting for {payload['model']}...")
+                    elif event == "tool_call":
+                        pipeline_status.write(f"🛠 Tool call started: `{payload['tool']}`")
+                    elif event == "tool_result":
+                        pipeline_status.write(f"📥 Tool `{payload['tool']}` returned a result")
+                    elif event == "result":
+                        result = payload
+                pipeline_status.update(label=f"Request handled ({result.get('route')})", state="complete")
+            else:
+                pipeline_status = None
+                result = graph.invoke({"input": user_input})
             st.write("DEBUG: Raw agent result:", result)  # Debug print
             output = result.get("output", None)
+            if result.get("route") == "fast_path":
+                st.info("⚡ Request recognized by the offline parser – skipped the LLM.")
+            elif result.get("route") == "cache":
+                st.info("🗄 Replayed a cached LLM response for this request.")
+            elif result.get("route") == "template_fallback":
+                st.info("🔄 Neither the parser nor the agent produced a topology – using the closest template.")
             
-            # 2. Only accept output if it is a dict (or valid JSON)
-            def is_valid_topology_dict(d):
-                return (
-                    isinstance(d, dict) and
-                    isinstance(d.get("devices", None), list) and
-                    isinstance(d.get("links", None), list)
-                )
-
-            def normalize_links(topology):
-                # Convert 'source'/'target' to 'endpoints' if needed
-                for link in topology.get("links", []):
-                    if "source" in link and "target" in link:
-                        link["endpoints"] = [link.pop("source"), link.pop("target")]
-                return topology
-
             # Try to parse output if it's a string
             if output and isinstance(output, str):
                 try:
@@ -1696,18 +1160,7 @@ if user_input:
 
             # If output is a list, pick the one with the most devices and links
             if isinstance(output, list):
-                best = None
-                best_score = -1
-                for candidate in output:
-                    if is_valid_topology_dict(candidate):
-                        # Calculate a score based on non-empty devices and links
-                        device_score = len([d for d in candidate["devices"] if isinstance(d.get("name"), str) and len(d.get("name", "")) > 1])
-                        link_score = len(candidate["links"])
-                        score = device_score + link_score
-                        if score > best_score:
-                            best = candidate
-                            best_score = score
-                output = best if best is not None else output[0] if isinstance(output, list) and len(output) > 0 else output
+                output = select_best_topology(output)
 
             # If output is a dict, but has empty devices or links, try to warn the user
             if output and is_valid_topology_dict(output):
@@ -1719,7 +1172,7 @@ if user_input:
                 # Check for valid device names (not just single characters or generic terms)
                 valid_devices = [d for d in output["devices"] if isinstance(d.get("name"), str) and len(d.get("name", "")) > 1 and d["name"] not in ["S", "Routers"]]
                 
-                if not valid_devices or not output["links"]:
+                if not valid_devices or not has_links(output):
                     # First try to detect if this is a common topology pattern
                     pattern_result = detect_topology_pattern(user_input)
                     
@@ -1793,35 +1246,57 @@ if user_input:
                             
                             st.success("✅ Network topology generated successfully!")
                             st.write("DEBUG: Using topology:", output)
+                            # Mesh templates arrive as compact link patterns; addressing, configs and
+                            # the plot work on a copy with every link expanded
+                            design = concrete_topology(output)
+                            working_model = {"network_design": design}
+                            
+                            # Draw a preview as soon as devices and links exist; replaced by the full viewer below
+                            topology_preview = st.empty()
+                            if pipeline_status is not None:
+                                pipeline_status.write(f"📐 Topology parsed: {len(output['devices'])} devices, {count_links(output)} links")
+                                with topology_preview.container():
+                                    draw_network_topology_plotly(working_model, dark_mode=st.session_state.get('dark_mode_active', False))
                             
                             # Safety check before calling IP assignment
                             try:
-                                # Assign IPs first (modifies devices/links in-place if needed for VXLAN)
-                                vxlan_enabled = assign_ip_addresses(output.get("devices", []), output.get("links", []))
+                                # Assign IPs first (modifies devices/links in-place if needed for VXLAN);
+                                # allocations are kept in output['ipam'] so later edits only renumber what changed
+                                vxlan_enabled = update_ip_addresses(design, fabric=vxlan_fabric, address_family=address_family)["vxlan_enabled"]
+                                if pipeline_status is not None:
+                                    pipeline_status.write("🌐 IP addresses assigned")
 
                                 # --- Generate Protocol Config --- 
                                 requested_protocol = output.get("protocol")
                                 if requested_protocol:
                                     st.info(f"⚙️ Generating config for {requested_protocol}...")
-                                    # Get devices/links potentially modified by assign_ip_addresses
+                                    # Get devices/links potentially modified by update_ip_addresses
                                     current_devices = output.get("devices", [])
-                                    current_links = output.get("links", [])
-                                    # Generate configs including the requested protocol
-                                    devices_with_config = generate_device_configs(current_devices, current_links, requested_protocol=requested_protocol)
+                                    # Generate configs including the requested protocol; unchanged devices are skipped
+                                    update_device_configs(design, requested_protocol=requested_protocol, summarize=summarize_routes,
+                                                          bgp_options=bgp_options, ospf_options=ospf_options)
                                     # --- IMPORTANT: Update the model in session state --- 
-                                    network_model["network_design"]["devices"] = devices_with_config
+                                    network_model["network_design"]["devices"] = current_devices
                                     st.session_state['last_mcp_model'] = network_model # Ensure session has updated devices
                                     st.info(f"✅ {requested_protocol} config generated.")
+                                    if pipeline_status is not None:
+                                        pipeline_status.write(f"⚙️ {requested_protocol} configs generated")
                                     
                                 if vxlan_enabled:
                                     st.info("🔄 VXLAN overlay configured with appropriate VTEPs and VNIs")
                             except Exception as e:
                                 st.error(f"❌ Error during IP/Config generation: {str(e)}")
+                            # The session keeps the compact model; the addressed concrete design stays cached for its consumers
+                            network_model["network_design"] = compact_design(design, output.get("link_patterns", []))
+                            st.session_state['last_mcp_model'] = network_model
+                            if pipeline_status is not None:
+                                pipeline_status.update(label="Topology ready", state="complete", expanded=False)
+                                topology_preview.empty()
                             
                             # Format and add the response to chat history
                             st.session_state['chat_history'].append({
                                 "role": "assistant", 
-                                "text": f"✅ Created a network with {len(valid_devices)} devices and {len(output['links'])} links."
+                                "text": f"✅ Created a network with {len(valid_devices)} devices and {count_links(output)} links."
                             })
                             
                             # Create tabs for viewing and editing the generated topology
@@ -1835,11 +1310,11 @@ if user_input:
                                 
                                 with st.spinner("Rendering network diagram..."):
                                     # Always call Plotly version, passing dark_mode
-                                    draw_network_topology_plotly(network_model, dark_mode=st.session_state.get('dark_mode_active', False))
+                                    draw_network_topology_plotly(working_model, dark_mode=st.session_state.get('dark_mode_active', False))
                                     
                                 # Show device interface/IP table 
                                 st.markdown("### Device Interface Details")
-                                for dev in output["devices"]:
+                                for dev in design["devices"]:
                                     st.markdown(f"**{dev['name']} ({dev['type']})**")
                                     if "interfaces" in dev and dev["interfaces"]:
                                         st.table([
@@ -1859,8 +1334,8 @@ if user_input:
                                 # Device customization section
                                 if 'last_mcp_model' in st.session_state:
                                     current_model = st.session_state.get('last_mcp_model')
-                                    # Use devices directly from the current_model for consistency
-                                    devices_to_edit = current_model["network_design"].get("devices", [])
+                                    # Use devices from the current_model for consistency, with the interfaces of mesh links
+                                    devices_to_edit = concrete_model(current_model)["network_design"].get("devices", [])
                                     if devices_to_edit:
                                         available_defs = {
                                             "router": "iosv",
@@ -1879,22 +1354,21 @@ if user_input:
                                         edited_devices = edit_devices_ui(devices_to_edit, node_definitions, valid_types, context_prefix="generated")
                                         if st.button("💾 Apply Edits to Devices", key="apply_edits_generated"):
                                             # Update the model in session state directly
-                                            current_model["network_design"]["devices"] = edited_devices
+                                            apply_device_edits(current_model, edited_devices)
                                             st.session_state['last_mcp_model'] = current_model # Update session state
                                             st.success("✅ Updated device configurations applied.")
                                             # Use Plotly for visualization, passing dark_mode
-                                            draw_network_topology_plotly(current_model, dark_mode=st.session_state.get('dark_mode_active', False))
+                                            draw_network_topology_plotly(concrete_model(current_model), dark_mode=st.session_state.get('dark_mode_active', False))
                                         if st.button("🔄 Reset Device Edits", key="reset_edits_generated"):
                                             st.rerun()
                             
                             with tab3:
                                 st.markdown("### 📋 Deployment Summary")
-                                import re
                                 
                                 # Always use the model from session state for the summary
                                 if 'last_mcp_model' in st.session_state:
                                     current_model_for_summary = st.session_state.get('last_mcp_model')
-                                    devices_for_summary = current_model_for_summary["network_design"].get("devices", [])
+                                    devices_for_summary = concrete_model(current_model_for_summary)["network_design"].get("devices", [])
                                     
                                     if devices_for_summary:
                                         summary_data = []  # List to hold all device summary rows
@@ -1913,18 +1387,9 @@ if user_input:
                                             name = dev.get("name", "Unnamed")
                                             dev_type = dev.get("type", "unknown").title()
                                             definition = dev.get("node_definition", "iosv")
-                                            config = dev.get("config", "")
+                                            parsed = parse_config(dev.get("config", ""))
                                             protocols = []
-                                            vlans = set()
                                             interfaces = []
-                                            ospf_pid = ospf_area = ""
-                                            ospf_networks = []
-                                            eigrp_as = ""
-                                            eigrp_networks = []
-                                            bgp_asn = ""
-                                            bgp_neighbors = []
-                                            bgp_networks = []
-                                            static_route_lines = []
                                             
                                             # Detect interfaces from the 'interfaces' list
                                             if "interfaces" in dev:
@@ -1938,58 +1403,27 @@ if user_input:
                                             if model_protocol and model_protocol not in protocols:
                                                 protocols.append(model_protocol)
                                             
-                                            # Parse config for VLANs, static routes, etc.
-                                            if config:
-                                                for line in config.splitlines():
-                                                    stripped = line.strip()
-                                                    if "encapsulation dot1Q" in stripped:
-                                                        vlan_id = stripped.split()[-1]
-                                                        vlans.add(vlan_id)
-                                                    elif stripped.startswith("router ospf"):
-                                                        ospf_pid = stripped.split()[-1]
-                                                    elif "area" in stripped and "network" in stripped:
-                                                        ospf_area = stripped.split("area")[-1].strip()
-                                                        ospf_networks.append(stripped.strip())
-                                            
                                             # Protocol detection from config (more reliable)
-                                            if "router ospf" in config:
-                                                if "OSPF" not in protocols:
-                                                    protocols.append("OSPF")
-                                            if "router eigrp" in config: 
-                                                if "EIGRP" not in protocols:
-                                                    protocols.append("EIGRP")
-                                            if "router bgp" in config: 
-                                                if "BGP" not in protocols:
-                                                    protocols.append("BGP")
-                                            if "ip route" in config: 
-                                                if "Static" not in protocols:
-                                                    protocols.append("Static")
+                                            protocols.extend(protocol for protocol in parsed.protocols() if protocol not in protocols)
                                             
-                                            # --- Parse EIGRP ---
-                                            if "router eigrp" in config:
-                                                eigrp_as_match = re.search(r"router eigrp (\d+)", config)
-                                                eigrp_as = eigrp_as_match.group(1) if eigrp_as_match else ""
-                                                eigrp_networks = re.findall(r"network (\d+\.\d+\.\d+\.\d+)", config)
-                                            
-                                            # --- Parse BGP ---
-                                            if "router bgp" in config:
-                                                bgp_asn_match = re.search(r"router bgp (\d+)", config)
-                                                bgp_asn = bgp_asn_match.group(1) if bgp_asn_match else ""
-                                                bgp_neighbors = re.findall(r"neighbor (\S+) remote-as \d+", config)
-                                                bgp_network_matches = re.findall(r"network (\d+\.\d+\.\d+\.\d+) mask (\d+\.\d+\.\d+\.\d+)", config)
-                                                for ip_bgp, mask_bgp in bgp_network_matches:
-                                                    bgp_networks.append(f"{ip_bgp} {mask_bgp}")
-                                            
-                                            # --- Parse Static Routes ---
-                                            static_routes = re.findall(r"ip route (\d+\.\d+\.\d+\.\d+) (\d+\.\d+\.\d+\.\d+) (\d+\.\d+\.\d+\.\d+)", config)
-                                            static_route_lines = [f"{dest} {mask} {nh}" for dest, mask, nh in static_routes]
+                                            # VLANs, protocol details and static routes from the parsed config (see ConfigTree)
+                                            vlans = parsed.vlans()
+                                            ospf_pid = parsed.process_id("OSPF")
+                                            ospf_networks = [f"network {network}" for network in parsed.networks("OSPF") if " area " in network]
+                                            ospf_area = ospf_networks[-1].split("area")[-1].strip() if ospf_networks else ""
+                                            eigrp_as = parsed.process_id("EIGRP")
+                                            eigrp_networks = [network.split()[0] for network in parsed.networks("EIGRP")]
+                                            bgp_asn = parsed.process_id("BGP")
+                                            bgp_neighbors = [address for address, _ in parsed.neighbors()]
+                                            bgp_networks = [network.replace(" mask ", " ") for network in parsed.networks("BGP")]
+                                            static_route_lines = parsed.static_routes()
                                             
                                             # Build the row for THIS device
                                             this_device_row = {
                                                 "Device": name,
                                                 "Type": dev_type,
                                                 "Image": definition,
-                                                "VLANs": ", ".join(sorted(vlans)) if vlans else "-",
+                                                "VLANs": ", ".join(vlans) if vlans else "-",
                                                 "Protocols": format_protocol_badges(protocols) if protocols else "None",
                                                 "OSPF PID": ospf_pid,
                                                 "OSPF Area": ospf_area,
@@ -2130,11 +1564,13 @@ with col3:
 
                 st.text("🛠 Creating lab...")
                 # Call CML Manager to create lab
-                lab, warning_msg, validation_results, health_results = cml_manager.create_lab_from_mcp(st.session_state['last_mcp_model'], st.session_state['lab_name'])
+                lab, warning_msg, validation_results, health_results = cml_manager.create_lab_from_mcp(concrete_model(st.session_state['last_mcp_model']), st.session_state['lab_name'])
                 st.success(f"✅ New Lab Created! Lab ID: {lab.id}")
                 if warning_msg:
                     st.warning(warning_msg) # Show warnings from CMLConnector
                 st.session_state['last_created_lab_id'] = lab.id
+                # Snapshot of the deployed configs, the baseline for pushing later edits
+                st.session_state['deployed_devices'] = copy.deepcopy(st.session_state['last_mcp_model']["network_design"]["devices"])
                 # Display validation/health results after deployment
                 st.session_state['validation_results'] = validation_results
                 st.session_state['health_results'] = health_results
@@ -2172,6 +1608,33 @@ with col3:
             except Exception as e:
                  st.error(f"❌ Failed to start lab: {e}")
 
+        if st.button("🔁 Push Config Changes to Lab") and st.session_state.get('last_mcp_model'):
+            try:
+                cml_manager = get_cml_manager()
+                if cml_manager:
+                    current_devices = st.session_state['last_mcp_model']["network_design"]["devices"]
+                    diff = diff_device_configs(st.session_state.get('deployed_devices', []), current_devices)
+                    if diff["added_devices"] or diff["removed_devices"]:
+                        st.warning(f"⚠️ Devices added/removed since deployment need a new lab: {', '.join(diff['added_devices'] + diff['removed_devices'])}")
+                    if not diff["changes"]:
+                        st.info("ℹ️ No config changes to push.")
+                    else:
+                        results = cml_manager.apply_config_changes(lab_id, diff, current_devices)
+                        st.success(f"✅ Pushed changes to {len(results['applied'])} running nodes, staged {len(results['staged'])} startup configs.")
+                        for name, error in results["errors"].items():
+                            st.error(f"❌ {name}: {error}")
+                        pushed = set(results["applied"]) | set(results["staged"])
+                        # Move the baseline forward for the nodes that took their changes
+                        deployed = {dev["name"]: dev for dev in st.session_state.get('deployed_devices', [])}
+                        for dev in current_devices:
+                            if dev["name"] in pushed:
+                                deployed[dev["name"]] = copy.deepcopy(dev)
+                        st.session_state['deployed_devices'] = list(deployed.values())
+                else:
+                    st.warning("⚠️ CML connection not available.")
+            except Exception as e:
+                st.error(f"❌ Failed to push config changes: {e}")
+
         if st.button("⏹ Stop Lab"):
             try:
                 cml_manager = get_cml_manager()
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+LLM_BACKENDS = ["openai", "cassette"]
+# Serializes cassette reads/writes across Streamlit sessions and benchmark threads
+_cassette_lock = threading.Lock()
+_loaded_cassettes = {}
+
+class CassetteChatModel(BaseChatModel):
+    """Deterministic offline stand-in for ChatOpenAI, replaying responses recorded per prompt.
+
+    Responses are looked up by a hash of the conversation (message types, contents, tool calls)
+    and the names of the bound tools. On a miss the model either forwards the call to
+    `record_from` and stores the answer in the cassette, or falls back to the behaviour the
+    system prompt asks of the real model: call the bound tool with the user's text, then return
+    the tool's output verbatim. For structured output (the topology schema bound as the only
+    tool) the fallback answers the schema from the offline fast-path parser.
+    """
+
+    cassette_path: str
+    record_from: Optional[BaseChatModel] = None
+    model_name: str = "cassette"
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    # --- Cassette storage ---
+    def _load(self):
+        if not os.path.exists(self.cassette_path):
+            return {}
+        # Re-read only when the file changed, so replay doesn't pay a JSON parse per call
+        mtime = os.path.getmtime(self.cassette_path)
+        loaded = _loaded_cassettes.get(self.cassette_path)
+        if loaded is None or loaded[0] != mtime:
+            with open(self.cassette_path, "r") as f:
+                loaded = (mtime, json.load(f))
+            _loaded_cassettes[self.cassette_path] = loaded
+        return dict(loaded[1])
+
+    def _save(self, cassette):
+        directory = os.path.dirname(self.cassette_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.cassette_path, "w") as f:
+            json.dump(cassette, f, indent=4, sort_keys=True)
+
+    @staticmethod
+    def cassette_key(messages: List[BaseMessage], tools=None):
+        """Hash of everything that determines the answer; tool call IDs are left out on purpose."""
+        payload = {
+            "messages": [
+                {
+                    "type": message.type,
+                    "content": message.content,
+                    "tool_calls": [
+                        {"name": call["name"], "args": call["args"]}
+                        for call in getattr(message, "tool_calls", None) or []
+                    ]
+                }
+                for message in messages
+            ],
+            "tools": sorted(tool["function"]["name"] for tool in tools or [])
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    # --- Responses ---
+    @staticmethod
+    def _structured_answer(text):
+        """Offline answer in the structured-output topology schema, from the fast-path parser.
+
+        Requests the parser can't handle get an empty topology, which the structured chain reports
+        as an error (as it would for a real model that produced nothing usable).
+        """
+        # Imported here: the agent module pulls in LangGraph, which plain tool replay doesn't need
+        from NetworkAgent import fast_path_parse
+        from TopologyPatterns import iter_links
+        topology = fast_path_parse(text) or {}
+        return {
+            "devices": [{"name": dev["name"], "type": dev.get("type") or "router"} for dev in topology.get("devices", [])],
+            "links": [{"endpoints": list(link["endpoints"]), "link_type": link.get("link_type") or "ethernet"}
+                      for link in iter_links(topology)],
+            "protocol": str(topology["protocol"]).upper() if topology.get("protocol") else None,
+            "vlans": [str(vlan) for vlan in topology.get("vlans", [])]
+        }
+
+    def _default_response(self, messages: List[BaseMessage], tools, key):
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            return AIMessage(content=last.content)
+        if tools and isinstance(last, HumanMessage):
+            function = tools[0]["function"]
+            required = function.get("parameters", {}).get("required", [])
+            if "devices" in required and "links" in required:
+                # with_structured_output binds the topology schema as the only tool
+                return AIMessage(
+                    content="",
+                    tool_calls=[{"name": function["name"], "args": self._structured_answer(last.content), "id": f"call_{key[:24]}"}]
+                )
+            string_params = [
+                name for name, spec in function.get("parameters", {}).get("properties", {}).items()
+                if spec.get("type") == "string"
+            ]
+            if len(string_params) == 1:
+                return AIMessage(
+                    content="",
+                    tool_calls=[{"name": function["name"], "args": {string_params[0]: last.content}, "id": f"call_{key[:24]}"}]
+                )
+        raise KeyError(f"No cassette entry for this prompt in {self.cassette_path} and no recording model configured.")
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        tools = kwargs.get("tools")
+        key = self.cassette_key(messages, tools)
+        with _cassette_lock:
+            cassette = self._load()
+        entry = cassette.get(key)
+        if entry is not None:
+            message = AIMessage(content=entry["content"], tool_calls=entry.get("tool_calls", []))
+        elif self.record_from is not None:
+            recorder = self.record_from.bind_tools(tools) if tools else self.record_from
+            message = recorder.invoke(messages)
+            with _cassette_lock:
+                cassette = self._load()
+                cassette[key] = {
+                    "prompt": messages[-1].content,
+                    "content": message.content,
+                    "tool_calls": [dict(call) for call in message.tool_calls]
+                }
+                self._save(cassette)
+        else:
+            message = self._default_response(messages, tools, key)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any):
+        # One chunk with the whole answer; tool calls go out as chunks with JSON arguments, like
+        # ChatOpenAI, so streaming output parsers (with_structured_output) can read them
+        message = self._generate(messages, stop, run_manager, **kwargs).generations[0].message
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content=message.content,
+            tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call.get("id"), "index": i}
+                for i, call in enumerate(message.tool_calls)
+            ]
+        ))
+
+def create_chat_model(backend="openai", model="gpt-4o", temperature=0, cassette_path=None, record=False):
+    """Build the chat model used by the agent.
+
+    Args:
+        backend: 'openai' for ChatOpenAI, or 'cassette' for the deterministic offline stand-in
+        model: Model name passed to ChatOpenAI (and recorded with cassette entries)
+        temperature: Sampling temperature
+        cassette_path: JSON file holding recorded responses (cassette backend only)
+        record: If True, cassette misses are answered by ChatOpenAI and recorded
+
+    Returns:
+        A LangChain chat model that supports bind_tools and with_structured_output
+    """
+    if backend == "cassette":
+        record_from = None
+        if record:
+            from langchain_openai import ChatOpenAI
+            record_from = ChatOpenAI(model=model, temperature=temperature, api_key=os.getenv("OPENAI_API_KEY"))
+        return CassetteChatModel(
+            cassette_path=cassette_path or "benchmarks/cassettes/agent.json",
+            record_from=record_from,
+            model_name=model
+        )
+    if backend == "openai":
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model=model, temperature=temperature, api_key=os.getenv("OPENAI_API_KEY"))
+    raise ValueError(f"Unknown LLM backend '{backend}'. Expected one of: {', '.join(LLM_BACKENDS)}")
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+class LLMResponseCache:
+    """Persistent SQLite cache for agent responses, with TTL/size eviction and hit/miss counters."""
+
+    def __init__(self, path="saved_models/llm_response_cache.sqlite", max_entries=500, ttl_seconds=7 * 24 * 3600):
+        """
+        Args:
+            path: SQLite file used to store cached responses
+            max_entries: Maximum number of responses kept (least recently used are evicted first)
+            ttl_seconds: Age after which a cached response is ignored and removed (None disables expiry)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO stats (name, value) VALUES ('hits', 0), ('misses', 0)")
+
+    @contextmanager
+    def _connect(self):
+        # A fresh connection per operation keeps the cache safe across Streamlit script threads;
+        # it is committed (or rolled back on error) and closed when the block ends
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def normalize_input(text):
+        """Collapse case, whitespace and trailing punctuation so near-identical prompts share an entry."""
+        text = re.sub(r"\s+", " ", (text or "").strip().lower())
+        return text.rstrip(" .!?")
+
+    def make_key(self, text, model, temperature, system_prompt, backend):
+        """Build the cache key from the normalized request and everything that affects the LLM answer.
+
+        The backend is part of the key so offline cassette answers are never served to the OpenAI backend.
+        """
+        payload = json.dumps(
+            [self.normalize_input(text), backend, model, temperature, system_prompt],
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached response for key, or None on a miss (expired entries count as misses)."""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                conn.execute("UPDATE stats SET value = value + 1 WHERE name = 'misses'")
+                return None
+            conn.execute("UPDATE responses SET last_accessed = ? WHERE key = ?", (now, key))
+            conn.execute("UPDATE stats SET value = value + 1 WHERE name = 'hits'")
+        return json.loads(row[0])
+
+    def set(self, key, response):
+        """Store a JSON-serializable response and evict anything over the TTL or size limit."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(response), now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        if self.ttl_seconds is not None:
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        if self.max_entries is not None:
+            conn.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY last_accessed DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        """Drop all cached responses and reset the counters."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+            conn.execute("UPDATE stats SET value = 0")
+
+    def stats(self):
+        """Return a dict with 'hits', 'misses', 'entries' and 'hit_rate'."""
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "entries": entries,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
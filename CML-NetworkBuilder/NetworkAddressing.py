@@ -0,0 +1,410 @@
+import ipaddress
+from NetworkPorts import PortAllocator
+
+# --- Integer IPv4 arithmetic ---
+# Addresses are handled as plain ints; strings are only produced for the final model.
+_OCTETS = [str(i) for i in range(256)]
+
+def ipv4_to_int(address):
+    return int(ipaddress.IPv4Address(address))
+
+def int_to_ipv4(value):
+    return f"{_OCTETS[value >> 24]}.{_OCTETS[(value >> 16) & 255]}.{_OCTETS[(value >> 8) & 255]}.{_OCTETS[value & 255]}"
+
+def prefix_to_netmask(prefix):
+    return int_to_ipv4((0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF)
+
+def host_offsets(prefix, bits=32):
+    """Offsets of the usable hosts inside a subnet, matching ipaddress' hosts().
+
+    IPv4 (bits=32) skips the network and broadcast addresses except on /31 and /32; IPv6
+    (bits=128) only skips the subnet-router anycast address, and not on /127 and /128.
+    """
+    size = 1 << (bits - prefix)
+    if prefix >= bits - 1:
+        return range(size)
+    if bits == 128:
+        return range(1, size)
+    return range(1, size - 1)
+
+def format_ipv4_many(values):
+    """Format a sequence of integer addresses as dotted quads."""
+    octets = _OCTETS
+    return [f"{octets[v >> 24]}.{octets[(v >> 16) & 255]}.{octets[(v >> 8) & 255]}.{octets[v & 255]}" for v in values]
+
+# --- Integer IPv6 arithmetic ---
+_IPV6_SHIFTS = range(112, -1, -16)
+
+def int_to_ipv6(value):
+    """Compressed (RFC 5952) text of an integer IPv6 address, same as str(ipaddress.IPv6Address)."""
+    hextets = [(value >> shift) & 0xFFFF for shift in _IPV6_SHIFTS]
+    # The longest run of two or more zero hextets collapses to '::' (the first one on a tie)
+    best_start, best_len, start = -1, 1, -1
+    for i, hextet in enumerate(hextets):
+        if hextet:
+            start = -1
+        else:
+            if start < 0:
+                start = i
+            if i - start + 1 > best_len:
+                best_start, best_len = start, i - start + 1
+    parts = [f"{hextet:x}" for hextet in hextets]
+    if best_start < 0:
+        return ":".join(parts)
+    return ":".join(parts[:best_start]) + "::" + ":".join(parts[best_start + best_len:])
+
+def format_ipv6_many(values):
+    """Format a sequence of integer addresses as compressed IPv6 text."""
+    return [int_to_ipv6(v) for v in values]
+
+# --- Route summarization ---
+def parse_network(cidr):
+    """(integer network address, prefix length, address bits) of a CIDR string, or None if invalid.
+
+    Host bits are cleared, like ipaddress.ip_network(cidr, strict=False).
+    """
+    address, _, prefix = cidr.strip().partition("/")
+    if ":" in address:
+        try:
+            network = ipaddress.IPv6Network(cidr.strip(), strict=False)
+        except ValueError:
+            return None
+        return int(network.network_address), network.prefixlen, 128
+    try:
+        octets = [int(octet) for octet in address.split(".")]
+        prefix = int(prefix)
+    except ValueError:
+        return None
+    if len(octets) != 4 or not all(0 <= octet <= 255 for octet in octets) or not 0 <= prefix <= 32:
+        return None
+    value = (octets[0] << 24) | (octets[1] << 16) | (octets[2] << 8) | octets[3]
+    return value & ((0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF), prefix, 32
+
+def summarize_networks(networks):
+    """Collapse subnets into the fewest prefixes that cover exactly the same addresses.
+
+    Only aligned, contiguous blocks are merged (10.0.0.0/30 + 10.0.0.4/30 -> 10.0.0.0/29) and
+    subnets inside another one are dropped, so a summary never matches an address that none of
+    the input subnets matched. Same result as ipaddress.collapse_addresses, on plain ints.
+
+    Args:
+        networks: IPv4 or IPv6 CIDR strings (may be mixed); invalid ones are kept as they are
+
+    Returns:
+        (summarized CIDR strings, IPv4 first and each family in address order, followed by
+        the invalid input; the summaries that are not one of the input subnets)
+    """
+    blocks = {32: [], 128: []}
+    invalid = []
+    for network in networks:
+        parsed = parse_network(network) if network else None
+        if parsed is None:
+            if network:
+                invalid.append(network)
+            continue
+        blocks[parsed[2]].append(parsed[:2])
+
+    summarized = []
+    aggregates = []
+    for bits, formatter in ((32, int_to_ipv4), (128, int_to_ipv6)):
+        inputs = set(blocks[bits])
+        collapsed = []
+        for value, prefix in sorted(inputs):
+            if collapsed:
+                last_value, last_prefix = collapsed[-1]
+                if value < last_value + (1 << (bits - last_prefix)):
+                    continue  # Inside the previous block
+            collapsed.append((value, prefix))
+            # Merge sibling halves into their parent for as long as possible
+            while len(collapsed) >= 2:
+                (a, prefix_a), (b, prefix_b) = collapsed[-2], collapsed[-1]
+                size = 1 << (bits - prefix_a)
+                if prefix_a != prefix_b or prefix_a == 0 or a & ((size << 1) - 1) or b != a + size:
+                    break
+                collapsed[-2:] = [(a, prefix_a - 1)]
+        for value, prefix in collapsed:
+            text = f"{formatter(value)}/{prefix}"
+            summarized.append(text)
+            if (value, prefix) not in inputs:
+                aggregates.append(text)
+    return summarized + invalid, aggregates
+
+def range_blocks(start, end, bits=32):
+    """Fewest aligned (integer network address, prefix length) blocks that exactly cover the
+    addresses start to end - 1, in address order."""
+    blocks = []
+    while start < end:
+        # Largest block aligned at start that still fits
+        size = start & -start if start else 1 << bits
+        while size > end - start:
+            size >>= 1
+        blocks.append((start, bits - size.bit_length() + 1))
+        start += size
+    return blocks
+
+# --- Address families ---
+ADDRESS_FAMILIES = ["ipv4", "ipv6", "dual"]
+# IPv6 prefix for generated designs: loopback /128s come from its first /64, link /127s from the second
+IPV6_NETWORK = "fd00::/48"
+
+def address_families(address_family):
+    """(use IPv4, use IPv6) for an address family name."""
+    if address_family not in ADDRESS_FAMILIES:
+        raise ValueError(f"Unknown address family '{address_family}'. Expected one of: {', '.join(ADDRESS_FAMILIES)}")
+    return address_family != "ipv6", address_family != "ipv4"
+
+def ipv6_pools(ipv6_network=IPV6_NETWORK):
+    """Split an IPv6 prefix (/63 or shorter) into its (loopback /64, link /64) networks."""
+    network = ipaddress.IPv6Network(ipv6_network, strict=False)
+    if network.prefixlen > 63:
+        raise ValueError(f"IPv6 prefix {network} is too small; use a /63 or shorter")
+    base = int(network.network_address)
+    return f"{int_to_ipv6(base)}/64", f"{int_to_ipv6(base + (1 << 64))}/64"
+
+class SubnetAllocator:
+    """Hands out consecutive fixed-size subnets of a base network (IPv4 or IPv6) using integer arithmetic."""
+
+    def __init__(self, base_network="10.0.0.0/8", subnet_prefix=30):
+        """
+        Args:
+            base_network: Network to carve subnets from
+            subnet_prefix: Prefix length of every allocated subnet
+        """
+        network = ipaddress.ip_network(base_network, strict=False)
+        bits = network.max_prefixlen
+        if subnet_prefix < network.prefixlen or subnet_prefix > bits:
+            raise ValueError(f"Cannot carve /{subnet_prefix} subnets out of {network}")
+        self.prefix = subnet_prefix
+        self.block = 1 << (bits - subnet_prefix)
+        self.base = int(network.network_address)
+        self.capacity = network.num_addresses // self.block
+        self.netmask = prefix_to_netmask(subnet_prefix) if bits == 32 else None
+        self.format = format_ipv4_many if bits == 32 else format_ipv6_many
+        self.host_offsets = host_offsets(subnet_prefix, bits)
+        self.next_index = 0
+
+    def allocate(self, count):
+        """Reserve up to `count` subnets; returns their network addresses as ints (fewer if exhausted)."""
+        count = max(0, min(count, self.capacity - self.next_index))
+        start = self.base + self.next_index * self.block
+        self.next_index += count
+        return range(start, start + count * self.block, self.block)
+
+    def subnet_strings(self, subnets):
+        """'address/prefix' strings for allocated subnets."""
+        suffix = f"/{self.prefix}"
+        return [subnet + suffix for subnet in self.format(subnets)]
+
+    def host_strings(self, subnets, limit=None):
+        """Host address strings for each subnet, as one list per subnet (the first `limit` hosts if set)."""
+        offsets = self.host_offsets[:limit] if limit else self.host_offsets
+        per_subnet = len(offsets)
+        flat = self.format([subnet + offset for subnet in subnets for offset in offsets])
+        return [flat[i:i + per_subnet] for i in range(0, len(flat), per_subnet)]
+
+# --- IP address assignment for links, loopbacks and VXLAN VTEPs ---
+def assign_ip_addresses(devices, links, base_network="10.0.0.0/8", subnet_prefix=30, fabric=None,
+                        address_family="ipv4", ipv6_network=IPV6_NETWORK):
+    """Number every physical link and give loopbacks to VTEPs (and IPv6 routers); full, non-incremental pass.
+
+    With IPv6 ('ipv6' or 'dual'), links get /127s ('ipv6_subnet'/'ipv6_ips' on the link, 'ipv6' and
+    'ipv6_prefix' on the interface) and every router and VTEP gets a /128 on Loopback0.
+
+    Args:
+        devices: List of device dictionaries (modified in place)
+        links: List of link dictionaries (modified in place)
+        base_network: Network to carve IPv4 link subnets from
+        subnet_prefix: Prefix length of IPv4 link subnets
+        fabric: VXLANFabricAllocator with the loopback pool and VNI ranges (default pools if None)
+        address_family: 'ipv4', 'ipv6' or 'dual'
+        ipv6_network: IPv6 prefix for loopbacks and links (see ipv6_pools)
+
+    Returns:
+        True if the topology is a VXLAN fabric
+    """
+    use_ipv4, use_ipv6 = address_families(address_family)
+    device_map = {dev["name"]: dev for dev in devices}
+    fabric = fabric or VXLANFabricAllocator()
+    # Interfaces are named per device and node definition, within the node's CML port limit
+    ports = PortAllocator(devices, links)
+    for dev in devices:
+        dev.setdefault("node_definition", ports.node_definitions[dev["name"]])
+
+    # Check if this is a VXLAN topology
+    vxlan_enabled = is_vxlan_topology(devices, links)
+    vtep_devices = find_vtep_devices(devices, links) if vxlan_enabled else []
+
+    # If VXLAN enabled, assign loopback IPs for VTEPs
+    if vxlan_enabled and use_ipv4:
+        loopbacks = fabric.loopbacks(len(vtep_devices))
+
+        for dev, loopback_ip in zip(vtep_devices, loopbacks):
+            if "interfaces" not in dev:
+                dev["interfaces"] = []
+            dev["interfaces"].append({
+                "name": "Loopback0",
+                "ip": loopback_ip,
+                "mask": "255.255.255.255",
+                "description": "VTEP IP for VXLAN",
+                "is_loopback": True
+            })
+
+    if use_ipv6:
+        loopback_network6, link_network6 = ipv6_pools(ipv6_network)
+        vtep_names = {dev["name"] for dev in vtep_devices}
+        loopback_devices = [dev for dev in devices if dev.get("type") == "router" or dev["name"] in vtep_names]
+        loopback_allocator = SubnetAllocator(loopback_network6, 128)
+        # Skip ::0 of the loopback /64 (subnet-router anycast)
+        loopback_allocator.next_index = 1
+        loopbacks6 = loopback_allocator.format(loopback_allocator.allocate(len(loopback_devices)))
+        for dev, loopback_ip in zip(loopback_devices, loopbacks6):
+            loopback = next((iface for iface in dev.get("interfaces", []) if iface.get("is_loopback")), None)
+            if loopback is None:
+                loopback = {"name": "Loopback0", "description": "Router loopback", "is_loopback": True}
+                dev.setdefault("interfaces", []).append(loopback)
+            loopback["ipv6"] = loopback_ip
+            loopback["ipv6_prefix"] = 128
+
+    # Process physical links first; every subnet is numbered in one batch per address family
+    physical_links = [link for link in links if link.get("is_overlay") != True]
+    numbered = len(physical_links)
+    if use_ipv4:
+        allocator = SubnetAllocator(base_network, subnet_prefix)
+        subnets = allocator.allocate(len(physical_links))
+        subnet_strings = allocator.subnet_strings(subnets)
+        host_strings = allocator.host_strings(subnets)
+        netmask = allocator.netmask
+        numbered = min(numbered, len(subnets))
+    if use_ipv6:
+        allocator6 = SubnetAllocator(link_network6, 127)
+        subnets6 = allocator6.allocate(len(physical_links))
+        subnet_strings6 = allocator6.subnet_strings(subnets6)
+        host_strings6 = allocator6.host_strings(subnets6, limit=2)
+        numbered = min(numbered, len(subnets6))
+    if numbered < len(physical_links):
+        print("Ran out of subnets for links! Not all links will be assigned IPs.")
+    for n in range(numbered):
+        link = physical_links[n]
+        endpoints = link["endpoints"]
+        ips = host_strings[n] if use_ipv4 else None
+        if len(endpoints) != 2 or (use_ipv4 and len(ips) < 2):
+            continue
+        ips6 = host_strings6[n] if use_ipv6 else None
+        link_ports = [None, None]
+        for i, dev_name in enumerate(endpoints):
+            dev = device_map.get(dev_name)
+            if dev is not None:
+                if "interfaces" not in dev:
+                    dev["interfaces"] = []
+                link_ports[i] = port, slot, iface_name = ports.allocate(dev_name)
+                iface = {"name": iface_name}
+                if use_ipv4:
+                    iface["ip"] = ips[i]
+                    iface["mask"] = netmask
+                if use_ipv6:
+                    iface["ipv6"] = ips6[i]
+                    iface["ipv6_prefix"] = 127
+                iface["link_to"] = endpoints[1-i]
+                iface["port"] = port
+                iface["slot"] = slot
+                dev["interfaces"].append(iface)
+        if use_ipv4:
+            link["subnet"] = subnet_strings[n]
+            link["ips"] = ips
+        if use_ipv6:
+            link["ipv6_subnet"] = subnet_strings6[n]
+            link["ipv6_ips"] = ips6
+        record_link_ports(link, link_ports)
+
+    fabric.apply_overlay(vtep_devices, links)
+    return vxlan_enabled
+
+def record_link_ports(link, link_ports):
+    """Store per-endpoint (port, slot, interface name) tuples on a link; None for unknown devices."""
+    a, b = link_ports
+    link["ports"] = [a[0] if a else None, b[0] if b else None]
+    link["slots"] = [a[1] if a else None, b[1] if b else None]
+    link["interfaces"] = [a[2] if a else None, b[2] if b else None]
+
+# --- VXLAN fabric: VTEP detection, loopback pool and VNI ranges (shared with the IPAM) ---
+VTEP_LOOPBACK_NETWORK = "192.168.100.0/24"
+L2VNI_RANGE = (10000, 49999)
+L3VNI = 50000
+
+def is_vxlan_topology(devices, links):
+    return any("VTEP" in dev["name"] for dev in devices) or any(link.get("link_type") == "vxlan" for link in links)
+
+def find_vtep_devices(devices, links):
+    """Devices that need a VTEP loopback: named *VTEP*, or switches whose name is part of a *VTEP* link endpoint.
+
+    Instead of testing every switch against every link endpoint, the endpoint names are scanned
+    once for windows of the switch-name lengths, so this is O(devices + links) for bounded names.
+    """
+    vtep_endpoints = {endpoint for link in links for endpoint in link.get("endpoints", [])[:2] if "VTEP" in endpoint}
+    switch_names = {d["name"] for d in devices if d.get("type") == "switch" and "VTEP" not in d["name"]}
+    lengths = {len(name) for name in switch_names}
+    matched = set()
+    for endpoint in vtep_endpoints:
+        for length in lengths:
+            for start in range(len(endpoint) - length + 1):
+                window = endpoint[start:start + length]
+                if window in switch_names:
+                    matched.add(window)
+    return [d for d in devices if "VTEP" in d["name"] or d["name"] in matched]
+
+class VXLANFabricAllocator:
+    """Loopbacks and VNIs for a VXLAN/EVPN fabric.
+
+    VTEP loopbacks are /32 hosts of a pool of any size (a /16 holds 65534 VTEPs). Overlay links
+    without a 'vni' get the lowest unused L2 VNI of the range, written back to the link so it
+    stays put on the next run; every VTEP shares the fabric's L3 VNI.
+    """
+
+    def __init__(self, loopback_network=VTEP_LOOPBACK_NETWORK, l2vni_range=L2VNI_RANGE, l3vni=L3VNI):
+        """
+        Args:
+            loopback_network: Pool for VTEP loopback addresses
+            l2vni_range: (first, last) L2 VNI handed out to overlay links, inclusive
+            l3vni: L3 VNI used for routing between VTEPs
+        """
+        network = ipaddress.ip_network(loopback_network, strict=False)
+        if not 1 <= l2vni_range[0] <= l2vni_range[1] <= 0xFFFFFF:
+            raise ValueError(f"Invalid L2 VNI range {l2vni_range}; VNIs are 1-16777215")
+        self.loopback_network = str(network)
+        self.loopback_base = int(network.network_address)
+        self.loopback_offsets = host_offsets(network.prefixlen)
+        self.l2vni_range = range(l2vni_range[0], l2vni_range[1] + 1)
+        self.l3vni = l3vni
+
+    def loopbacks(self, count):
+        """First `count` loopback addresses of the pool, as strings."""
+        if count > len(self.loopback_offsets):
+            raise ValueError(f"Not enough VTEP loopback addresses in {self.loopback_network} for {count} VTEPs")
+        base = self.loopback_base
+        return format_ipv4_many([base + offset for offset in self.loopback_offsets[:count]])
+
+    def apply_overlay(self, vtep_devices, links):
+        """Mark overlay links as tunnels, number them with L2 VNIs and record the VNIs on the VTEPs (idempotent)."""
+        vxlan_links = [link for link in links if link.get("is_overlay") == True]
+        used = {link["vni"] for link in vxlan_links if "vni" in link}
+        candidates = iter(self.l2vni_range)
+        vnis_by_device = {}
+        for link in vxlan_links:
+            # Overlay links don't get physical interfaces; the VNI drives the VXLAN config
+            link["vxlan_tunnel"] = True
+            if "vni" not in link:
+                vni = next((v for v in candidates if v not in used), None)
+                if vni is None:
+                    raise ValueError(f"L2 VNI range {self.l2vni_range.start}-{self.l2vni_range.stop - 1} is exhausted")
+                used.add(vni)
+                link["vni"] = vni
+            for endpoint in link.get("endpoints", []):
+                vnis_by_device.setdefault(endpoint, []).append(link["vni"])
+
+        for dev in vtep_devices:
+            dev_vnis = vnis_by_device.get(dev["name"])
+            if dev_vnis:
+                if "vxlan_config" not in dev:
+                    dev["vxlan_config"] = {}
+                dev["vxlan_config"]["l2vnis"] = dev_vnis
+                dev["vxlan_config"]["l3vni"] = self.l3vni
@@ -0,0 +1,426 @@
+import asyncio
+import json
+import re
+from typing import TypedDict
+from langgraph.graph import StateGraph, END
+from langgraph.config import get_stream_writer
+from langchain_core.runnables import RunnableLambda
+from langchain.agents import create_tool_calling_agent, AgentExecutor
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+from NetworkParser import parse_network_request, parse_network_text
+from NetworkTemplates import create_template_topology, detect_topology_pattern
+from TopologyPatterns import count_links, has_links
+
+# 1. Stricter system prompt
+SYSTEM_PROMPT = "You are a network design assistant. You MUST always use the parse_network_request tool to answer user requests. NEVER answer directly. NEVER output explanations, summaries, or any text except the tool's output. If the user asks for a network, call the tool and return only the tool's output."
+STRUCTURED_SYSTEM_PROMPT = "You are a network design assistant. Translate the user's request into a network topology. Give every device a unique name, only link devices you listed, use link_type 'ethernet' unless the user asks otherwise, and set protocol to null when no routing protocol is requested."
+
+class NetworkRequestState(TypedDict):
+    input: str
+    output: dict | None
+    route: str | None
+
+def is_valid_topology_dict(d):
+    return (
+        isinstance(d, dict) and
+        isinstance(d.get("devices", None), list) and
+        isinstance(d.get("links", None), list)
+    )
+
+def decode_topology_output(output):
+    """Return the agent output as a topology dict if it is one (JSON strings are decoded), else None."""
+    try:
+        decoded = json.loads(output) if isinstance(output, str) else output
+    except ValueError:
+        return None
+    if is_valid_topology_dict(decoded) and has_links(decoded):
+        return decoded
+    return None
+
+def normalize_links(topology):
+    # Convert 'source'/'target' to 'endpoints' if needed
+    for link in topology.get("links", []):
+        if "source" in link and "target" in link:
+            link["endpoints"] = [link.pop("source"), link.pop("target")]
+    return topology
+
+def select_best_topology(candidates):
+    """Pick the candidate topology with the most named devices and links (first item if none is valid)."""
+    best = None
+    best_score = -1
+    for candidate in candidates:
+        if is_valid_topology_dict(candidate):
+            # Calculate a score based on non-empty devices and links
+            device_score = len([d for d in candidate["devices"] if isinstance(d.get("name"), str) and len(d.get("name", "")) > 1])
+            link_score = count_links(candidate)
+            score = device_score + link_score
+            if score > best_score:
+                best = candidate
+                best_score = score
+    return best if best is not None else candidates[0] if len(candidates) > 0 else candidates
+
+def normalize_agent_output(output):
+    """Turn raw pipeline output (JSON string, list of candidates or dict) into a topology dict, or None."""
+    if output and isinstance(output, str):
+        try:
+            output = json.loads(output)
+        except ValueError:
+            return None
+    if isinstance(output, list):
+        output = select_best_topology(output)
+    if not is_valid_topology_dict(output):
+        return None
+    return normalize_links(output)
+
+# --- JSON schema for the single-round-trip structured-output mode ---
+# Written for OpenAI's strict structured outputs: every object lists all of its properties as
+# required and sets additionalProperties to false; optional values are nullable instead.
+TOPOLOGY_SCHEMA = {
+    "title": "network_topology",
+    "description": "A network topology with devices, point-to-point links, an optional routing protocol and VLAN IDs.",
+    "type": "object",
+    "properties": {
+        "devices": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string", "description": "Unique hostname, e.g. Router1"},
+                    "type": {"type": "string", "enum": ["router", "switch", "firewall", "server", "ext-server"]}
+                },
+                "required": ["name", "type"],
+                "additionalProperties": False
+            }
+        },
+        "links": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "endpoints": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Exactly two device names"
+                    },
+                    "link_type": {"type": "string", "enum": ["ethernet", "serial", "internet", "wireless", "vxlan"]}
+                },
+                "required": ["endpoints", "link_type"],
+                "additionalProperties": False
+            }
+        },
+        "protocol": {"anyOf": [{"type": "string", "enum": ["OSPF", "EIGRP", "BGP", "STATIC"]}, {"type": "null"}]},
+        "vlans": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["devices", "links", "protocol", "vlans"],
+    "additionalProperties": False
+}
+
+def validate_structured_topology(data):
+    """Check a schema-constrained model answer locally and drop anything the rest of the app can't use.
+
+    Args:
+        data: Dictionary returned by the structured-output LLM call
+
+    Returns:
+        Topology dictionary ready for IP assignment, or a dictionary with an 'error' key
+    """
+    if not is_valid_topology_dict(data):
+        return {"error": "Structured output did not contain device and link lists."}
+
+    devices = []
+    seen_names = set()
+    for dev in data["devices"]:
+        name = dev.get("name") if isinstance(dev, dict) else None
+        if not isinstance(name, str) or not name.strip() or name in seen_names:
+            continue
+        seen_names.add(name)
+        devices.append({"name": name, "type": dev.get("type") or "router"})
+
+    links = []
+    seen_links = set()
+    for link in data["links"]:
+        endpoints = link.get("endpoints") if isinstance(link, dict) else None
+        if not isinstance(endpoints, list) or len(endpoints) != 2 or endpoints[0] == endpoints[1]:
+            continue
+        if endpoints[0] not in seen_names or endpoints[1] not in seen_names:
+            continue
+        link_key = frozenset(endpoints)
+        if link_key in seen_links:
+            continue
+        seen_links.add(link_key)
+        links.append({"endpoints": list(endpoints), "link_type": link.get("link_type") or "ethernet"})
+
+    if not devices or not links:
+        return {"error": "Structured output did not describe any connected devices."}
+
+    topology = {"devices": devices, "links": links}
+    if data.get("protocol"):
+        topology["protocol"] = str(data["protocol"]).upper()
+    if data.get("vlans"):
+        topology["vlans"] = [str(vlan) for vlan in data["vlans"]]
+    return topology
+
+def build_structured_topology_chain(llm, prompt):
+    """Single LLM round trip: the model answers directly in TOPOLOGY_SCHEMA, validated locally.
+
+    Returns a runnable with the same {'input'} -> {'output'} contract as the AgentExecutor,
+    so it can be dropped into cached_agent_node and build_network_graph unchanged.
+    """
+    # strict=True makes OpenAI constrain decoding to the schema (langchain-openai defaults it to False)
+    structured_llm = llm.with_structured_output(TOPOLOGY_SCHEMA, method="json_schema", strict=True)
+    return prompt | structured_llm | RunnableLambda(lambda data: {"output": validate_structured_topology(data)})
+
+def build_agent_runnable(llm, system_prompt, agent_mode="tool_agent", verbose=True):
+    """Build the LLM step of the pipeline for the chosen agent mode.
+
+    Args:
+        llm: Chat model (ChatOpenAI or a stand-in from LLMBackends)
+        system_prompt: System message for the model
+        agent_mode: 'tool_agent' (AgentExecutor calling parse_network_request) or 'structured'
+        verbose: Passed to the AgentExecutor
+
+    Returns:
+        A runnable mapping {'input': text} to {'output': ...}
+    """
+    if agent_mode == "structured":
+        # One round trip: the model answers in the topology JSON schema, validated locally
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", system_prompt),
+            ("human", "{input}")
+        ])
+        return build_structured_topology_chain(llm, prompt)
+
+    tools = [parse_network_request]
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad")
+    ])
+    agent = create_tool_calling_agent(llm, tools, prompt=prompt)
+    return AgentExecutor(agent=agent, tools=tools, verbose=verbose)
+
+# --- Deterministic fast path (no LLM round trips) ---
+# Device-like names in a request ('r3', 'sw1', 'router2'); protocol and addressing words
+# such as 'ipv6', 'ospfv3', 'vlan10', 'as65000' or 'l2' are not device names
+_MENTIONED_NAME = re.compile(r"\b(?!(?:ipv|ospfv|vlan|as|l)\d)[a-z][a-z_]*\d[a-z0-9_]*\b")
+
+def covers_request(topology, text):
+    """True if every device name mentioned in the request is a device of the topology.
+
+    A parse that misses a named device (a clause the parser didn't understand) is partial,
+    and the agent should answer the request instead.
+    """
+    names = {device.get("name", "").lower() for device in topology.get("devices", [])}
+    mentioned = _MENTIONED_NAME.findall(text.lower().replace("-", " "))
+    return all(name in names for name in mentioned)
+
+def fast_path_parse(text):
+    """Try the offline regex parser and template detector before calling the LLM.
+
+    Args:
+        text: User's input text
+
+    Returns:
+        Topology dictionary with 'devices' and 'links', or None if the request needs the agent
+        (nothing parsed, or a partial parse that leaves out devices named in the request)
+    """
+    try:
+        parsed = parse_network_text(text)
+    except Exception:
+        parsed = None
+
+    if is_valid_topology_dict(parsed) and has_links(parsed) and covers_request(parsed, text):
+        # Site patterns don't carry a protocol, so pick it up from the template detector
+        if "protocol" not in parsed:
+            pattern_result = detect_topology_pattern(text)
+            if pattern_result and pattern_result[2]:
+                parsed["protocol"] = pattern_result[2]
+        return parsed
+
+    # Only trust the template detector when a topology keyword was actually given
+    pattern_result = detect_topology_pattern(text, allow_default=False)
+    if pattern_result:
+        topology_type, num_devices, protocol, device_type = pattern_result
+        topology = create_template_topology(
+            topology_type=topology_type,
+            num_devices=num_devices,
+            protocol=protocol,
+            device_type=device_type
+        )
+        if has_links(topology) and covers_request(topology, text):
+            return topology
+
+    return None
+
+def route_request(state: NetworkRequestState):
+    """LangGraph node: answer from the fast path or hand the request to the agent."""
+    output = fast_path_parse(state["input"])
+    if output is not None:
+        return {"output": output, "route": "fast_path"}
+    return {"route": "agent"}
+
+# --- Persistent response cache around the agent ---
+def cached_agent_node(agent_executor, cache, model, temperature, system_prompt, backend):
+    """Wrap the agent so repeated requests are replayed from the on-disk LLMResponseCache.
+
+    Only outputs that decode to a valid topology are stored, so a bad answer is never replayed.
+    Pass cache=None to run the agent uncached (e.g. when benchmarking).
+    The returned runnable has a sync and an async path; the async one can be cancelled mid-request.
+    """
+    def lookup(state, writer):
+        if cache is None:
+            writer({"event": "llm_started", "model": model})
+            return None, None
+        key = cache.make_key(state["input"], model, temperature, system_prompt, backend)
+        cached = cache.get(key)
+        if cached is not None:
+            writer({"event": "cache_hit"})
+        else:
+            writer({"event": "llm_started", "model": model})
+        return key, cached
+
+    def report(chunk, writer):
+        for action in chunk.get("actions", []):
+            writer({"event": "tool_call", "tool": action.tool})
+        for step in chunk.get("steps", []):
+            writer({"event": "tool_result", "tool": step.action.tool})
+
+    def store(key, output):
+        if cache is not None and decode_topology_output(output) is not None:
+            cache.set(key, output)
+        return {"output": output, "route": "agent"}
+
+    def agent_node(state: NetworkRequestState):
+        # No-op unless the graph is run with stream_mode="custom"
+        writer = get_stream_writer()
+        key, cached = lookup(state, writer)
+        if cached is not None:
+            return {"output": cached, "route": "cache"}
+        output = None
+        # Stream the agent so tool calls are reported as they happen
+        for chunk in agent_executor.stream({"input": state["input"]}):
+            report(chunk, writer)
+            if "output" in chunk:
+                output = chunk["output"]
+        return store(key, output)
+
+    async def agent_node_async(state: NetworkRequestState):
+        writer = get_stream_writer()
+        key, cached = lookup(state, writer)
+        if cached is not None:
+            return {"output": cached, "route": "cache"}
+        output = None
+        async for chunk in agent_executor.astream({"input": state["input"]}):
+            report(chunk, writer)
+            if "output" in chunk:
+                output = chunk["output"]
+        return store(key, output)
+
+    return RunnableLambda(agent_node, afunc=agent_node_async, name="agent")
+
+# --- Speculative execution: offline parser and LLM agent race each other ---
+def speculative_node(agent_node):
+    """Run the offline parser and the agent concurrently; the first valid topology wins.
+
+    The losing agent request is cancelled. If neither produces a topology, the lenient
+    template guess from detect_topology_pattern is used before giving up.
+    """
+    async def race(state: NetworkRequestState):
+        writer = get_stream_writer()
+        text = state["input"]
+        offline_task = asyncio.create_task(asyncio.to_thread(fast_path_parse, text))
+        agent_task = asyncio.create_task(agent_node.ainvoke(state))
+        pending = {offline_task, agent_task}
+        agent_update = None
+        agent_error = None
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is offline_task:
+                    output = task.result()
+                    update = {"output": output, "route": "fast_path"} if output is not None else None
+                else:
+                    try:
+                        agent_update = task.result()
+                    except Exception as e:
+                        agent_error = e
+                        continue
+                    update = {"route": "agent", **agent_update}
+                    if decode_topology_output(update.get("output")) is None:
+                        update = None
+                if update is not None:
+                    for loser in pending:
+                        loser.cancel()
+                    writer({"event": "speculation_won", "winner": update["route"]})
+                    return update
+
+        pattern_result = detect_topology_pattern(text)
+        if pattern_result:
+            topology_type, num_devices, protocol, device_type = pattern_result
+            writer({"event": "speculation_won", "winner": "template_fallback"})
+            return {
+                "output": create_template_topology(topology_type, num_devices, protocol=protocol, device_type=device_type),
+                "route": "template_fallback"
+            }
+        if agent_update is not None:
+            return {"route": "agent", **agent_update}
+        if agent_error is not None:
+            raise agent_error
+        return {"output": None, "route": "agent"}
+
+    def run(state: NetworkRequestState):
+        # Sync graphs (graph.invoke / graph.stream) drive the race on a private event loop
+        return asyncio.run(race(state))
+
+    return RunnableLambda(run, afunc=race, name="speculative")
+
+# ----------------------
+# LangGraph Setup
+# ----------------------
+def build_network_graph(agent_executor, speculative=False, fast_path=True):
+    """Compile the request pipeline: fast path first, LLM agent only as a fallback.
+
+    With speculative=True the two run concurrently in a single node instead (see speculative_node);
+    agent_executor must then be the runnable returned by cached_agent_node.
+    With fast_path=False every request goes straight to the agent.
+    """
+    builder = StateGraph(NetworkRequestState)
+    if speculative:
+        builder.add_node("speculative", speculative_node(agent_executor))
+        builder.set_entry_point("speculative")
+        builder.add_edge("speculative", END)
+        return builder.compile()
+    if not fast_path:
+        builder.add_node("agent", agent_executor)
+        builder.set_entry_point("agent")
+        builder.add_edge("agent", END)
+        return builder.compile()
+
+    builder.add_node("fast_path", route_request)
+    builder.add_node("agent", agent_executor)
+    builder.set_entry_point("fast_path")
+    builder.add_conditional_edges(
+        "fast_path",
+        lambda state: state["route"],
+        {"fast_path": END, "agent": "agent"}
+    )
+    builder.add_edge("agent", END)
+    return builder.compile()
+
+def stream_network_request(graph, text):
+    """Run the pipeline and yield (event, payload) tuples as they happen.
+
+    Node completions are reported as ('node_finished', {...}), agent progress as the custom
+    events emitted by cached_agent_node, and the last tuple is always ('result', final_state).
+    """
+    state = {"input": text, "output": None, "route": None}
+    for mode, chunk in graph.stream({"input": text}, stream_mode=["updates", "custom"]):
+        if mode == "custom":
+            yield chunk.get("event", "custom"), chunk
+            continue
+        for node, update in chunk.items():
+            if update:
+                state.update(update)
+            yield "node_finished", {"node": node, **(update or {})}
+    yield "result", state
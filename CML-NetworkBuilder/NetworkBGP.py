@@ -0,0 +1,246 @@
+"""BGP design for generated topologies: route reflectors, sessions and loopbacks.
+
+Instead of a full iBGP mesh (N*(N-1)/2 sessions), every AS gets a few route reflectors picked by
+graph centrality; the reflectors peer with each other and every other router peers only with the
+reflectors of its AS, so the number of sessions grows linearly with the routers. iBGP sessions run
+between loopbacks (an IGP underlay makes them reachable, see NetworkConfigGenerator). Optionally
+every site is its own AS and routers of different sites peer over their connecting links (eBGP).
+"""
+from collections import deque
+from NetworkAddressing import int_to_ipv4, parse_network
+from NetworkPorts import physical_links
+
+BGP_ASN = 65000
+ROUTE_REFLECTORS = 2
+# Routers without an IPv4 loopback get a /32 from this pool
+ROUTER_LOOPBACK_NETWORK = "172.31.0.0/16"
+# Only the best-connected routers are scored by closeness (one BFS each)
+CENTRALITY_CANDIDATES = 16
+
+def device_site(device):
+    """Site of a device: its 'site' key, else the name prefix before '_' (Site1_Router -> Site1), else its name."""
+    if device.get("site"):
+        return str(device["site"])
+    name = device["name"]
+    return name.split("_")[0] if "_" in name else name
+
+def _distances(adjacency, source):
+    distances = {source: 0}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        for peer in adjacency.get(node, ()):
+            if peer not in distances:
+                distances[peer] = distances[node] + 1
+                queue.append(peer)
+    return distances
+
+def select_route_reflectors(adjacency, members, count=ROUTE_REFLECTORS, candidates=CENTRALITY_CANDIDATES):
+    """Pick route reflectors among a group of routers, by closeness centrality.
+
+    Each connected part of the group gets its own reflectors. The routers with the most links are
+    the candidates; the ones with the smallest total distance to the rest of the part win (ties go
+    to the earlier router).
+
+    Args:
+        adjacency: {device name: set of neighbor names} over physical links
+        members: Router names of the group (an AS), in model order
+        count: Reflectors per connected part
+        candidates: How many of the best-connected routers are scored
+
+    Returns:
+        List of reflector names
+    """
+    reflectors = set()
+    remaining = list(members)
+    while remaining:
+        distances = _distances(adjacency, remaining[0])
+        part = [name for name in remaining if name in distances]
+        remaining = [name for name in remaining if name not in distances]
+        order = {name: i for i, name in enumerate(part)}
+        shortlist = sorted(part, key=lambda name: (-len(adjacency.get(name, ())), order[name]))[:max(candidates, count)]
+        scored = []
+        for name in shortlist:
+            reach = _distances(adjacency, name)
+            scored.append((sum(reach[peer] for peer in part if peer in reach), order[name], name))
+        reflectors.update(name for _, _, name in sorted(scored)[:count])
+    return [name for name in members if name in reflectors]
+
+def connected_parts(adjacency, names):
+    """{device name: first of `names` in its connected part}, with one BFS per part."""
+    part_of = {}
+    for name in names:
+        if name not in part_of:
+            for reached in _distances(adjacency, name):
+                part_of[reached] = name
+    return part_of
+
+def _loopback_interface(router, family):
+    for iface in router.get("interfaces", []):
+        if iface.get("is_loopback") and iface.get(family):
+            return iface
+    return None
+
+def _loopback_addresses(router, family):
+    iface = _loopback_interface(router, family)
+    return iface[family] if iface else None
+
+def _link_addresses(link, family):
+    ips = link.get("ips" if family == "ip" else "ipv6_ips")
+    return ips if ips and len(ips) >= 2 else None
+
+def assign_router_loopbacks(routers, loopback_network=ROUTER_LOOPBACK_NETWORK):
+    """Give every router without an IPv4 loopback address a /32 from the pool.
+
+    Existing loopback addresses are kept, so the result is stable across runs; new routers take
+    the lowest free address. A Loopback0 that only has IPv6 gets the IPv4 address added.
+
+    Args:
+        routers: Router dictionaries (modified in place)
+        loopback_network: Pool of router loopbacks
+
+    Returns:
+        Names of the routers that got a new loopback address
+    """
+    base, prefix, _ = parse_network(loopback_network)
+    size = 1 << (32 - prefix)
+    used = {_loopback_addresses(router, "ip") for router in routers}
+    changed = []
+    offset = 1 if prefix < 31 else 0
+    for router in routers:
+        if _loopback_addresses(router, "ip"):
+            continue
+        while offset < size and int_to_ipv4(base + offset) in used:
+            offset += 1
+        if offset >= size - (1 if prefix < 31 else 0):
+            raise ValueError(f"Router loopback pool {loopback_network} is too small for {len(routers)} routers")
+        ip = int_to_ipv4(base + offset)
+        offset += 1
+        loopback = next((iface for iface in router.get("interfaces", []) if iface.get("is_loopback")), None)
+        if loopback is None:
+            loopback = {"name": "Loopback0", "description": "Router loopback", "is_loopback": True}
+            router.setdefault("interfaces", []).append(loopback)
+        loopback["ip"] = ip
+        loopback["mask"] = "255.255.255.255"
+        changed.append(router["name"])
+    return changed
+
+def design_bgp(devices, links, asn=BGP_ASN, route_reflectors=ROUTE_REFLECTORS, ebgp_per_site=False,
+               loopback_network=ROUTER_LOOPBACK_NETWORK):
+    """Route reflectors and BGP sessions for the routers of a topology.
+
+    IPv4 sessions are built when the links carry IPv4 subnets, IPv6 sessions when they carry IPv6
+    subnets (both on dual-stack models). Routers that need an IPv4 loopback get one (see
+    assign_router_loopbacks).
+
+    Args:
+        devices: List of device dictionaries (router loopbacks may be added)
+        links: List of link dictionaries
+        asn: AS number, or the first one with ebgp_per_site (sites are numbered from it in model order)
+        route_reflectors: Reflectors per AS (and connected part), or an explicit list of router names
+        ebgp_per_site: Give every site (see device_site) its own AS and peer sites over their links
+        loopback_network: Pool for router loopbacks
+
+    Returns:
+        Dictionary with the sorted 'route_reflectors', the 'sessions' count and per-router
+        'routers' entries: {'asn', 'route_reflector', 'loopback', 'neighbors': [{'address',
+        'remote_as', 'description', 'update_source', 'rr_client', 'next_hop_self'}],
+        'external_peers': set of neighbor device names reached over eBGP}
+    """
+    routers = [dev for dev in devices if dev.get("type") == "router"]
+    router_names = {router["name"] for router in routers}
+    physical = physical_links(links)
+    adjacency = {}
+    for link in physical:
+        endpoints = link.get("endpoints", [])
+        if len(endpoints) == 2:
+            adjacency.setdefault(endpoints[0], set()).add(endpoints[1])
+            adjacency.setdefault(endpoints[1], set()).add(endpoints[0])
+
+    families = [family for family, field in (("ip", "subnet"), ("ipv6", "ipv6_subnet")) if any(field in link for link in physical)]
+    if "ip" in families:
+        assign_router_loopbacks(routers, loopback_network)
+
+    # AS per router
+    if ebgp_per_site:
+        site_asn = {}
+        for router in routers:
+            site_asn.setdefault(device_site(router), asn + len(site_asn))
+        asn_of = {router["name"]: site_asn[device_site(router)] for router in routers}
+    else:
+        asn_of = {router["name"]: asn for router in routers}
+    groups = {}
+    for router in routers:
+        groups.setdefault(asn_of[router["name"]], []).append(router["name"])
+
+    if isinstance(route_reflectors, (list, tuple, set)):
+        reflectors = [name for name in route_reflectors if name in router_names]
+    else:
+        reflectors = [name for members in groups.values() for name in select_route_reflectors(adjacency, members, route_reflectors)]
+    reflector_set = set(reflectors)
+
+    router_map = {router["name"]: router for router in routers}
+    design = {name: {
+        "asn": asn_of[name],
+        "route_reflector": name in reflector_set,
+        "loopback": _loopback_addresses(router_map[name], "ip"),
+        "neighbors": [],
+        "external_peers": set()
+    } for name in router_map}
+    sessions = 0
+
+    def peer(a, b, family, rr_client_of_a=False, rr_client_of_b=False, link_ips=None):
+        """One session between routers a and b: over their loopbacks, or over a link's addresses."""
+        if link_ips:
+            (address_a, address_b), source_a, source_b = link_ips, None, None
+        else:
+            loopback_a = _loopback_interface(router_map[a], family)
+            loopback_b = _loopback_interface(router_map[b], family)
+            if not loopback_a or not loopback_b:
+                return 0
+            address_a, address_b = loopback_a[family], loopback_b[family]
+            source_a, source_b = loopback_a["name"], loopback_b["name"]
+        design[a]["neighbors"].append({"address": address_b, "remote_as": asn_of[b], "description": b,
+                                       "update_source": source_a, "rr_client": rr_client_of_a, "next_hop_self": False})
+        design[b]["neighbors"].append({"address": address_a, "remote_as": asn_of[a], "description": a,
+                                       "update_source": source_b, "rr_client": rr_client_of_b, "next_hop_self": False})
+        return 1
+
+    # iBGP: reflectors of an AS peer with each other, clients with the reflectors of their part
+    part_of = connected_parts(adjacency, [router["name"] for router in routers])
+    for members in groups.values():
+        member_reflectors = [name for name in members if name in reflector_set]
+        reflectors_by_part = {}
+        for name in member_reflectors:
+            reflectors_by_part.setdefault(part_of[name], []).append(name)
+        for family in families:
+            for i, a in enumerate(member_reflectors):
+                for b in member_reflectors[i + 1:]:
+                    sessions += peer(a, b, family)
+            for name in members:
+                if name not in reflector_set:
+                    for reflector in reflectors_by_part.get(part_of[name], []):
+                        sessions += peer(name, reflector, family, rr_client_of_b=True)
+
+    # eBGP between sites, over the connecting links
+    if ebgp_per_site:
+        for link in physical:
+            endpoints = link.get("endpoints", [])
+            if len(endpoints) != 2 or not all(name in router_names for name in endpoints):
+                continue
+            a, b = endpoints
+            if asn_of[a] == asn_of[b]:
+                continue
+            design[a]["external_peers"].add(b)
+            design[b]["external_peers"].add(a)
+            for family in families:
+                ips = _link_addresses(link, family)
+                if ips:
+                    sessions += peer(a, b, family, link_ips=ips[:2])
+        # Border routers: eBGP next hops (link addresses) are not in the underlay
+        for entry in design.values():
+            if entry["external_peers"]:
+                for neighbor in entry["neighbors"]:
+                    neighbor["next_hop_self"] = neighbor["remote_as"] == entry["asn"]
+
+    return {"route_reflectors": sorted(reflectors), "sessions": sessions, "routers": design}
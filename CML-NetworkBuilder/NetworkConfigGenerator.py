@@ -0,0 +1,366 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from NetworkAddressing import int_to_ipv4, prefix_to_netmask, summarize_networks
+from ConfigRenderer import platform_for, render_blocks
+from NetworkBGP import design_bgp
+from NetworkOSPF import design_ospf_areas
+from NetworkStatic import design_static_routes
+
+# Models with fewer routed devices than this are always rendered in-process
+PARALLEL_MIN_DEVICES = 2000
+
+# --- Interface configuration ---
+def interface_contexts(device, existing=None, external_peers=(), peer_areas=None, area=0):
+    """Render contexts for a device's addressed interfaces, in port order (loopbacks last).
+
+    Interface names come from the per-device port allocation (see NetworkPorts), so they match the
+    node definition the device is deployed as. Stanzas already present in the config are skipped.
+
+    Args:
+        device: Device dictionary
+        existing: Config the stanzas are added to (default: the device's config)
+        external_peers: Names of eBGP neighbors; links to them stay out of the IGP
+        peer_areas: OSPF area of the link to each neighbor (multi-area designs); None leaves
+            interfaces in the process area
+        area: OSPF area of loopbacks and unknown links, with peer_areas
+
+    Returns:
+        List of interface contexts (see ConfigRenderer)
+    """
+    if existing is None:
+        existing = device.get("config", "") or ""
+    interfaces = [iface for iface in device.get("interfaces", []) if iface.get("name") and (iface.get("ip") or iface.get("ipv6"))]
+    interfaces.sort(key=lambda iface: (iface.get("is_loopback", False), iface.get("port", 0)))
+    contexts = []
+    for iface in interfaces:
+        if f"interface {iface['name']}\n" in existing:
+            continue
+        description = iface.get("description") or (f"Link to {iface['link_to']}" if iface.get("link_to") else None)
+        context = {
+            "name": iface["name"],
+            "description": description,
+            "ip": iface.get("ip"),
+            "mask": iface.get("mask", "255.255.255.252"),
+            "ipv6": iface.get("ipv6"),
+            "ipv6_prefix": iface.get("ipv6_prefix", 127),
+            "is_loopback": iface.get("is_loopback", False)
+        }
+        if iface.get("link_to") in external_peers:
+            context["igp"] = False
+        if peer_areas is not None:
+            context["area"] = peer_areas.get(iface.get("link_to"), area)
+        contexts.append(context)
+    return contexts
+
+def router_id(device, position):
+    """First IPv4 address of a device, or 1.0.0.<n> (by device position) on IPv6-only routers."""
+    for iface in device.get("interfaces", []):
+        if iface.get("ip"):
+            return iface["ip"]
+    return int_to_ipv4(0x01000000 + position + 1)
+
+def area_networks(networks, network_areas, area, summarize=True):
+    """Group a router's OSPF networks by area, summarizing within each area only.
+
+    Returns:
+        (networks in area order, {network: area})
+    """
+    by_area = {}
+    for network in networks:
+        by_area.setdefault(network_areas.get(network, area), []).append(network)
+    result = []
+    areas = {}
+    for network_area in sorted(by_area):
+        group = summarize_networks(by_area[network_area])[0] if summarize else by_area[network_area]
+        result.extend(group)
+        areas.update(dict.fromkeys(group, network_area))
+    return result, areas
+
+def device_context(device, requested_protocol, networks, networks6, position, base=None, summarize=True, design=None):
+    """Render context for a router from the model and the requested routing protocol.
+
+    Args:
+        device: Device dictionary
+        requested_protocol: Routing protocol to configure (OSPF, EIGRP, BGP, STATIC)
+        networks: IPv4 link subnets of the device, or None if it has none
+        networks6: IPv6 link subnets of the device, or None if it has none
+        position: Index of the device in the model (fallback router ID)
+        base: Config the sections are rendered onto (default: the device's config)
+        summarize: Collapse contiguous link subnets into summaries in the OSPF/EIGRP/BGP network
+            statements (see NetworkAddressing.summarize_networks); False keeps one per link
+        design: The router's protocol design, or None for the plain single-area / neighborless
+            configs. BGP: its NetworkBGP.design_bgp entry plus 'igp_networks' (link subnets
+            inside its AS). OSPF: its NetworkOSPF.design_ospf_areas entry. STATIC: its
+            NetworkStatic.design_static_routes entry
+
+    Returns:
+        Render context for ConfigRenderer
+    """
+    existing = (device.get("config", "") or "") if base is None else base
+    bgp = design if requested_protocol == "BGP" else None
+    ospf = design if requested_protocol == "OSPF" else None
+    interfaces = interface_contexts(device, existing, bgp["external_peers"] if bgp else (),
+                                    ospf["peer_areas"] if ospf else None, ospf["area"] if ospf else 0)
+    context = {
+        "hostname": device["name"],
+        "platform": platform_for(device),
+        "interfaces": interfaces,
+        "ipv6_routing": "ipv6 unicast-routing" not in existing and any(iface.get("ipv6") for iface in device.get("interfaces", []) if iface.get("name")),
+    }
+    aggregates = []
+    if summarize and requested_protocol in ("OSPF", "EIGRP", "BGP"):
+        if networks and not ospf:
+            networks, aggregates = summarize_networks(networks)
+        if networks6 and requested_protocol == "BGP":
+            networks6, aggregates6 = summarize_networks(networks6)
+            aggregates += aggregates6
+
+    # Use process ID 1 / area 0, AS 100 and ASN 65000 for simplicity
+    if requested_protocol == "OSPF":
+        rid = router_id(device, position)
+        area = ospf["area"] if ospf else 0
+        if any(iface.get("ipv6") for iface in interfaces):
+            # OSPFv3 runs on the IPv6 interfaces; the process needs a router ID
+            context["ospfv3"] = {"process_id": 1, "area": area, "router_id": rid}
+        if networks:
+            context["ospf"] = {"process_id": 1, "area": area, "networks": networks, "router_id": rid}
+            if ospf:
+                # Multi-area: every network in the area of its link, plus the ABR's area ranges
+                context["ospf"]["networks"], context["ospf"]["network_areas"] = area_networks(networks, ospf["network_areas"], area, summarize)
+                context["ospf"]["ranges"] = ospf["ranges"]
+    elif requested_protocol == "EIGRP":
+        if networks is not None:
+            context["eigrp"] = {"as_number": 100, "networks": networks}
+    elif requested_protocol == "BGP":
+        rid = (bgp and bgp["loopback"]) or router_id(device, position)
+        if bgp:
+            # OSPF underlay inside the AS, so the iBGP sessions between loopbacks come up
+            igp_networks = bgp["igp_networks"] + ([f"{bgp['loopback']}/32"] if bgp["loopback"] else [])
+            if summarize and igp_networks:
+                igp_networks = summarize_networks(igp_networks)[0]
+            if any(iface.get("ipv6") and iface.get("igp", True) for iface in interfaces):
+                context["ospfv3"] = {"process_id": 1, "area": 0, "router_id": rid}
+            if igp_networks:
+                context["ospf"] = {"process_id": 1, "area": 0, "networks": igp_networks, "router_id": rid}
+        # IPv6 prefixes go in their own address family
+        context["bgp"] = {
+            "asn": bgp["asn"] if bgp else 65000,
+            "router_id": rid,
+            "neighbors": bgp["neighbors"] if bgp else [],
+            "networks": networks or [],
+            "ipv6_networks": networks6 or []
+        }
+        # BGP only advertises prefixes that are in the routing table: anchor summaries to Null0
+        if aggregates:
+            context["static_routes"] = [(network.split("/")[0], prefix_to_netmask(int(network.split("/")[1])), "Null0")
+                                        for network in aggregates if ":" not in network]
+            context["static_routes6"] = [(network, "Null0") for network in aggregates if ":" in network]
+    elif requested_protocol == "STATIC":
+        # Shortest-path routes to every remote subnet (see NetworkStatic)
+        if design:
+            context["static_routes"] = design["static_routes"]
+            context["static_routes6"] = design["static_routes6"]
+    return context
+
+def render_device_config(context, base):
+    """Full config of a router: the base config (or the platform header) plus the rendered sections."""
+    # Start with the device's existing config or create a basic one
+    blocks = render_blocks(context, header=not base)
+    if not base:
+        base = "\n".join(blocks.pop(0)) + "\n"
+    return base + "".join("\n" + "\n".join(block) for block in blocks)
+
+def config_digest(context, base):
+    """Content hash of everything a rendered config depends on (base config and render context)."""
+    # Contexts are built with a fixed key order, so their repr is a stable serialization
+    return hashlib.sha256(repr((base, context)).encode("utf-8")).hexdigest()
+
+# --- Dirty tracking ---
+# A generated config is stored with 'config_base' (the config the sections were rendered onto) and
+# 'config_hash' (config_digest of base and context). On the next run a device whose digest is
+# unchanged is skipped; any other device is re-rendered from its base, so sections are replaced
+# instead of appended again. Code that rewrites a config by hand drops both keys, which makes the
+# edited config the new base.
+def render_job(requested_protocol, summarize, index, device, networks, networks6, design=None):
+    """Render one router unless its inputs are unchanged.
+
+    Returns:
+        (index, digest, base, config), with config None if the stored config is still current
+    """
+    tracked = "config_hash" in device and "config_base" in device
+    base = device["config_base"] if tracked else (device.get("config") or "")
+    context = device_context(device, requested_protocol, networks, networks6, index, base, summarize, design)
+    digest = config_digest(context, base)
+    if tracked and device["config_hash"] == digest:
+        return index, digest, base, None
+    return index, digest, base, render_device_config(context, base)
+
+def _render_chunk(requested_protocol, summarize, chunk):
+    """Worker: render a list of (index, device, networks, networks6, design) jobs."""
+    return [render_job(requested_protocol, summarize, *job) for job in chunk]
+
+def render_configs(devices, links, requested_protocol, workers=None, chunksize=256, summarize=True, bgp_options=None,
+                   ospf_options=None):
+    """Render the routers of a model whose config inputs changed since the last run.
+
+    Connected networks per device and the protocol design (BGP sessions, OSPF areas, static
+    routes) are computed once; rendering is then independent per device. Large models are rendered in
+    chunks across a process pool.
+
+    Args:
+        devices: List of device dictionaries (modified in place)
+        links: List of link dictionaries
+        requested_protocol: Routing protocol to configure (OSPF, EIGRP, BGP, STATIC)
+        workers: Worker processes (default: CPU count once the model has PARALLEL_MIN_DEVICES
+            routed devices); 0 or 1 renders in this process
+        chunksize: Devices sent to a worker per task
+        summarize: Summarize network statements (see device_context) and static routes
+        bgp_options: Keyword arguments for NetworkBGP.design_bgp (asn, route_reflectors,
+            ebgp_per_site, loopback_network)
+        ospf_options: OSPF design options: 'multi_area' (one area per site, see
+            NetworkOSPF.design_ospf_areas) and 'area_ranges' (summarize areas at the ABRs)
+
+    Returns:
+        Dictionary with the sorted 'rendered_devices' (re-rendered or reset) and 'unchanged_devices'
+    """
+    # Create a map of device names to their objects for easier lookup
+    device_map = {dev["name"]: dev for dev in devices}
+
+    # BGP: route reflectors and sessions for the whole model (this may add router loopbacks)
+    bgp_design = design_bgp(devices, links, **(bgp_options or {}))["routers"] if requested_protocol == "BGP" else {}
+    device_underlay = {name: [] for name in bgp_design}
+    ospf_design = {}
+    if requested_protocol == "OSPF" and (ospf_options or {}).get("multi_area"):
+        ospf_design = design_ospf_areas(devices, links, area_ranges=ospf_options.get("area_ranges", True))["routers"]
+    static_design = design_static_routes(devices, links, summarize) if requested_protocol == "STATIC" else {}
+
+    # One pass over the links: connected networks (IPv4 and IPv6) of each device
+    device_networks = {}
+    device_networks6 = {}
+    for link in links:
+        endpoints = link.get("endpoints", [])
+        for field, networks_by_device in (("subnet", device_networks), ("ipv6_subnet", device_networks6)):
+            if field in link:
+                # Add this subnet to each connected device's list
+                for endpoint in endpoints:
+                    if endpoint in device_map:
+                        networks_by_device.setdefault(endpoint, []).append(link[field])
+        if bgp_design and "subnet" in link and not link.get("is_overlay"):
+            # eBGP links (routers of different ASes) stay out of the underlay
+            asns = {bgp_design[endpoint]["asn"] for endpoint in endpoints if endpoint in bgp_design}
+            if len(asns) == 1:
+                for endpoint in endpoints:
+                    if endpoint in device_underlay:
+                        device_underlay[endpoint].append(link["subnet"])
+    routed_devices = list(dict.fromkeys(list(device_networks) + list(device_networks6)))
+    position = {dev["name"]: i for i, dev in enumerate(devices)}
+
+    jobs = []
+    for dev_name in routed_devices:
+        device = device_map[dev_name]
+        if device.get("type") != "router":
+            continue
+        design = ospf_design.get(dev_name) or static_design.get(dev_name)
+        if dev_name in bgp_design:
+            design = dict(bgp_design[dev_name], igp_networks=device_underlay[dev_name])
+            # Kept on the device for the editor's BGP defaults
+            device["bgp"] = {key: design[key] for key in ("asn", "route_reflector", "neighbors")}
+        jobs.append((position[dev_name], device, device_networks.get(dev_name), device_networks6.get(dev_name), design))
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(jobs) >= PARALLEL_MIN_DEVICES else 1
+    if workers <= 1 or len(jobs) <= chunksize:
+        results = [render_job(requested_protocol, summarize, *job) for job in jobs]
+    else:
+        # Workers get copies of the devices and send back only digests and config strings
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_render_chunk, requested_protocol, summarize, jobs[i:i + chunksize]) for i in range(0, len(jobs), chunksize)]
+            results = [result for future in futures for result in future.result()]
+
+    rendered = set()
+    unchanged = set()
+    for index, digest, base, config in results:
+        device = devices[index]
+        if config is None:
+            unchanged.add(device["name"])
+            continue
+        device["config"] = config
+        device["config_base"] = base
+        device["config_hash"] = digest
+        rendered.add(device["name"])
+
+    # Generated sections of devices that are no longer rendered (no links left, no longer a router) are dropped
+    for index, device in enumerate(devices):
+        if device["name"] not in bgp_design:
+            device.pop("bgp", None)
+        if "config_hash" in device and device["name"] not in rendered and device["name"] not in unchanged:
+            base = device.pop("config_base", "")
+            device.pop("config_hash")
+            if base:
+                device["config"] = base
+            else:
+                device.pop("config", None)
+            rendered.add(device["name"])
+
+    return {"rendered_devices": sorted(rendered), "unchanged_devices": sorted(unchanged)}
+
+# --- Protocol Configuration Generator ---
+def generate_device_configs(devices, links, requested_protocol=None, workers=None, chunksize=256, summarize=True, bgp_options=None,
+                            ospf_options=None):
+    """
+    Generate device configurations based on the requested routing protocol.
+
+    Only routers whose interfaces, neighbors or protocol settings changed since the last run are
+    re-rendered (see render_configs).
+
+    Args:
+        devices: List of device dictionaries
+        links: List of link dictionaries
+        requested_protocol: Routing protocol to configure (OSPF, EIGRP, BGP, STATIC)
+        workers: Worker processes (see render_configs)
+        chunksize: Devices sent to a worker per task
+        summarize: Collapse contiguous link subnets in network statements and static routes; False
+            for exact per-link statements and routes
+        bgp_options: BGP design options (see render_configs)
+        ospf_options: OSPF design options (see render_configs)
+
+    Returns:
+        Updated list of device dictionaries with configuration
+    """
+    if not requested_protocol:
+        return devices  # No protocol requested, return devices unchanged
+    render_configs(devices, links, requested_protocol, workers, chunksize, summarize, bgp_options, ospf_options)
+    return devices
+
+def update_device_configs(network_design, requested_protocol=None, workers=None, summarize=None, bgp_options=None,
+                          ospf_options=None):
+    """Incrementally (re)generate the configs of a network model.
+
+    Args:
+        network_design: Model dictionary with 'devices', 'links' and 'protocol' (modified in place)
+        requested_protocol: Routing protocol; defaults to the model's 'protocol'
+        workers: Worker processes (see render_configs)
+        summarize: Summarize network statements; stored in network_design['summarize_routes'].
+            Defaults to the model's stored setting, else True
+        bgp_options: BGP design options (see render_configs); stored in
+            network_design['bgp_options'], defaults to the stored ones
+        ospf_options: OSPF design options (see render_configs); stored in
+            network_design['ospf_options'], defaults to the stored ones
+
+    Returns:
+        The change summary from render_configs (empty lists if no protocol is configured)
+    """
+    if summarize is not None:
+        network_design["summarize_routes"] = summarize
+    if bgp_options is not None:
+        network_design["bgp_options"] = bgp_options
+    if ospf_options is not None:
+        network_design["ospf_options"] = ospf_options
+    requested_protocol = requested_protocol or network_design.get("protocol")
+    if not requested_protocol:
+        return {"rendered_devices": [], "unchanged_devices": []}
+    summarize = network_design.get("summarize_routes", True)
+    return render_configs(network_design.get("devices", []), network_design.get("links", []), requested_protocol, workers,
+                          summarize=summarize, bgp_options=network_design.get("bgp_options"),
+                          ospf_options=network_design.get("ospf_options"))
@@ -0,0 +1,535 @@
+import copy
+import hashlib
+import heapq
+import ipaddress
+import json
+from collections import OrderedDict
+from NetworkAddressing import (
+    IPV6_NETWORK, VXLANFabricAllocator, address_families, find_vtep_devices, format_ipv4_many,
+    format_ipv6_many, host_offsets, int_to_ipv4, int_to_ipv6, ipv6_pools, is_vxlan_topology,
+    prefix_to_netmask, record_link_ports
+)
+from NetworkPorts import PortAllocator
+from TopologyPatterns import concrete_topology, pattern_link_count
+
+# Per address family: (link pool, link subnet field, link hosts field, interface address field,
+# interface mask/prefix field)
+LINK_FIELDS = {
+    "ipv4": ("links", "subnet", "ips", "ip", "mask"),
+    "ipv6": ("links6", "ipv6_subnet", "ipv6_ips", "ipv6", "ipv6_prefix"),
+}
+
+def link_keys(links):
+    """Stable IPAM key per link: sorted endpoint names, plus '#n' for parallel links."""
+    keys = []
+    seen = {}
+    for link in links:
+        endpoints = link.get("endpoints", [])
+        key = "--".join(sorted(str(e) for e in endpoints))
+        ordinal = seen.get(key, 0)
+        seen[key] = ordinal + 1
+        keys.append(f"{key}#{ordinal}" if ordinal else key)
+    return keys
+
+class IPAddressManager:
+    """Persistent IPAM: named subnet pools with reservations, a free-list and per-key allocations.
+
+    The whole state is plain JSON (see to_dict) and is stored in the network model under 'ipam',
+    so a topology can be re-addressed after edits without renumbering what already exists:
+    existing links keep their subnets, new links get free ones, removed links give theirs back.
+    """
+
+    def __init__(self, state=None, base_network="10.0.0.0/8", subnet_prefix=30, fabric=None,
+                 address_family="ipv4", ipv6_network=IPV6_NETWORK):
+        """
+        Args:
+            state: Dictionary previously returned by to_dict(), or None for a fresh IPAM
+            base_network: Network of the 'links' pool when it doesn't exist yet
+            subnet_prefix: Prefix length of link subnets when the pool doesn't exist yet
+            fabric: VXLANFabricAllocator whose loopback network seeds the 'loopbacks' pool (when it
+                doesn't exist yet) and whose VNI ranges number overlay links
+            address_family: 'ipv4', 'ipv6' or 'dual'
+            ipv6_network: Prefix of the IPv6 pools ('loopbacks6' /128s, 'links6' /127s) when they
+                don't exist yet
+        """
+        self.fabric = fabric or VXLANFabricAllocator()
+        self.families = [family for family, used in zip(("ipv4", "ipv6"), address_families(address_family)) if used]
+        state = state or {}
+        self.pools = {
+            name: dict(pool, free=list(pool.get("free", [])), reserved=list(pool.get("reserved", [])))
+            for name, pool in state.get("pools", {}).items()
+        }
+        for pool in self.pools.values():
+            heapq.heapify(pool["free"])
+        self._geometry = {}
+        self.allocations = {name: dict(allocs) for name, allocs in state.get("allocations", {}).items()}
+        # Allocated + reserved indices per pool, kept in memory only
+        self._used = {
+            name: set(self.allocations.get(name, {}).values()) | set(pool["reserved"])
+            for name, pool in self.pools.items()
+        }
+        if "links" not in self.pools:
+            self.add_pool("links", base_network, subnet_prefix)
+        if "loopbacks" not in self.pools:
+            loopback_network = ipaddress.ip_network(self.fabric.loopback_network)
+            self.add_pool("loopbacks", loopback_network, 32)
+            if loopback_network.prefixlen < 31:
+                # Only hosts() of the pool: keep the network and broadcast addresses out
+                self.reserve("loopbacks", f"{loopback_network.network_address}/32")
+                self.reserve("loopbacks", f"{loopback_network.broadcast_address}/32")
+        if "ipv6" in self.families and "links6" not in self.pools:
+            loopback_network6, link_network6 = ipv6_pools(ipv6_network)
+            self.add_pool("links6", link_network6, 127)
+            self.add_pool("loopbacks6", loopback_network6, 128)
+            # Subnet-router anycast address of the loopback /64
+            self.reserve("loopbacks6", loopback_network6.replace("/64", "/128"))
+
+    def to_dict(self):
+        return {"pools": self.pools, "allocations": self.allocations}
+
+    # --- Pools ---
+    def add_pool(self, name, network, prefix):
+        """Create an empty pool handing out /prefix subnets of network (no-op if it already exists)."""
+        if name in self.pools:
+            return
+        net = ipaddress.ip_network(network, strict=False)
+        if prefix < net.prefixlen or prefix > net.max_prefixlen:
+            raise ValueError(f"Cannot carve /{prefix} subnets out of {net}")
+        self.pools[name] = {
+            "network": str(net),
+            "prefix": prefix,
+            "next": 0,
+            "free": [],
+            "reserved": []
+        }
+        self.allocations[name] = {}
+        self._used[name] = set()
+
+    def _pool_geometry(self, name):
+        pool = self.pools[name]
+        if name not in self._geometry:
+            net = ipaddress.ip_network(pool["network"])
+            block = 1 << (net.max_prefixlen - pool["prefix"])
+            self._geometry[name] = (int(net.network_address), block, net.num_addresses // block)
+        return (pool,) + self._geometry[name]
+
+    def format_addresses(self, name, values):
+        """Text of integer addresses from a pool (IPv4 or IPv6, following the pool's network)."""
+        return (format_ipv6_many if ":" in self.pools[name]["network"] else format_ipv4_many)(values)
+
+    def subnet_index(self, name, subnet):
+        """Index of an aligned subnet (string) inside a pool, or None if it doesn't belong there."""
+        pool, base, block, capacity = self._pool_geometry(name)
+        try:
+            net = ipaddress.ip_network(subnet, strict=False)
+        except ValueError:
+            return None
+        offset = int(net.network_address) - base
+        if net.prefixlen != pool["prefix"] or offset < 0 or offset % block:
+            return None
+        index = offset // block
+        return index if index < capacity else None
+
+    def subnet_address(self, name, index):
+        """Network address (int) of the subnet at index in a pool."""
+        _, base, block, _ = self._pool_geometry(name)
+        return base + index * block
+
+    def reserve(self, name, subnet):
+        """Keep a subnet (e.g. '10.0.0.0/30') out of a pool; returns False if it is allocated or not in the pool."""
+        index = self.subnet_index(name, subnet)
+        pool = self.pools[name]
+        if index is None or (index in self._used[name] and index not in pool["reserved"]):
+            return False
+        if index not in pool["reserved"]:
+            pool["reserved"].append(index)
+            self._used[name].add(index)
+        if index in pool["free"]:
+            pool["free"].remove(index)
+            heapq.heapify(pool["free"])
+        return True
+
+    # --- Allocations ---
+    def allocate(self, name, key, preferred=None):
+        """Return the subnet index allocated to key, allocating one if needed.
+
+        Released subnets are reused lowest-first before the pool grows. `preferred` (a subnet string)
+        is honoured when it is free, which lets existing addressing be adopted as-is.
+        """
+        allocs = self.allocations[name]
+        if key in allocs:
+            return allocs[key]
+        pool, _, _, capacity = self._pool_geometry(name)
+        in_use = self._used[name]
+
+        index = self.subnet_index(name, preferred) if preferred else None
+        if index is not None and index not in in_use:
+            if index in pool["free"]:
+                pool["free"].remove(index)
+                heapq.heapify(pool["free"])
+            elif index == pool["next"]:
+                pool["next"] += 1
+            # An index past 'next' is simply marked used; the pool skips it when it gets there,
+            # which keeps adoption O(1) even far into a large (IPv6) pool
+        else:
+            index = None
+            while pool["free"]:
+                candidate = heapq.heappop(pool["free"])
+                if candidate not in in_use:
+                    index = candidate
+                    break
+            while index is None and pool["next"] < capacity:
+                if pool["next"] not in in_use:
+                    index = pool["next"]
+                pool["next"] += 1
+            if index is None:
+                raise ValueError(f"IPAM pool '{name}' ({pool['network']}) is exhausted")
+        allocs[key] = index
+        in_use.add(index)
+        return index
+
+    def release(self, name, key):
+        """Return the subnet allocated to key to the pool's free-list."""
+        index = self.allocations[name].pop(key, None)
+        if index is not None:
+            self._used[name].discard(index)
+            heapq.heappush(self.pools[name]["free"], index)
+        return index
+
+    # --- Topology addressing ---
+    def assign(self, devices, links):
+        """Address a topology incrementally.
+
+        Links (and loopbacks) that already have an allocation keep their addresses and
+        interfaces; new ones are allocated, removed ones are released and their interfaces dropped.
+        Addressing written by assign_ip_addresses ('subnet'/'ipv6_subnet' on the link) is adopted
+        when possible. With IPv6, links also get a /127 and every router and VTEP a /128 on
+        Loopback0; addresses of an address family that is no longer in use are released and removed.
+        New interfaces take the lowest free port of their device (see NetworkPorts.PortAllocator),
+        so interface names follow the node definition and ports of removed links are reused.
+
+        Args:
+            devices: List of device dictionaries (modified in place)
+            links: List of link dictionaries (modified in place)
+
+        Returns:
+            Dictionary with 'vxlan_enabled', 'allocated' and 'released' keys and the sorted
+            'changed_devices' whose interfaces were added, removed or renumbered
+        """
+        device_map = {dev["name"]: dev for dev in devices}
+        physical_links = [link for link in links if link.get("is_overlay") != True]
+        keys = link_keys(physical_links)
+        changed = set()
+        use_ipv4 = "ipv4" in self.families
+        use_ipv6 = "ipv6" in self.families
+
+        vxlan_enabled = is_vxlan_topology(devices, links)
+        vtep_devices = find_vtep_devices(devices, links) if vxlan_enabled else []
+        loopback_keys = {dev["name"] for dev in vtep_devices} if use_ipv4 else set()
+        vtep_names = {dev["name"] for dev in vtep_devices}
+        loopback6_devices = [dev for dev in devices if dev.get("type") == "router" or dev["name"] in vtep_names] if use_ipv6 else []
+        loopback6_keys = {dev["name"] for dev in loopback6_devices}
+
+        # Release what no longer exists (or belongs to an address family no longer in use)
+        live_keys = set(keys)
+        released = []
+        released_keys = set()
+        for family, (pool, subnet_field, ips_field, addr_field, mask_field) in LINK_FIELDS.items():
+            if pool not in self.pools:
+                continue
+            live = live_keys if family in self.families else set()
+            for key in [key for key in list(self.allocations[pool]) if key not in live]:
+                self.release(pool, key)
+                if key not in released_keys:
+                    released_keys.add(key)
+                    released.append(key)
+            if family not in self.families:
+                for link in physical_links:
+                    link.pop(subnet_field, None)
+                    link.pop(ips_field, None)
+        for pool, live, prefix in (("loopbacks", loopback_keys, "loopback"), ("loopbacks6", loopback6_keys, "loopback6")):
+            if pool not in self.pools:
+                continue
+            for name in [key for key in list(self.allocations[pool]) if key not in live]:
+                self.release(pool, name)
+                released.append(f"{prefix}:{name}")
+                if prefix == "loopback6" and name in device_map:
+                    for iface in device_map[name].get("interfaces", []):
+                        if iface.get("is_loopback") and iface.pop("ipv6", None):
+                            iface.pop("ipv6_prefix", None)
+                            changed.add(name)
+        # Drop interfaces of released keys, and addresses of unused families
+        live_ifaces = live_keys | {f"loopback:{name}" for name in loopback_keys} | {f"loopback6:{name}" for name in loopback6_keys}
+        unused_fields = [fields[3:] for family, fields in LINK_FIELDS.items() if family not in self.families]
+        for dev in devices:
+            interfaces = dev.get("interfaces", [])
+            kept = [iface for iface in interfaces if "ipam_key" not in iface or iface["ipam_key"] in live_ifaces]
+            if len(kept) != len(interfaces):
+                dev["interfaces"] = kept
+                changed.add(dev["name"])
+            for iface in kept:
+                if "ipam_key" not in iface or iface.get("is_loopback"):
+                    continue
+                for addr_field, mask_field in unused_fields:
+                    if iface.pop(addr_field, None) is not None:
+                        iface.pop(mask_field, None)
+                        changed.add(dev["name"])
+
+        allocated = []
+        # VTEP loopbacks
+        for dev in vtep_devices if use_ipv4 else []:
+            key = f"loopback:{dev['name']}"
+            existing = next((i for i in dev.get("interfaces", []) if i.get("ipam_key") == key), None)
+            if existing is None:
+                legacy = next((i for i in dev.get("interfaces", []) if i.get("is_loopback") and "ipam_key" not in i), None)
+                if dev["name"] not in self.allocations["loopbacks"]:
+                    allocated.append(key)
+                index = self.allocate("loopbacks", dev["name"], preferred=f"{legacy['ip']}/32" if legacy and legacy.get("ip") else None)
+                ip = int_to_ipv4(self.subnet_address("loopbacks", index))
+                if legacy is not None and legacy.get("ip") == ip:
+                    legacy["ipam_key"] = key
+                    continue
+                if legacy is not None:
+                    dev["interfaces"].remove(legacy)
+                loopback = {
+                    "name": "Loopback0",
+                    "ip": ip,
+                    "mask": "255.255.255.255",
+                    "description": "VTEP IP for VXLAN",
+                    "is_loopback": True,
+                    "ipam_key": key
+                }
+                shared = next((i for i in dev.get("interfaces", []) if i.get("ipam_key") == f"loopback6:{dev['name']}"), None)
+                if shared is not None:
+                    # The device already has an IPv6-only Loopback0: add the IPv4 address to it
+                    shared.update(loopback)
+                else:
+                    dev.setdefault("interfaces", []).append(loopback)
+                changed.add(dev["name"])
+
+        # IPv6 loopbacks: a /128 on the device's loopback (the VTEP loopback if it has one)
+        for dev in loopback6_devices:
+            name = dev["name"]
+            key = f"loopback6:{name}"
+            loopback = next((i for i in dev.get("interfaces", []) if i.get("is_loopback")), None)
+            if name not in self.allocations["loopbacks6"]:
+                allocated.append(key)
+            index = self.allocate("loopbacks6", name, preferred=f"{loopback['ipv6']}/128" if loopback and loopback.get("ipv6") else None)
+            ip = int_to_ipv6(self.subnet_address("loopbacks6", index))
+            if loopback is None:
+                loopback = {"name": "Loopback0", "description": "Router loopback", "is_loopback": True, "ipam_key": key}
+                dev.setdefault("interfaces", []).append(loopback)
+            if loopback.get("ipv6") != ip:
+                loopback["ipv6"] = ip
+                loopback["ipv6_prefix"] = 128
+                changed.add(name)
+
+        # Ports of dropped interfaces are free again; everything else stays where it is
+        ports = PortAllocator(devices, links)
+        for dev in devices:
+            dev.setdefault("node_definition", ports.node_definitions[dev["name"]])
+
+        # Index interfaces once so each link is O(1)
+        primary_field = LINK_FIELDS[self.families[0]][3]
+        by_key = {}
+        untagged = {}
+        for dev in devices:
+            for iface in dev.get("interfaces", []):
+                if "ipam_key" in iface:
+                    by_key[(dev["name"], iface["ipam_key"])] = iface
+                elif not iface.get("is_loopback"):
+                    # Untagged interfaces from an earlier full assignment can be adopted
+                    untagged[(dev["name"], iface.get("link_to"), iface.get(primary_field))] = iface
+
+        # Physical links: one subnet per address family
+        families = []
+        for family in self.families:
+            pool, subnet_field, ips_field, addr_field, mask_field = LINK_FIELDS[family]
+            prefix = self.pools[pool]["prefix"]
+            if family == "ipv4":
+                offsets, mask = host_offsets(prefix), prefix_to_netmask(prefix)
+            else:
+                offsets, mask = host_offsets(prefix, 128)[:2], prefix
+            families.append((pool, subnet_field, ips_field, addr_field, mask_field, prefix, offsets, mask))
+        addressable = all(len(family[6]) >= 2 for family in families)
+        for link, key in zip(physical_links, keys):
+            endpoints = link["endpoints"]
+            if len(endpoints) != 2 or not addressable:
+                continue
+            if (link.get("ipam_key") == key and "slots" in link
+                    and all(key in self.allocations[family[0]] and link.get(family[1]) for family in families)
+                    and all((name, key) in by_key or name not in device_map for name in endpoints)):
+                # Untouched link: allocations and interfaces are already in place
+                continue
+            fields = [{}, {}]
+            new_link = False
+            for pool, subnet_field, ips_field, addr_field, mask_field, prefix, offsets, mask in families:
+                is_new = key not in self.allocations[pool]
+                index = self.allocate(pool, key, preferred=link.get(subnet_field) if is_new else None)
+                new_link = new_link or is_new
+                subnet = self.subnet_address(pool, index)
+                ips = self.format_addresses(pool, [subnet] + [subnet + offset for offset in offsets])
+                link[subnet_field] = f"{ips[0]}/{prefix}"
+                link[ips_field] = ips[1:]
+                for i in range(2):
+                    fields[i][addr_field] = ips[1 + i]
+                    fields[i][mask_field] = mask
+            if new_link:
+                allocated.append(key)
+            link["ipam_key"] = key
+            link_ports = [None, None]
+            for i, dev_name in enumerate(endpoints):
+                dev = device_map.get(dev_name)
+                if dev is None:
+                    continue
+                peer = endpoints[1-i]
+                fields[i].update({"link_to": peer, "ipam_key": key})
+                iface = by_key.get((dev_name, key)) or untagged.pop((dev_name, peer, fields[i][primary_field]), None)
+                if iface is None:
+                    iface = {}
+                    dev.setdefault("interfaces", []).append(iface)
+                    changed.add(dev_name)
+                elif any(iface.get(field) != value for field, value in fields[i].items() if field != "ipam_key"):
+                    changed.add(dev_name)
+                if not isinstance(iface.get("port"), int):
+                    # New interface, or one adopted from a model without port allocation
+                    port, slot, name = ports.allocate(dev_name)
+                    if iface.get("name") != name:
+                        changed.add(dev_name)
+                    iface.update({"name": name, "port": port, "slot": slot})
+                iface.update(fields[i])
+                link_ports[i] = (iface["port"], iface["slot"], iface["name"])
+            record_link_ports(link, link_ports)
+
+        self.fabric.apply_overlay(vtep_devices, links)
+        return {
+            "vxlan_enabled": vxlan_enabled,
+            "allocated": allocated,
+            "released": released,
+            "changed_devices": sorted(changed)
+        }
+
+def update_ip_addresses(network_design, base_network="10.0.0.0/8", subnet_prefix=30, fabric=None,
+                        address_family=None, ipv6_network=IPV6_NETWORK):
+    """Incrementally (re)address a network model, keeping the IPAM state in network_design['ipam'].
+
+    Args:
+        network_design: Model dictionary with 'devices' and 'links' (modified in place)
+        base_network: Link pool network for models without IPAM state yet
+        subnet_prefix: Link subnet prefix for models without IPAM state yet
+        fabric: VXLANFabricAllocator with the VTEP loopback pool and VNI ranges (defaults if None)
+        address_family: 'ipv4', 'ipv6' or 'dual'; stored in network_design['address_family'].
+            Defaults to the model's stored family, else 'ipv4'
+        ipv6_network: Prefix of the IPv6 pools for models without them yet
+
+    Returns:
+        The change summary from IPAddressManager.assign
+    """
+    if address_family:
+        network_design["address_family"] = address_family
+    address_family = network_design.get("address_family", "ipv4")
+    ipam = IPAddressManager(network_design.get("ipam"), base_network, subnet_prefix, fabric, address_family, ipv6_network)
+    changes = ipam.assign(network_design.get("devices", []), network_design.get("links", []))
+    network_design["ipam"] = ipam.to_dict()
+    return changes
+
+# --- Compact models: mesh links are addressed on demand ---
+# A full mesh of N routers gives every router N-1 interfaces and the IPAM N(N-1)/2 link
+# allocations. Compact models (as kept in the Streamlit session) leave those out and keep the
+# 'link_patterns', plus the subnet indices of the pattern links as [start, length] runs (one run
+# per pool for a freshly addressed mesh). The addressed concrete design is cached by content
+# hash of the compact one.
+CONCRETE_CACHE_SIZE = 8
+
+_concrete_cache = OrderedDict()
+
+def design_key(network_design):
+    """Content hash of a network model, the cache key of its concrete design."""
+    payload = json.dumps(network_design, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _remember(key, design):
+    _concrete_cache[key] = design
+    _concrete_cache.move_to_end(key)
+    if len(_concrete_cache) > CONCRETE_CACHE_SIZE:
+        _concrete_cache.popitem(last=False)
+
+def compact_design(design, link_patterns):
+    """Compact form of an addressed concrete design whose pattern links came from `link_patterns`.
+
+    The pattern links, their link allocations and the device interfaces on them are left out;
+    concrete_design recreates them. The concrete design is cached for the returned model.
+
+    Args:
+        design: Addressed design from concrete_topology (explicit links first, then pattern links)
+        link_patterns: The 'link_patterns' the design was expanded from
+
+    Returns:
+        New model dictionary sharing the explicit links and untouched devices with `design`
+    """
+    if not link_patterns:
+        return design
+    explicit = len(design["links"]) - sum(pattern_link_count(pattern) for pattern in link_patterns)
+    pattern_keys = {link["ipam_key"] for link in design["links"][explicit:] if "ipam_key" in link}
+    devices = []
+    for device in design.get("devices", []):
+        interfaces = device.get("interfaces", [])
+        kept = [iface for iface in interfaces if iface.get("ipam_key") not in pattern_keys]
+        devices.append({**device, "interfaces": kept} if len(kept) != len(interfaces) else device)
+    compact = {key: value for key, value in design.items() if key not in ("links", "devices", "ipam")}
+    compact.update({"devices": devices, "links": design["links"][:explicit], "link_patterns": link_patterns})
+    if "ipam" in design:
+        allocations = {}
+        pattern_allocations = {}
+        for pool, allocs in design["ipam"]["allocations"].items():
+            allocations[pool] = {key: index for key, index in allocs.items() if key not in pattern_keys}
+            runs = []
+            for link in design["links"][explicit:]:
+                index = allocs.get(link.get("ipam_key"))
+                if index is None:
+                    continue
+                if runs and runs[-1][0] + runs[-1][1] == index:
+                    runs[-1][1] += 1
+                else:
+                    runs.append([index, 1])
+            if runs:
+                pattern_allocations[pool] = runs
+        compact["ipam"] = {"pools": design["ipam"]["pools"], "allocations": allocations,
+                           "pattern_allocations": pattern_allocations}
+    _remember(design_key(compact), design)
+    return compact
+
+def _restore_pattern_allocations(design, link_patterns):
+    """Put the pattern links' subnet indices (kept as runs by compact_design) back into design['ipam']."""
+    ipam = design["ipam"]
+    runs_by_pool = ipam.pop("pattern_allocations", {})
+    count = sum(pattern_link_count(pattern) for pattern in link_patterns)
+    keys = link_keys([link for link in design["links"] if link.get("is_overlay") != True])[-count:] if count else []
+    for pool, runs in runs_by_pool.items():
+        indices = (start + i for start, length in runs for i in range(length))
+        ipam["allocations"].setdefault(pool, {}).update(zip(keys, indices))
+
+def concrete_design(network_design, fabric=None):
+    """Addressed design of a compact model, with every pattern link expanded (cached).
+
+    On a cache miss the pattern links are expanded and addressed once more: they get back the
+    subnets compact_design recorded and, as the lowest free ports, the ports they had.
+
+    Args:
+        network_design: Model dictionary, compact or not (not modified)
+        fabric: VXLANFabricAllocator the model was addressed with (defaults if None)
+
+    Returns:
+        The model itself if it has no 'link_patterns', else its concrete design (shared; treat it as read-only)
+    """
+    if not network_design.get("link_patterns"):
+        return network_design
+    key = design_key(network_design)
+    design = _concrete_cache.get(key)
+    if design is None:
+        design = concrete_topology(copy.deepcopy(network_design))
+        if "ipam" in design:
+            _restore_pattern_allocations(design, network_design["link_patterns"])
+            update_ip_addresses(design, fabric=fabric)
+    _remember(key, design)
+    return design
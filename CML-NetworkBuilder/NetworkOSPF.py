@@ -0,0 +1,124 @@
+"""OSPF area design for generated topologies: backbone, site areas, ABRs and area ranges.
+
+A single area makes every router flood and run SPF for the whole model. Here the links between
+core routers (and between sites) form the backbone, area 0, and every site gets its own area.
+Routers with interfaces in area 0 and in a site area are the ABRs; they can advertise each site
+area into the backbone as a few summary ranges instead of one route per link.
+"""
+import re
+from NetworkAddressing import summarize_networks
+from NetworkPorts import physical_links
+
+BACKBONE_AREA = 0
+# SiteSwitch3, Site3, Site3_Router -> Site3
+_SITE_NAME = re.compile(r"site\D*?(\d+)", re.IGNORECASE)
+
+def ospf_site(device):
+    """Site of a device for area design: its 'site' key, a Site<N> name (SiteSwitch3 -> Site3) or
+    the name prefix before '_' (DC_Router -> DC); None for core devices."""
+    if device.get("site"):
+        return str(device["site"])
+    match = _SITE_NAME.match(device["name"])
+    if match:
+        return f"Site{match.group(1)}"
+    name = device["name"]
+    return name.split("_")[0] if "_" in name else None
+
+def _number_sites(sites):
+    """Area number per site: the site's own number when it has a free one (Site3 -> 3), else the next free."""
+    numbers = {}
+    used = {BACKBONE_AREA}
+    for site in sites:
+        digits = re.search(r"(\d+)$", site)
+        if digits and int(digits.group(1)) not in used:
+            numbers[site] = int(digits.group(1))
+            used.add(numbers[site])
+    next_free = 1
+    for site in sites:
+        if site not in numbers:
+            while next_free in used:
+                next_free += 1
+            numbers[site] = next_free
+            used.add(next_free)
+    return numbers
+
+def design_ospf_areas(devices, links, area_ranges=True):
+    """Split the routed links of a model into a backbone and one OSPF area per site.
+
+    A link is in its site's area when both ends are in the same site, or when it connects a core
+    router to a site's LAN (RouterN - SiteSwitchN). Links between core routers, between sites, or
+    between a core and a site router are in the backbone. Models without backbone links stay in a
+    single area 0, and so does a site area with no router on the backbone (it has no ABR).
+
+    Args:
+        devices: List of device dictionaries
+        links: List of link dictionaries (with 'subnet' / 'ipv6_subnet' after IP assignment)
+        area_ranges: Summarize each site area at its ABRs (area ranges, IPv4)
+
+    Returns:
+        Dictionary with 'areas' ({area: site name}), sorted 'abrs' and per-router 'routers'
+        entries: {'area' (of its loopback), 'peer_areas': {neighbor name: area of the link},
+        'network_areas': {link subnet: area}, 'ranges': [(area, summary prefix)]}
+    """
+    device_map = {dev["name"]: dev for dev in devices}
+    routers = [dev["name"] for dev in devices if dev.get("type") == "router"]
+    site_of = {dev["name"]: ospf_site(dev) for dev in devices}
+    physical = [link for link in physical_links(links) if len(link.get("endpoints", [])) == 2
+                and all(endpoint in device_map for endpoint in link["endpoints"])]
+
+    # Area of every routed link, by site (None = backbone)
+    link_sites = []
+    for link in physical:
+        a, b = link["endpoints"]
+        site_a, site_b = site_of[a], site_of[b]
+        if site_a == site_b:
+            site = site_a
+        elif site_a is None and device_map[b].get("type") != "router":
+            site = site_b
+        elif site_b is None and device_map[a].get("type") != "router":
+            site = site_a
+        else:
+            site = None
+        link_sites.append(site)
+
+    # A site area needs an ABR: one of its routers also on a backbone link
+    on_backbone = {endpoint for link, site in zip(physical, link_sites) if site is None for endpoint in link["endpoints"]}
+    site_routers = {}
+    for link, site in zip(physical, link_sites):
+        if site is not None:
+            site_routers.setdefault(site, set()).update(endpoint for endpoint in link["endpoints"] if endpoint in device_map and device_map[endpoint].get("type") == "router")
+    attached = {site for site, members in site_routers.items() if members & on_backbone} if on_backbone else set()
+    sites = list(dict.fromkeys(site for site in link_sites if site in attached))
+    area_of_site = _number_sites(sites)
+
+    design = {name: {"area": BACKBONE_AREA, "peer_areas": {}, "network_areas": {}, "ranges": []} for name in routers}
+    area_subnets = {}
+    router_areas = {name: set() for name in routers}
+    for link, site in zip(physical, link_sites):
+        area = area_of_site.get(site, BACKBONE_AREA)
+        a, b = link["endpoints"]
+        for endpoint, peer in ((a, b), (b, a)):
+            if endpoint in design:
+                design[endpoint]["peer_areas"][peer] = area
+                router_areas[endpoint].add(area)
+                for field in ("subnet", "ipv6_subnet"):
+                    if link.get(field):
+                        design[endpoint]["network_areas"][link[field]] = area
+        if "subnet" in link and (a in design or b in design):
+            area_subnets.setdefault(area, []).append(link["subnet"])
+
+    abrs = []
+    for name in routers:
+        areas = router_areas[name]
+        if BACKBONE_AREA in areas and len(areas) > 1:
+            abrs.append(name)
+        elif len(areas) == 1:
+            # Internal routers keep their loopback in their only area
+            design[name]["area"] = next(iter(areas))
+
+    if area_ranges:
+        ranges = {area: summarize_networks(subnets)[1] for area, subnets in area_subnets.items() if area != BACKBONE_AREA}
+        for name in abrs:
+            design[name]["ranges"] = [(area, prefix) for area in sorted(router_areas[name] - {BACKBONE_AREA}) for prefix in ranges.get(area, [])]
+
+    return {"areas": {area: site for site, area in area_of_site.items()}, "abrs": sorted(abrs), "routers": design}
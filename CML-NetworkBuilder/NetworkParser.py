@@ -1,170 +1,258 @@
 import re
 from langchain_core.tools import tool
+from TopologyPatterns import full_mesh_pattern
 
-@tool
-def parse_network_request(text: str) -> dict:
-    """
-    Parses a natural language network request and attempts to infer a topology.
-    Supports arbitrary routers, switches, firewalls, servers, and common routing protocols.
-    Now also supports hierarchical requests like '6 switches connected to a distribution switch connected to 2 routers'.
-    Upgraded to robustly handle numeric device counts and mesh topologies, and to support 'site' as a synonym for a router+switch pair.
-    Now supports 'N sites in a ring topology' (with routers and switches per site, and routers in a ring).
-    Now supports 'N sites connected by routers via ethernet' as a ring of routers with a switch per site.
+# --- Intent grammar ---
+# The whole request is tokenized in a single finditer() pass over one precompiled pattern.
+# Zero-width lookahead alternatives come first so that device mentions and link phrases can
+# overlap each other and the consuming tokens (counts, topology keywords, protocols, VLANs)
+# that are tried at the same position right after them.
+_DEVICE_TYPES = {
+    "external server": "ext-server",
+    "cloud server": "ext-server",
+    "vm": "ext-server",
+    "security appliance": "firewall",
+    "firewall": "firewall",
+    "asa": "firewall",
+    "router": "router",
+    "switch": "switch",
+    "server": "server",
+    "workstation": "server",
+    "host": "server",
+    "pc": "server"
+}
+_DEVICE_WORDS = "|".join(word.replace(" ", r"\s+") for word in _DEVICE_TYPES)
+# Device types guessed from the name of a link endpoint that was never introduced explicitly
+_NAME_PREFIX_TYPES = re.compile(
+    r"(?P<router>router|r(?=\d))|(?P<switch>switch|sw|s(?=\d))|(?P<firewall>firewall|fw|asa)"
+    r"|(?P<server>server|srv|pc|host)"
+)
+_PROTOCOL_PRIORITY = ["bgp", "ospf", "eigrp", "static"]
+_WHITESPACE = re.compile(r"\s*")
+
+def _endpoint(tag):
+    """Link endpoint: a bare name, optionally introduced as '<device type> [named|called] <name>'."""
+    return (
+        rf"(?:(?P<{tag}_type>{_DEVICE_WORDS})s?\s+(?:(?:named|called)\s+)?)?"
+        rf"(?P<{tag}>[a-z0-9_]+)"
+    )
+
+_LINK_TAGS = [("connect_a", "connect_b"), ("chain_a", "chain_b"), ("link_a", "link_b"), ("pair_a", "pair_b")]
+
+_INTENT_GRAMMAR = re.compile(
+    # Link phrases and device mentions (zero-width, may overlap)
+    rf"(?=(?:connect|link)\s+{_endpoint('connect_a')}\s+(?:to|with|and)\s+{_endpoint('connect_b')})"
+    # ', A to B' / 'and A to B' continuing a connect clause ('connect r1 to r2, r2 to r3 and r3 to r1')
+    rf"|(?=\s*(?:,\s*(?:and\s+)?|and\s+){_endpoint('chain_a')}\s+to\s+{_endpoint('chain_b')})"
+    rf"|\b(?="
+    rf"{_endpoint('link_a')}\s+(?:uplinks?|is\s+connected)\s+to\s+{_endpoint('link_b')}"
+    rf"|{_endpoint('pair_a')}\s+and\s+{_endpoint('pair_b')}\s+are\s+connected"
+    rf"|(?P<dtype>{_DEVICE_WORDS})"
+    r"(?:(?P<attached>\d[a-z0-9]*)\b|s?\s+(?:(?P<named>named|called)\s+)?(?P<dname>[a-z0-9]+))?"
+    r")"
+    # Consuming tokens
+    r"|(?P<newline>\n)"
+    r"|(?P<count>\d+)\s+(?P<entity>site|router)s?"
+    r"|(?P<via_ethernet>connected\s+by\s+routers?\s+via\s+ethernet)"
+    r"|(?P<via>connected\s+via\s+(?P<via_proto>[a-z0-9]+))"
+    r"|(?P<full_mesh>full\s+mesh)"
+    r"|(?P<mesh>mesh)"
+    r"|(?P<ring>ring)"
+    r"|(?P<proto>bgp|ospf|eigrp|static)"
+    r"|vlan\s*(?P<vlan>\d+)"
+)
+
+# --- Topology builders ---
+def _site_topology(n, router_links):
+    """Router + switch per site; routers connected as a 'ring' or full 'mesh'.
+
+    Returns:
+        (devices, links, link_patterns); the mesh is returned as a compact pattern, not as links
     """
-    text = text.lower().replace("-", " ").replace("_", " ")
     devices = []
     links = []
-    protocol = None
-    vlan_ids = set()
-
-    # --- New: N sites in a mesh topology ---
-    mesh_site_match = re.search(r'(\d+)\s+sites?.*mesh', text)
-    if mesh_site_match:
-        n = int(mesh_site_match.group(1))
-        for i in range(n):
-            router = {"name": f"Router{i+1}", "type": "router"}
-            switch = {"name": f"SiteSwitch{i+1}", "type": "switch"}
-            devices.append(router)
-            devices.append(switch)
-            links.append({"endpoints": [router["name"], switch["name"]], "link_type": "ethernet"})
-        # Full mesh between routers
-        for i in range(n):
-            for j in range(i+1, n):
-                links.append({"endpoints": [f"Router{i+1}", f"Router{j+1}"], "link_type": "ethernet"})
-        return {"devices": devices, "links": links}
+    for i in range(n):
+        router = {"name": f"Router{i+1}", "type": "router"}
+        switch = {"name": f"SiteSwitch{i+1}", "type": "switch"}
+        devices.append(router)
+        devices.append(switch)
+        links.append({"endpoints": [router["name"], switch["name"]], "link_type": "ethernet"})
+    if router_links == "mesh":
+        return devices, links, [full_mesh_pattern(f"Router{i+1}" for i in range(n))]
+    for i in range(n):
+        next_idx = (i + 1) % n
+        links.append({"endpoints": [f"Router{i+1}", f"Router{next_idx+1}"], "link_type": "ethernet"})
+    return devices, links, []
 
-    # --- Existing: N sites in a ring topology ---
-    ring_site_match = re.search(r'(\d+)\s+sites?\s+.*ring\s+topology', text)
-    if not ring_site_match:
-        ring_site_match = re.search(r'(\d+)\s+sites?\s+topology\s+connected\s+in\s+a\s+ring', text)
-    if not ring_site_match:
-        ring_site_match = re.search(r'(\d+)\s+sites?.*ring', text)
-    if ring_site_match:
-        n = int(ring_site_match.group(1))
-        for i in range(n):
-            router = {"name": f"Router{i+1}", "type": "router"}
-            switch = {"name": f"SiteSwitch{i+1}", "type": "switch"}
-            devices.append(router)
-            devices.append(switch)
-            links.append({"endpoints": [router["name"], switch["name"]], "link_type": "ethernet"})
-        # Connect routers in a ring
-        for i in range(n):
-            next_idx = (i + 1) % n
-            links.append({"endpoints": [f"Router{i+1}", f"Router{next_idx+1}"], "link_type": "ethernet"})
-        return {"devices": devices, "links": links}
+def _device_name(name, type_word=None):
+    """Canonical device name; bare numbers take the type as prefix ('router 1' -> 'Router1')."""
+    if name.isdigit() and type_word:
+        return f"{type_word.split()[-1].capitalize()}{name}"
+    return name.capitalize()
 
-    # --- Existing: N sites connected by routers via ethernet (treat as ring) ---
-    ring_site_flexible = re.search(r'(\d+)\s+sites?\s+connected\s+by\s+routers?\s+via\s+ethernet', text)
-    if ring_site_flexible:
-        n = int(ring_site_flexible.group(1))
-        for i in range(n):
-            router = {"name": f"Router{i+1}", "type": "router"}
-            switch = {"name": f"SiteSwitch{i+1}", "type": "switch"}
-            devices.append(router)
-            devices.append(switch)
-            links.append({"endpoints": [router["name"], switch["name"]], "link_type": "ethernet"})
-        # Connect routers in a ring
-        for i in range(n):
-            next_idx = (i + 1) % n
-            links.append({"endpoints": [f"Router{i+1}", f"Router{next_idx+1}"], "link_type": "ethernet"})
-        return {"devices": devices, "links": links}
+def _guess_device_type(name):
+    match = _NAME_PREFIX_TYPES.match(name)
+    return match.lastgroup if match else "router"
+
+def _scan(text):
+    """Tokenize the normalized request in one pass.
 
-    # --- Existing: Full mesh N routers/sites ---
-    mesh_match = re.search(r'(\d+)\s+(sites?|routers?)\s+.*full\s+mesh', text)
-    if mesh_match:
-        n = int(mesh_match.group(1))
-        entity = mesh_match.group(2)
-        router_names = [f"Router{i+1}" for i in range(n)]
-        if 'site' in entity:
-            for i in range(n):
-                router = {"name": f"Router{i+1}", "type": "router"}
-                switch = {"name": f"SiteSwitch{i+1}", "type": "switch"}
-                devices.append(router)
-                devices.append(switch)
-                links.append({"endpoints": [router["name"], switch["name"]], "link_type": "ethernet"})
-            for i in range(n):
-                for j in range(i+1, n):
-                    links.append({"endpoints": [f"Router{i+1}", f"Router{j+1}"], "link_type": "ethernet"})
-        else:
-            for i in range(n):
-                devices.append({"name": f"Router{i+1}", "type": "router"})
-            for i in range(n):
-                for j in range(i+1, n):
-                    links.append({"endpoints": [f"Router{i+1}", f"Router{j+1}"], "link_type": "ethernet"})
+    Returns:
+        Dictionary of the tokens the classifier needs: site/router counts, topology keywords
+        (with their position and line), via-phrases, protocols, VLANs, devices and links
+    """
+    tokens = {
+        "counts": [], "keywords": [], "via": [], "protocols": set(),
+        "vlans": {}, "devices": {}, "links": {}
+    }
+    line = 0
+    # End of the last connect clause (or of its last continuation); continuations must start there
+    chain_end = None
+    for m in _INTENT_GRAMMAR.finditer(text):
+        kind = m.lastgroup
+        groups = m.groupdict()
+        if m.start() == m.end():
+            # Lookahead match: a link phrase or a device mention
+            for tag_a, tag_b in _LINK_TAGS:
+                if groups[tag_a] is not None:
+                    if tag_a == "chain_a" and m.start() != chain_end:
+                        # 'and A to B' that doesn't continue a connect clause
+                        break
+                    if tag_a in ("connect_a", "chain_a"):
+                        chain_end = m.end(tag_b)
+                    a = _device_name(groups[tag_a], groups[f"{tag_a}_type"])
+                    b = _device_name(groups[tag_b], groups[f"{tag_b}_type"])
+                    for name, type_word in ((a, groups[f"{tag_a}_type"]), (b, groups[f"{tag_b}_type"])):
+                        if type_word and name not in tokens["devices"]:
+                            tokens["devices"][name] = _DEVICE_TYPES[" ".join(type_word.split())]
+                    if a != b:
+                        tokens["links"].setdefault(frozenset((a, b)), [a, b])
+                    break
+            else:
+                type_word = groups["dtype"]
+                if groups["attached"]:
+                    name = (type_word + groups["attached"]).capitalize()
+                elif groups["dname"] and (groups["named"] or any(c.isdigit() for c in groups["dname"])):
+                    name = _device_name(groups["dname"], type_word)
+                else:
+                    # Unnamed mentions ('two routers') don't define a device on their own
+                    continue
+                tokens["devices"].setdefault(name, _DEVICE_TYPES[" ".join(type_word.split())])
+            continue
+
+        if kind == "newline":
+            line += 1
+        elif kind == "entity":
+            line += m.group().count("\n")
+            tokens["counts"].append((m.group("entity"), int(m.group("count")), m.end(), line))
+        elif kind == "via_ethernet":
+            tokens["via"].append(("via_ethernet", m.start(), None))
+        elif kind == "via":
+            tokens["via"].append(("via_proto", m.start(), m.group("via_proto")))
+            if m.group("via_proto") in _PROTOCOL_PRIORITY:
+                tokens["protocols"].add(m.group("via_proto"))
+        elif kind in ("full_mesh", "mesh", "ring"):
+            tokens["keywords"].append((kind, m.start(), line))
+        elif kind == "proto":
+            tokens["protocols"].add(m.group("proto"))
+        elif kind == "vlan":
+            tokens["vlans"][m.group("vlan")] = None
+    return tokens
+
+def _count_followed_by(text, tokens, entity, keywords, need_space=False):
+    """First '<N> <entity>' count with one of `keywords` later on the same line (the old '.*' match).
+
+    With need_space the count must be followed by whitespace, which may span lines (the old
+    '\\s+.*' match): the keyword is then looked for on the line where that whitespace ends.
+    """
+    for count_entity, n, end, line in tokens["counts"]:
+        if count_entity != entity:
+            continue
+        if need_space:
+            gap = _WHITESPACE.match(text, end).group()
+            if not gap:
+                continue
+            line += gap.count("\n")
+        for keyword, start, keyword_line in tokens["keywords"]:
+            if keyword in keywords and keyword_line == line and start >= end:
+                return n
+    return None
+
+def _site_count_before(text, tokens, via_kind):
+    """First '<N> sites' count directly followed by a via-phrase of the given kind."""
+    for count_entity, n, end, _ in tokens["counts"]:
+        if count_entity != "site":
+            continue
+        for kind, start, proto in tokens["via"]:
+            gap = text[end:start]
+            if kind == via_kind and start > end and gap.isspace():
+                return n, proto
+    return None
+
+def parse_network_text(text):
+    """Plain-function form of parse_network_request (picklable, no tool wrapper).
+
+    Args:
+        text: Natural language network request
+
+    Returns:
+        Topology dictionary with 'devices' and 'links' (plus 'link_patterns' for meshes and
+        'protocol'/'vlans' when given),
+        a {'protocol': ...} hint, or an {'error': ...} dictionary
+    """
+    text = text.lower().replace("-", " ").replace("_", " ")
+    tokens = _scan(text)
+
+    # --- N sites in a mesh topology ---
+    n = _count_followed_by(text, tokens, "site", ("mesh", "full_mesh"))
+    if n is not None:
+        devices, links, link_patterns = _site_topology(n, "mesh")
+        return {"devices": devices, "links": links, "link_patterns": link_patterns}
+
+    # --- N sites in a ring topology ---
+    n = _count_followed_by(text, tokens, "site", ("ring",))
+    if n is None:
+        # --- N sites connected by routers via ethernet (treat as ring) ---
+        site_via = _site_count_before(text, tokens, "via_ethernet")
+        n = site_via[0] if site_via else None
+    if n is not None:
+        devices, links, _ = _site_topology(n, "ring")
         return {"devices": devices, "links": links}
 
-    # --- New: N sites connected via [protocol] (default to ring) ---
-    site_conn_proto = re.search(r'(\d+)\s+sites?\s+connected\s+via\s+([a-z0-9]+)', text)
-    if site_conn_proto:
-        n = int(site_conn_proto.group(1))
-        proto = site_conn_proto.group(2).upper()
-        for i in range(n):
-            router = {"name": f"Router{i+1}", "type": "router"}
-            switch = {"name": f"SiteSwitch{i+1}", "type": "switch"}
-            devices.append(router)
-            devices.append(switch)
-            links.append({"endpoints": [router["name"], switch["name"]], "link_type": "ethernet"})
-        # Connect routers in a ring
-        for i in range(n):
-            next_idx = (i + 1) % n
-            links.append({"endpoints": [f"Router{i+1}", f"Router{next_idx+1}"], "link_type": "ethernet"})
+    # --- Full mesh N routers ---
+    n = _count_followed_by(text, tokens, "router", ("full_mesh",), need_space=True)
+    if n is not None:
+        devices = [{"name": f"Router{i+1}", "type": "router"} for i in range(n)]
+        return {"devices": devices, "links": [], "link_patterns": [full_mesh_pattern(d["name"] for d in devices)]}
+
+    # --- N sites connected via [protocol] (default to ring) ---
+    site_via = _site_count_before(text, tokens, "via_proto")
+    if site_via:
+        n, proto = site_via
+        devices, links, _ = _site_topology(n, "ring")
         return {
             "devices": devices,
             "links": links,
-            "protocol": proto,
+            "protocol": proto.upper(),
             "sites": n,
             "topology": "ring",
             "routers_per_site": 1,
             "switches_per_site": 1
         }
 
-    # --- Legacy: Explicit device names and connections ---
-    device_types = {
-        "router": ["router", "core router", "edge router", "wan router"],
-        "switch": ["switch", "core switch", "access switch", "distribution switch"],
-        "firewall": ["firewall", "asa", "security appliance"],
-        "server": ["server", "pc", "host", "workstation"],
-        "ext-server": ["external server", "cloud server", "vm"]
-    }
-    found_devices = set()
-    for dtype, synonyms in device_types.items():
-        for syn in synonyms:
-            matches = re.findall(rf"{syn}\s*(named|called)?\s*([a-z0-9_]+)?", text)
-            for match in matches:
-                name = match[1] if match[1] else f"{dtype.capitalize()}{len(found_devices)+1}"
-                found_devices.add((name.capitalize(), dtype))
-            matches = re.findall(rf"([a-z0-9_]+)\s*{syn}", text)
-            for match in matches:
-                found_devices.add((match.capitalize(), dtype))
-    for match in re.findall(r'\b(router|switch|firewall|server|pc|host)[\s\-]?([a-z0-9]+)\b', text):
-        dtype, name = match
-        dtype = dtype if dtype != "pc" and dtype != "host" else "server"
-        found_devices.add((f"{dtype.capitalize()}{name}", dtype))
-    for name, dtype in found_devices:
-        devices.append({"name": name, "type": dtype})
-
-    link_patterns = [
-        r'connect\s+([a-z0-9_]+)\s+(?:to|with|and)\s+([a-z0-9_]+)',
-        r'([a-z0-9_]+)\s+uplinks?\s+to\s+([a-z0-9_]+)',
-        r'link\s+([a-z0-9_]+)\s+(?:to|with|and)\s+([a-z0-9_]+)',
-        r'([a-z0-9_]+)\s+is\s+connected\s+to\s+([a-z0-9_]+)',
-        r'([a-z0-9_]+)\s+and\s+([a-z0-9_]+)\s+are\s+connected'
-    ]
-    for pattern in link_patterns:
-        for match in re.findall(pattern, text):
-            if isinstance(match, tuple):
-                links.append({"endpoints": [match[0].capitalize(), match[1].capitalize()], "link_type": "ethernet"})
-            else:
-                links.append({"endpoints": [m.capitalize() for m in match], "link_type": "ethernet"})
-
-    for proto in ["bgp", "ospf", "eigrp", "static"]:
-        if proto in text:
-            protocol = proto.upper()
-            break
-    vlan_matches = re.findall(r'vlan\s*(\d+)', text)
-    for vlan in vlan_matches:
-        vlan_ids.add(vlan)
-        
+    # --- Explicit device names and connections ---
+    found_devices = tokens["devices"]
+    links = []
+    for a, b in tokens["links"].values():
+        for name in (a, b):
+            if name not in found_devices:
+                found_devices[name] = _guess_device_type(name.lower())
+        links.append({"endpoints": [a, b], "link_type": "ethernet"})
+    devices = [{"name": name, "type": dtype} for name, dtype in found_devices.items()]
+
+    protocol = next((proto.upper() for proto in _PROTOCOL_PRIORITY if proto in tokens["protocols"]), None)
+    vlan_ids = list(tokens["vlans"])
+
     # Create output, prioritizing parsed devices/links but including protocol if detected
     if devices and links:
         output = {
@@ -174,12 +262,24 @@ def parse_network_request(text: str) -> dict:
         if protocol:
             output["protocol"] = protocol
         if vlan_ids:
-            output["vlans"] = list(vlan_ids)
+            output["vlans"] = vlan_ids
     elif protocol:
         output = {"protocol": protocol}
         if vlan_ids:
-            output["vlans"] = list(vlan_ids)
+            output["vlans"] = vlan_ids
     else:
         output = {"error": "Unable to parse enough topology information. Please include device names and connections."}
 
-    return output 
\ No newline at end of file
+    return output
+
+@tool
+def parse_network_request(text: str) -> dict:
+    """
+    Parses a natural language network request and attempts to infer a topology.
+    Supports arbitrary routers, switches, firewalls, servers, and common routing protocols.
+    Now also supports hierarchical requests like '6 switches connected to a distribution switch connected to 2 routers'.
+    Upgraded to robustly handle numeric device counts and mesh topologies, and to support 'site' as a synonym for a router+switch pair.
+    Now supports 'N sites in a ring topology' (with routers and switches per site, and routers in a ring).
+    Now supports 'N sites connected by routers via ethernet' as a ring of routers with a switch per site.
+    """
+    return parse_network_text(text)
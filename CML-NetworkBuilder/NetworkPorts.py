@@ -0,0 +1,204 @@
+import heapq
+
+# CML node interface limits and preferred node definitions
+CML_NODE_INTERFACE_LIMITS = {
+    "iosv": 4,
+    "csr1000v": 10,
+    "iosvl2": 8,
+    "nxosv9000": 32,
+    "asav": 10,
+    "ubuntu": 4,
+    "ext-server": 4,
+    "alpine": 4,
+    "win10-desktop": 4,
+}
+
+# Preferred node definition selection logic
+PREFERRED_ROUTER = [
+    (4, "iosv"),
+    (10, "csr1000v"),
+]
+PREFERRED_SWITCH = [
+    (8, "iosvl2"),
+    (32, "nxosv9000"),
+]
+PREFERRED_SERVER = [
+    (4, "ubuntu"),
+]
+
+# Helper to select node definition based on type and interface count
+def select_node_definition(dev_type, iface_count):
+    if dev_type == "router":
+        for max_if, node_def in PREFERRED_ROUTER:
+            if iface_count <= max_if:
+                return node_def, CML_NODE_INTERFACE_LIMITS[node_def]
+        return "csr1000v", CML_NODE_INTERFACE_LIMITS["csr1000v"]
+    elif dev_type == "switch":
+        for max_if, node_def in PREFERRED_SWITCH:
+            if iface_count <= max_if:
+                return node_def, CML_NODE_INTERFACE_LIMITS[node_def]
+        return "nxosv9000", CML_NODE_INTERFACE_LIMITS["nxosv9000"]
+    elif dev_type in ["server", "ext-server", "alpine", "win10-desktop"]:
+        return "ubuntu", CML_NODE_INTERFACE_LIMITS["ubuntu"]
+    elif dev_type == "firewall":
+        return "asav", CML_NODE_INTERFACE_LIMITS["asav"]
+    else:
+        return dev_type, 4  # Default fallback
+
+# --- Interface naming per node definition ---
+# (CML slot of the first data port, interface name of data port N). Slot 0 is the management
+# interface on nxosv9000 and asav, so their data ports start at slot 1.
+INTERFACE_NAMING = {
+    "iosv": (0, lambda port: f"GigabitEthernet0/{port}"),
+    "csr1000v": (0, lambda port: f"GigabitEthernet{port + 1}"),
+    "iosvl2": (0, lambda port: f"GigabitEthernet{port // 4}/{port % 4}"),
+    "nxosv9000": (1, lambda port: f"Ethernet1/{port + 1}"),
+    "asav": (1, lambda port: f"GigabitEthernet0/{port}"),
+    "ubuntu": (0, lambda port: f"ens{port + 2}"),
+    "alpine": (0, lambda port: f"eth{port}"),
+    "ext-server": (0, lambda port: f"eth{port}"),
+    "win10-desktop": (0, lambda port: f"Ethernet{port}"),
+}
+DEFAULT_NAMING = (0, lambda port: f"GigabitEthernet0/{port}")
+
+def interface_name(node_definition, port):
+    """Name of data port `port` (0-based) on a node definition."""
+    return INTERFACE_NAMING.get(node_definition, DEFAULT_NAMING)[1](port)
+
+def interface_slot(node_definition, port):
+    """CML interface slot of data port `port` on a node definition."""
+    return INTERFACE_NAMING.get(node_definition, DEFAULT_NAMING)[0] + port
+
+def physical_links(links):
+    """Links that get an interface on both endpoints (everything but VXLAN overlay tunnels)."""
+    return [link for link in links if link.get("is_overlay") != True]
+
+class PortAllocator:
+    """Per-device sequential port allocation that honours the CML interface limit of each node.
+
+    Node definitions come from the device ('node_definition') or are picked with
+    select_node_definition from the device's link count. Ports already recorded on interfaces
+    ('port' key) stay taken; every allocation after that is O(1): lowest released port first,
+    then the next unused one. Ports beyond the node's limit are still handed out (so the model
+    stays complete) but reported by errors().
+    """
+
+    def __init__(self, devices, links=()):
+        """
+        Args:
+            devices: List of device dictionaries
+            links: Links used to size devices without a node_definition
+        """
+        degree = {}
+        for link in physical_links(links):
+            for endpoint in link.get("endpoints", [])[:2]:
+                degree[endpoint] = degree.get(endpoint, 0) + 1
+        self.node_definitions = {}
+        self.limits = {}
+        self._naming = {}
+        self._used = {}
+        self._free = {}
+        self._next = {}
+        for dev in devices:
+            name = dev["name"]
+            node_def = dev.get("node_definition")
+            if node_def:
+                limit = CML_NODE_INTERFACE_LIMITS.get(node_def, 4)
+            else:
+                node_def, limit = select_node_definition(dev.get("type", "router"), degree.get(name, 0))
+            self.node_definitions[name] = node_def
+            self.limits[name] = limit
+            self._naming[name] = INTERFACE_NAMING.get(node_def, DEFAULT_NAMING)
+            interfaces = dev.get("interfaces")
+            self._used[name] = {iface["port"] for iface in interfaces if isinstance(iface.get("port"), int)} if interfaces else set()
+            self._next[name] = 0
+
+    def allocate(self, device_name):
+        """Take the next port on a device; returns (port, slot, interface name)."""
+        used = self._used[device_name]
+        free = self._free.get(device_name)
+        port = None
+        while free:
+            candidate = heapq.heappop(free)
+            if candidate not in used:
+                port = candidate
+                break
+        if port is None:
+            port = self._next[device_name]
+            while port in used:
+                port += 1
+            self._next[device_name] = port + 1
+        used.add(port)
+        first_slot, name = self._naming[device_name]
+        return port, first_slot + port, name(port)
+
+    def release(self, device_name, port):
+        """Give a port back so the next allocation on that device reuses it."""
+        if port in self._used.get(device_name, ()):
+            self._used[device_name].discard(port)
+            heapq.heappush(self._free.setdefault(device_name, []), port)
+
+    def errors(self):
+        """Messages for devices that use more ports than their node definition provides."""
+        messages = []
+        for name, used in self._used.items():
+            if used and max(used) >= self.limits[name]:
+                messages.append(f"Device {name} needs {max(used) + 1} interfaces, but {self.node_definitions[name]} supports {self.limits[name]}")
+        return messages
+
+def build_port_index(devices, links):
+    """Per-device list of connected ports: {device: [{'port', 'slot', 'name', 'peer', 'peer_interface'}]}.
+
+    Uses the ports recorded on links by the addressing step; links without them are planned with
+    a fresh PortAllocator (the model is not modified).
+    """
+    planner = None
+    index = {dev["name"]: [] for dev in devices}
+    for link in physical_links(links):
+        endpoints = link.get("endpoints", [])
+        if len(endpoints) != 2 or any(e not in index for e in endpoints):
+            continue
+        if "interfaces" in link and "slots" in link:
+            ports = link.get("ports", [None, None])
+            slots = link["slots"]
+            names = link["interfaces"]
+        else:
+            if planner is None:
+                planner = PortAllocator(devices, links)
+            allocations = [planner.allocate(endpoint) for endpoint in endpoints]
+            ports = [a[0] for a in allocations]
+            slots = [a[1] for a in allocations]
+            names = [a[2] for a in allocations]
+        for i in range(2):
+            index[endpoints[i]].append({
+                "port": ports[i],
+                "slot": slots[i],
+                "name": names[i],
+                "peer": endpoints[1-i],
+                "peer_interface": names[1-i]
+            })
+    for ports in index.values():
+        ports.sort(key=lambda p: (p["port"] is None, p["port"] if p["port"] is not None else 0))
+    return index
+
+def port_limit_errors(devices, links):
+    """Check a model before deployment: one message per device that needs more ports than it has."""
+    device_map = {dev["name"]: dev for dev in devices}
+    degree = {}
+    highest = {}
+    for link in physical_links(links):
+        for endpoint, port in zip(link.get("endpoints", [])[:2], link.get("ports") or [None, None]):
+            degree[endpoint] = degree.get(endpoint, 0) + 1
+            if port is not None:
+                highest[endpoint] = max(highest.get(endpoint, -1), port)
+    messages = []
+    for name, count in degree.items():
+        dev = device_map.get(name)
+        if dev is None:
+            continue
+        node_def = dev.get("node_definition") or select_node_definition(dev.get("type", "router"), count)[0]
+        limit = CML_NODE_INTERFACE_LIMITS.get(node_def, 4)
+        needed = max(count, highest.get(name, -1) + 1)
+        if needed > limit:
+            messages.append(f"Device {name} needs {needed} interfaces, but {node_def} supports {limit}")
+    return messages
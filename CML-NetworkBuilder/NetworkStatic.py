@@ -0,0 +1,156 @@
+"""Static routing for generated topologies: shortest-path next hops to every remote subnet.
+
+The router graph is built once from the links. Each router then runs one BFS over it, which gives
+the first hop towards every other router; every subnet attached to a remote router (its links and
+loopbacks) is routed via the address of that first hop on the shared link. Routers with a single
+neighboring router just get a default route.
+
+All destination subnets of the model are parsed and sorted by address once. Per router, labeling
+that sorted list with the first hop leaves runs of consecutive subnets with the same next hop, and
+each run of contiguous addresses is summarized as one address range, so summarizing costs a pass
+over the list instead of a sort per router.
+"""
+from itertools import groupby
+from NetworkAddressing import int_to_ipv4, int_to_ipv6, parse_network, prefix_to_netmask, range_blocks
+from NetworkPorts import physical_links
+
+# (link subnet field, link addresses field, loopback address field, address bits)
+FAMILIES = (
+    ("subnet", "ips", "ip", 32),
+    ("ipv6_subnet", "ipv6_ips", "ipv6", 128),
+)
+
+def _first_hops(adjacency, source):
+    """BFS over router indices: (distance, first hop as a position in adjacency[source]) per router.
+
+    The source and unreachable routers have first hop None; unreachable ones have distance -1.
+    """
+    distance = [-1] * len(adjacency)
+    first_hop = [None] * len(adjacency)
+    distance[source] = 0
+    queue = []
+    for slot, neighbor in enumerate(adjacency[source]):
+        if distance[neighbor] < 0:
+            distance[neighbor] = 1
+            first_hop[neighbor] = slot
+            queue.append(neighbor)
+    # Iterating a list that is appended to visits the appended routers too (FIFO order)
+    for node in queue:
+        hop = first_hop[node]
+        next_distance = distance[node] + 1
+        for neighbor in adjacency[node]:
+            if distance[neighbor] < 0:
+                distance[neighbor] = next_distance
+                first_hop[neighbor] = hop
+                queue.append(neighbor)
+    return distance, first_hop
+
+def design_static_routes(devices, links, summarize=True, stub_default=True):
+    """Static routes for every router of a model along BFS shortest paths (fewest router hops).
+
+    Only routers forward traffic: subnets with at least one router on them (links and router
+    loopbacks) are routed, and paths never cross switches or hosts. Equal-cost paths go via the
+    neighbor found first, in link order; a link between two remote routers is routed towards the
+    nearer one.
+
+    Args:
+        devices: List of device dictionaries
+        links: List of link dictionaries, addressed (see NetworkAddressing.assign_ip_addresses)
+        summarize: Collapse contiguous destinations with the same next hop into the fewest
+            exact prefixes
+        stub_default: Routers with a single neighboring router get a default route instead
+
+    Returns:
+        {router name: {'static_routes': [(destination, mask, next hop)],
+                       'static_routes6': [(prefix, next hop)]}}, routes in address order
+    """
+    routers = [dev for dev in devices if dev.get("type") == "router"]
+    index = {router["name"]: i for i, router in enumerate(routers)}
+    device_names = {dev["name"] for dev in devices}
+    adjacency = [[] for _ in routers]
+    # Next-hop addresses per family, aligned with adjacency: the neighbor's address on the link
+    next_hops = [[] for _ in routers]
+    # Destination blocks per family: {(address, prefix): [owner router indices]}
+    destinations = [{} for _ in FAMILIES]
+    for link in physical_links(links):
+        endpoints = link.get("endpoints", [])
+        if len(endpoints) != 2 or not all(endpoint in device_names for endpoint in endpoints):
+            continue
+        owners = [index[endpoint] for endpoint in endpoints if endpoint in index]
+        if not owners:
+            continue
+        for family, (subnet_field, _, _, _) in enumerate(FAMILIES):
+            block = parse_network(link[subnet_field]) if link.get(subnet_field) else None
+            if block:
+                destinations[family].setdefault(block[:2], []).extend(owners)
+        if len(owners) == 2:
+            a, b = owners
+            ips = [link.get(ips_field) or [None, None] for _, ips_field, _, _ in FAMILIES]
+            adjacency[a].append(b)
+            next_hops[a].append(tuple(family_ips[1] for family_ips in ips))
+            adjacency[b].append(a)
+            next_hops[b].append(tuple(family_ips[0] for family_ips in ips))
+    for i, router in enumerate(routers):
+        for iface in router.get("interfaces", []):
+            if iface.get("is_loopback"):
+                for family, (_, _, address_field, bits) in enumerate(FAMILIES):
+                    block = parse_network(f"{iface[address_field]}/{bits}") if iface.get(address_field) else None
+                    if block:
+                        destinations[family].setdefault(block[:2], []).append(i)
+
+    # Sorted destinations per family: start/end addresses, owners, and runs of contiguous addresses
+    tables = []
+    for family, (_, _, _, bits) in enumerate(FAMILIES):
+        blocks = sorted(destinations[family].items())
+        starts = [value for (value, _), _ in blocks]
+        ends = [value + (1 << (bits - prefix)) for (value, prefix), _ in blocks]
+        first_owner = [owners[0] for _, owners in blocks]
+        second_owner = [owners[-1] for _, owners in blocks]
+        contiguous_run = []
+        run = 0
+        for i, start in enumerate(starts):
+            if i and start != ends[i - 1]:
+                run += 1
+            contiguous_run.append(run)
+        tables.append((starts, ends, first_owner, second_owner, contiguous_run))
+
+    routes = {}
+    for source, router in enumerate(routers):
+        result = {"static_routes": [], "static_routes6": []}
+        routes[router["name"]] = result
+        if not adjacency[source]:
+            continue
+        if stub_default and len(set(adjacency[source])) == 1:
+            ip, ip6 = next_hops[source][0]
+            if ip:
+                result["static_routes"].append(("0.0.0.0", "0.0.0.0", ip))
+            if ip6:
+                result["static_routes6"].append(("::/0", ip6))
+            continue
+
+        distance, first_hop = _first_hops(adjacency, source)
+        for family, (_, _, _, bits) in enumerate(FAMILIES):
+            starts, ends, first_owner, second_owner, contiguous_run = tables[family]
+            # First hop of every destination, towards its nearer owner. The source is nearest to
+            # its own subnets, which have no first hop; so do those of unreachable routers
+            nearer = [a if distance_a <= distance_b else b for a, b, distance_a, distance_b in
+                      zip(first_owner, second_owner, map(distance.__getitem__, first_owner), map(distance.__getitem__, second_owner))]
+            labels = list(map(first_hop.__getitem__, nearer))
+            family_routes = []
+            if summarize:
+                i = 0
+                for (label, _), run in groupby(zip(labels, contiguous_run)):
+                    length = len(list(run))
+                    if label is not None and next_hops[source][label][family]:
+                        next_hop = next_hops[source][label][family]
+                        family_routes.extend((value, prefix, next_hop) for value, prefix in range_blocks(starts[i], ends[i + length - 1], bits))
+                    i += length
+            else:
+                for i, label in enumerate(labels):
+                    if label is not None and next_hops[source][label][family]:
+                        family_routes.append((starts[i], bits - (ends[i] - starts[i]).bit_length() + 1, next_hops[source][label][family]))
+            if family == 0:
+                result["static_routes"] = [(int_to_ipv4(value), prefix_to_netmask(prefix), next_hop) for value, prefix, next_hop in family_routes]
+            else:
+                result["static_routes6"] = [(f"{int_to_ipv6(value)}/{prefix}", next_hop) for value, prefix, next_hop in family_routes]
+    return routes
@@ -0,0 +1,209 @@
+import re
+from TopologyPatterns import full_mesh_pattern
+
+# --- Template-based topology generators for reliable network creation ---
+def create_template_topology(topology_type, num_devices, protocol=None, device_type="router"):
+    """Generate a standard topology based on common topology patterns.
+    
+    Args:
+        topology_type: String, one of: 'ring', 'star', 'mesh', 'bus', 'line'
+        num_devices: Number of devices to include
+        protocol: Optional routing protocol (OSPF, EIGRP, BGP, etc.)
+        device_type: Type of device to create (router, switch, etc.)
+        
+    Returns:
+        Dictionary with 'devices' and 'links' lists ready for the topology builder
+        (meshes carry their links as 'link_patterns', see TopologyPatterns)
+    """
+    devices = []
+    links = []
+    link_patterns = []
+    
+    # Create the devices
+    for i in range(1, num_devices + 1):
+        devices.append({
+            "name": f"{device_type.capitalize()}{i}",
+            "type": device_type.lower()
+        })
+    
+    # Create the links based on topology type
+    if topology_type.lower() == "ring":
+        # Each device connects to the next, and the last connects to the first
+        for i in range(num_devices):
+            next_idx = (i + 1) % num_devices
+            link = {
+                "endpoints": [devices[i]["name"], devices[next_idx]["name"]],
+                "link_type": "ethernet"  # Default link type
+            }
+            links.append(link)
+    
+    elif topology_type.lower() == "star":
+        # First device is the hub, all others connect to it
+        hub = devices[0]["name"]
+        for i in range(1, num_devices):
+            link = {
+                "endpoints": [hub, devices[i]["name"]],
+                "link_type": "ethernet"  # Default link type
+            }
+            links.append(link)
+    
+    elif topology_type.lower() == "mesh":
+        # Every device connects to every other device; kept as a compact pattern, expanded on demand
+        link_patterns.append(full_mesh_pattern(device["name"] for device in devices))
+    
+    elif topology_type.lower() == "bus" or topology_type.lower() == "line":
+        # Devices connect in a line
+        for i in range(num_devices - 1):
+            link = {
+                "endpoints": [devices[i]["name"], devices[i+1]["name"]],
+                "link_type": "ethernet"  # Default link type
+            }
+            links.append(link)
+    
+    topology = {
+        "devices": devices,
+        "links": links
+    }
+    if link_patterns:
+        topology["link_patterns"] = link_patterns
+    
+    # Add protocol if specified
+    if protocol:
+        topology["protocol"] = protocol.upper()
+    
+    return topology
+
+def detect_topology_pattern(text, allow_default=True):
+    """Detect if the user is requesting a common topology pattern.
+    
+    Args:
+        text: User's input text
+        allow_default: If False, only match when a topology keyword (ring, star, ...) is present
+        
+    Returns:
+        Tuple of (topology_type, num_devices, protocol, device_type) or None if no pattern detected
+    """
+    
+    # Look for topology type keywords
+    topology_type = None
+    if re.search(r'\b(ring|loop|circular|circle)\b', text, re.IGNORECASE):
+        topology_type = "ring"
+    elif re.search(r'\b(star|hub.+spoke|hub|spoke|central|radial)\b', text, re.IGNORECASE):
+        topology_type = "star"
+    elif re.search(r'\b(full.?mesh|mesh|fully.connected|complete)\b', text, re.IGNORECASE):
+        topology_type = "mesh"
+    elif re.search(r'\b(bus|line|linear|daisy.?chain|in.?a.?row|chain)\b', text, re.IGNORECASE):
+        topology_type = "bus"
+    
+    # Look for numbers of devices
+    num_match = re.search(r'(\d+)\s+(router|switch|firewall|device|computer|server|host)', text, re.IGNORECASE)
+    if not num_match:
+        # Try alternate patterns if the first one didn't match
+        num_match = re.search(r'(\d+)[\s-]+(node|device|equipment)', text, re.IGNORECASE)
+    if not num_match:
+        # Just look for any number followed by a word
+        num_match = re.search(r'(\d+)', text, re.IGNORECASE)
+    
+    num_devices = int(num_match.group(1)) if num_match else None
+    
+    # Look for device type
+    device_type = "router"  # Default
+    if re.search(r'\bswitch', text, re.IGNORECASE):
+        device_type = "switch"
+    elif re.search(r'\bfirewall', text, re.IGNORECASE):
+        device_type = "firewall"
+    
+    # Look for protocol
+    protocol = None
+    if re.search(r'\bOSPF\b', text, re.IGNORECASE):
+        protocol = "OSPF"
+    elif re.search(r'\bEIGRP\b', text, re.IGNORECASE):
+        protocol = "EIGRP"
+    elif re.search(r'\bBGP\b', text, re.IGNORECASE):
+        protocol = "BGP"
+    elif re.search(r'\bRIP\b', text, re.IGNORECASE):
+        protocol = "RIP"
+    elif re.search(r'\bstatic\b', text, re.IGNORECASE):
+        protocol = "STATIC"
+    
+    # If no specific topology mentioned but we have devices, default to ring topology
+    # Ring is a good default as it's commonly used in network designs
+    if not topology_type and num_devices and allow_default:
+        if num_devices == 2:
+            topology_type = "bus"  # For 2 devices, a simple line makes sense
+        elif num_devices <= 6:
+            topology_type = "ring"  # Ring works well for small to medium networks
+        else:
+            topology_type = "star"  # Star is better for larger number of devices
+    
+    # Return None if we couldn't detect both topology type and number of devices
+    if not topology_type or not num_devices:
+        return None
+    
+    return (topology_type, num_devices, protocol, device_type)
+
+# --- Helper functions for topology generation ---
+def create_vxlan_multisite_topology(num_sites, internet_connected=True):
+    """
+    Creates a VXLAN multi-site topology with a main datacenter and remote sites.
+    - num_sites: Total number of sites (including main DC)
+    - internet_connected: If True, sites are connected via "internet" links, otherwise direct links
+    """
+    devices = []
+    links = []
+    
+    # Create main datacenter (site 0)
+    dc_router = {"name": "DC_Border_Router", "type": "router"}
+    dc_spine1 = {"name": "DC_Spine1", "type": "switch"}
+    dc_spine2 = {"name": "DC_Spine2", "type": "switch"}
+    dc_leaf1 = {"name": "DC_Leaf1_VTEP", "type": "switch"}
+    dc_leaf2 = {"name": "DC_Leaf2_VTEP", "type": "switch"}
+    dc_server1 = {"name": "DC_Server1", "type": "server"}
+    dc_server2 = {"name": "DC_Server2", "type": "server"}
+    
+    devices.extend([dc_router, dc_spine1, dc_spine2, dc_leaf1, dc_leaf2, dc_server1, dc_server2])
+    
+    # Connect DC devices
+    links.append({"endpoints": [dc_router["name"], dc_spine1["name"]], "link_type": "ethernet"})
+    links.append({"endpoints": [dc_router["name"], dc_spine2["name"]], "link_type": "ethernet"})
+    links.append({"endpoints": [dc_spine1["name"], dc_leaf1["name"]], "link_type": "ethernet"})
+    links.append({"endpoints": [dc_spine1["name"], dc_leaf2["name"]], "link_type": "ethernet"})
+    links.append({"endpoints": [dc_spine2["name"], dc_leaf1["name"]], "link_type": "ethernet"})
+    links.append({"endpoints": [dc_spine2["name"], dc_leaf2["name"]], "link_type": "ethernet"})
+    links.append({"endpoints": [dc_leaf1["name"], dc_server1["name"]], "link_type": "ethernet"})
+    links.append({"endpoints": [dc_leaf2["name"], dc_server2["name"]], "link_type": "ethernet"})
+    
+    # Create branch sites
+    for i in range(1, num_sites):
+        site_name = f"Site{i}"
+        site_router = {"name": f"{site_name}_Router", "type": "router"}
+        site_switch = {"name": f"{site_name}_Switch_VTEP", "type": "switch"}
+        site_server = {"name": f"{site_name}_Server", "type": "server"}
+        
+        devices.extend([site_router, site_switch, site_server])
+        
+        # Connect site components
+        links.append({"endpoints": [site_router["name"], site_switch["name"]], "link_type": "ethernet"})
+        links.append({"endpoints": [site_switch["name"], site_server["name"]], "link_type": "ethernet"})
+        
+        # Connect to DC Router (WAN/Internet links)
+        link_type = "internet" if internet_connected else "ethernet"
+        links.append({"endpoints": [dc_router["name"], site_router["name"]], "link_type": link_type})
+        
+        # Add logical VXLAN overlay links (these won't be actual interfaces but represent the overlay)
+        # In a real network, these would be VXLAN tunnels over the internet/WAN
+        links.append({
+            "endpoints": [dc_leaf1["name"], site_switch["name"]], 
+            "link_type": "vxlan", 
+            "vni": 10000 + i,
+            "is_overlay": True
+        })
+    
+    # Add EVPN/BGP protocol for VXLAN control plane
+    return {
+        "devices": devices, 
+        "links": links,
+        "vxlan_enabled": True,
+        "evpn_enabled": True,
+        "protocol": "BGP"
+    }
@@ -1,6 +1,5 @@
-import ipaddress
 from typing import List, Dict, Set, Tuple
-import re
+from ConfigTree import parse_config
 
 class NetworkValidator:
     def __init__(self, devices: List[Dict], links: List[Dict]):
@@ -8,10 +7,67 @@ class NetworkValidator:
         self.links = links
         self.validation_results = []
         self.test_results = []
+        self._parsed_configs = {}
+        self._build_indices()
+
+    def _parsed(self, device):
+        """Parsed config of a device (see ConfigTree), looked up once per validation run."""
+        key = id(device)
+        if key not in self._parsed_configs:
+            self._parsed_configs[key] = parse_config(device.get("config", ""))
+        return self._parsed_configs[key]
+
+    def _build_indices(self):
+        """Index the model once so every check is linear in devices + links + interfaces.
+
+        device_map: name -> device (the first one if names are duplicated)
+        device_order: name -> position in device_map
+        peer_interfaces: name -> {peer name: [interfaces with link_to == peer], in order}
+        link_interfaces: per link (aligned with self.links), the interface of each endpoint or None
+        """
+        self.device_map = {}
+        for device in self.devices:
+            self.device_map.setdefault(device.get("name"), device)
+        # Model order of the devices, so per-link results keep the order of the device list
+        self.device_order = {name: i for i, name in enumerate(self.device_map)}
+        self.peer_interfaces = {}
+        interfaces_by_name = {}
+        for name, device in self.device_map.items():
+            peers = self.peer_interfaces[name] = {}
+            by_name = interfaces_by_name[name] = {}
+            for iface in device.get("interfaces", []):
+                by_name.setdefault(iface.get("name"), iface)
+                if iface.get("link_to"):
+                    peers.setdefault(iface["link_to"], []).append(iface)
+
+        self.link_interfaces = []
+        # Links without recorded interface names take the next unused interface towards the peer
+        next_peer_interface = {}
+        for link in self.links:
+            endpoints = link.get("endpoints", [])
+            recorded = link.get("interfaces") or []
+            ifaces = []
+            for position, name in enumerate(endpoints):
+                if name not in self.device_map:
+                    ifaces.append(None)
+                    continue
+                iface_name = recorded[position] if position < len(recorded) else None
+                iface = interfaces_by_name[name].get(iface_name) if iface_name else None
+                if iface is None and len(endpoints) == 2:
+                    peer = endpoints[1 - position]
+                    candidates = self.peer_interfaces[name].get(peer, [])
+                    used = next_peer_interface.get((name, peer), 0)
+                    if used < len(candidates):
+                        iface = candidates[used]
+                        next_peer_interface[(name, peer)] = used + 1
+                ifaces.append(iface)
+            self.link_interfaces.append(ifaces)
 
     def validate_topology(self) -> List[Dict]:
         """Run all validation checks and return results."""
         self.validation_results = []
+        # Configs may have been edited since the last run
+        self._parsed_configs = {}
         
         # Run all validation checks
         self._check_duplicate_ips()
@@ -59,85 +115,79 @@ class NetworkValidator:
     def _check_missing_routes(self):
         """Check for missing routes in routing protocols."""
         for device in self.devices:
-            config = device.get("config", "")
-            if "router ospf" in config or "router eigrp" in config or "router bgp" in config:
-                # Get all interfaces with IPs
-                device_ips = []
+            parsed = self._parsed(device)
+            if "OSPF" in parsed.protocols():
+                advertised = {network.split()[0] for network in parsed.networks("OSPF")}
+                ospf_interfaces = set(parsed.ospf_interfaces())
                 for interface in device.get("interfaces", []):
-                    if "ip" in interface:
-                        device_ips.append(interface["ip"].split("/")[0])
-                
-                # Check if all IPs are included in routing protocol
-                for ip in device_ips:
-                    network = ipaddress.ip_network(ip + "/24", strict=False)  # Assuming /24 for now
-                    if "router ospf" in config and f"network {network.network_address}" not in config:
-                        self.validation_results.append({
-                            "type": "warning",
-                            "category": "Routing",
-                            "message": f"Device {device['name']} has OSPF enabled but network {network} is not advertised"
-                        })
+                    if "ip" in interface and interface.get("name") not in ospf_interfaces:
+                        # Assuming /24 for now: the network address is the first three octets + .0
+                        network_address = interface["ip"].split("/")[0].rsplit(".", 1)[0] + ".0"
+                        if network_address not in advertised:
+                            network = f"{network_address}/24"
+                            self.validation_results.append({
+                                "type": "warning",
+                                "category": "Routing",
+                                "message": f"Device {device['name']} has OSPF enabled but network {network} is not advertised"
+                            })
 
     def _check_vlan_consistency(self):
         """Check VLAN consistency across switches."""
         vlan_map = {}
-        for device in self.devices:
+        first_trunk_port = {}
+        for device in self.device_map.values():
             if device.get("type") == "switch":
-                config = device.get("config", "")
-                vlans = re.findall(r"vlan (\d+)", config)
-                for vlan in vlans:
-                    if vlan in vlan_map:
-                        vlan_map[vlan].append(device["name"])
-                    else:
-                        vlan_map[vlan] = [device["name"]]
-        
+                parsed = self._parsed(device)
+                for vlan in parsed.vlans():
+                    vlan_map.setdefault(vlan, []).append(device["name"])
+                if parsed.trunk_ports():
+                    first_trunk_port[device["name"]] = parsed.trunk_ports()[0]
+
         # Check if VLANs are consistently defined across connected switches
         for link in self.links:
             if link.get("link_type") == "ethernet":
-                endpoints = link["endpoints"]
-                for device in self.devices:
-                    if device["name"] in endpoints and device.get("type") == "switch":
-                        config = device.get("config", "")
-                        trunk_ports = re.findall(r"interface (.*?)\n.*?switchport mode trunk", config, re.DOTALL)
-                        if trunk_ports:
-                            self.validation_results.append({
-                                "type": "info",
-                                "category": "VLAN",
-                                "message": f"Trunk port {trunk_ports[0]} on {device['name']} should have consistent VLANs with connected switch"
-                            })
+                for name in sorted(link["endpoints"], key=lambda name: self.device_order.get(name, -1)):
+                    if name in first_trunk_port:
+                        self.validation_results.append({
+                            "type": "info",
+                            "category": "VLAN",
+                            "message": f"Trunk port {first_trunk_port[name]} on {name} should have consistent VLANs with connected switch"
+                        })
 
     def _check_interface_consistency(self):
         """Check interface configuration consistency."""
-        for link in self.links:
-            endpoints = link["endpoints"]
-            for device in self.devices:
-                if device["name"] in endpoints:
-                    config = device.get("config", "")
-                    interface = next((iface for iface in device.get("interfaces", []) 
-                                   if any(endpoint in iface.get("link_to", "") for endpoint in endpoints)), None)
-                    if interface and "no shutdown" not in config:
-                        self.validation_results.append({
-                            "type": "warning",
-                            "category": "Interface",
-                            "message": f"Interface {interface['name']} on {device['name']} is not enabled (no shutdown missing)"
-                        })
+        enabled = {}
+        for link, ifaces in zip(self.links, self.link_interfaces):
+            for name, interface in sorted(zip(link["endpoints"], ifaces), key=lambda pair: self.device_order.get(pair[0], -1)):
+                if interface is None:
+                    continue
+                if name not in enabled:
+                    enabled[name] = "no shutdown" in self.device_map[name].get("config", "")
+                if not enabled[name]:
+                    self.validation_results.append({
+                        "type": "warning",
+                        "category": "Interface",
+                        "message": f"Interface {interface['name']} on {name} is not enabled (no shutdown missing)"
+                    })
 
     def _check_protocol_configuration(self):
         """Check protocol-specific configurations."""
         for device in self.devices:
-            config = device.get("config", "")
-            
-            # Check OSPF configuration
-            if "router ospf" in config:
-                if not re.search(r"network \d+\.\d+\.\d+\.\d+ \d+\.\d+\.\d+\.\d+ area \d+", config):
+            parsed = self._parsed(device)
+            protocols = parsed.protocols()
+
+            # Check OSPF configuration (IPv4 network statements with an area, or OSPF interfaces)
+            if "OSPF" in protocols:
+                if not any(" area " in network for network in parsed.networks("OSPF")) and not parsed.ospf_interfaces():
                     self.validation_results.append({
                         "type": "warning",
                         "category": "OSPF",
                         "message": f"Device {device['name']} has OSPF enabled but no networks are configured"
                     })
-            
+
             # Check BGP configuration
-            if "router bgp" in config:
-                if not re.search(r"neighbor \d+\.\d+\.\d+\.\d+ remote-as \d+", config):
+            if "BGP" in protocols:
+                if not parsed.neighbors():
                     self.validation_results.append({
                         "type": "warning",
                         "category": "BGP",
@@ -4,6 +4,7 @@ import networkx as nx
 import ipaddress
 import math
 import random
+from ConfigTree import parse_config
 
 def draw_network_topology_plotly(mcp_model, dark_mode=False, layout_type='spring', node_status=None):
     """
@@ -101,13 +102,8 @@ def draw_network_topology_plotly(mcp_model, dark_mode=False, layout_type='spring
         # Add any protocol information
         config = device.get("config", "")
         if isinstance(config, str):
-            protocols = []
-            if "ospf" in config.lower():
-                protocols.append("OSPF")
-            if "eigrp" in config.lower():
-                protocols.append("EIGRP")
-            if "bgp" in config.lower():
-                protocols.append("BGP")
+            # Parsed once per distinct config and shared across reruns (see ConfigTree)
+            protocols = [protocol for protocol in parse_config(config).protocols() if protocol != "Static"]
             
             if protocols:
                 hover_info += f"<br>---<br><b>Protocols:</b> {', '.join(protocols)}<br>"
@@ -0,0 +1,78 @@
+from itertools import combinations
+
+# --- Compact link patterns ---
+# A full mesh over N devices has N·(N-1)/2 links. Instead of materializing one dict per link,
+# generators store the rule ({"pattern": "full_mesh", "members": [...]}) in the topology's
+# 'link_patterns' list. The pattern is plain JSON (safe for the LLM cache, graph state and
+# session state) and is only expanded, lazily, by consumers that need individual links.
+LINK_PATTERNS = ["full_mesh"]
+
+def full_mesh_pattern(members, link_type="ethernet"):
+    """Compact stand-in for a full mesh of links between all `members` (device names)."""
+    return {"pattern": "full_mesh", "members": list(members), "link_type": link_type}
+
+def pattern_link_count(pattern):
+    """Number of links a pattern stands for, without expanding it."""
+    if pattern.get("pattern") == "full_mesh":
+        n = len(pattern.get("members", []))
+        return n * (n - 1) // 2
+    raise ValueError(f"Unknown link pattern '{pattern.get('pattern')}'. Expected one of: {', '.join(LINK_PATTERNS)}")
+
+def iter_pattern_links(pattern):
+    """Yield the link dicts a pattern stands for, one at a time (fresh dicts, safe to mutate)."""
+    if pattern.get("pattern") == "full_mesh":
+        link_type = pattern.get("link_type", "ethernet")
+        for a, b in combinations(pattern.get("members", []), 2):
+            yield {"endpoints": [a, b], "link_type": link_type}
+        return
+    raise ValueError(f"Unknown link pattern '{pattern.get('pattern')}'. Expected one of: {', '.join(LINK_PATTERNS)}")
+
+def iter_links(topology):
+    """Yield every link of a topology: explicit 'links' first, then expanded 'link_patterns'."""
+    yield from topology.get("links", [])
+    for pattern in topology.get("link_patterns", []):
+        yield from iter_pattern_links(pattern)
+
+def count_links(topology):
+    """Total number of links (explicit + patterns) without expanding anything."""
+    return len(topology.get("links", [])) + sum(pattern_link_count(p) for p in topology.get("link_patterns", []))
+
+def has_links(topology):
+    """True if the topology has at least one explicit or pattern link."""
+    if topology.get("links"):
+        return True
+    return any(pattern_link_count(p) for p in topology.get("link_patterns", []))
+
+def concrete_topology(topology):
+    """Shallow copy of a topology whose 'links' include the expanded pattern links.
+
+    The original keeps its compact 'link_patterns'; explicit link dicts (and everything else)
+    are shared with the copy, so annotating them on the copy annotates the original too.
+
+    Args:
+        topology: Topology dictionary with 'links' and optionally 'link_patterns'
+
+    Returns:
+        New topology dictionary without 'link_patterns'
+    """
+    concrete = {key: value for key, value in topology.items() if key != "link_patterns"}
+    concrete["links"] = list(iter_links(topology))
+    return concrete
+
+def expand_link_patterns(topology):
+    """Materialize all pattern links into topology['links'] (in place) and drop 'link_patterns'.
+
+    Only needed before consumers that annotate individual links in place, such as IP assignment.
+
+    Args:
+        topology: Topology dictionary with 'links' and optionally 'link_patterns'
+
+    Returns:
+        The same topology dictionary, for chaining
+    """
+    patterns = topology.pop("link_patterns", None)
+    if patterns:
+        links = topology.setdefault("links", [])
+        for pattern in patterns:
+            links.extend(iter_pattern_links(pattern))
+    return topology
@@ -0,0 +1,63 @@
+"""Benchmark for link addressing at fabric scale.
+
+For each link count this times the integer subnet allocator on its own (numbering + string
+formatting) and the full assign_ip_addresses() pass over a ring topology with that many links.
+With --family ipv6 or dual, the allocator times /127 numbering and the pass adds IPv6 addresses.
+
+Usage:
+    python benchmarks/bench_addressing.py
+    python benchmarks/bench_addressing.py --sizes 1000 10000 100000 --family dual --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NetworkAddressing import IPV6_NETWORK, SubnetAllocator, assign_ip_addresses, ipv6_pools
+from NetworkTemplates import create_template_topology
+
+def bench_size(n, family="ipv4"):
+    if family == "ipv4":
+        network, prefix = "10.0.0.0/8", 30
+    else:
+        network, prefix = ipv6_pools(IPV6_NETWORK)[1], 127
+    start = time.perf_counter()
+    allocator = SubnetAllocator(network, prefix)
+    subnets = allocator.allocate(n)
+    allocator.subnet_strings(subnets)
+    allocator.host_strings(subnets, limit=2)
+    allocate_s = time.perf_counter() - start
+
+    topology = create_template_topology("ring", n)
+    start = time.perf_counter()
+    assign_ip_addresses(topology["devices"], topology["links"], address_family=family)
+    assign_s = time.perf_counter() - start
+
+    return {
+        "links": n,
+        "allocate_ms": round(allocate_s * 1000, 2),
+        "assign_ms": round(assign_s * 1000, 2),
+        "assign_links_per_s": round(n / assign_s) if assign_s else 0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--family", choices=["ipv4", "ipv6", "dual"], default="ipv4", help="Address family to number")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = [bench_size(n, args.family) for n in args.sizes]
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    print(f"{'links':>8}{'allocate ms':>14}{'assign ms':>12}{'links/s':>12}")
+    for row in report:
+        print(f"{row['links']:>8}{row['allocate_ms']:>14.2f}{row['assign_ms']:>12.2f}{row['assign_links_per_s']:>12}")
+
+if __name__ == "__main__":
+    main()
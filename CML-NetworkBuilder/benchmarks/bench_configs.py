@@ -0,0 +1,67 @@
+"""Benchmark for config rendering throughput.
+
+Builds addressed ring topologies and times generate_device_configs() for every routing protocol,
+reporting configs rendered per second. Each run starts from a fresh copy of the addressed model.
+--workers renders across a process pool (default: generate_device_configs decides by model size).
+
+Usage:
+    python benchmarks/bench_configs.py
+    python benchmarks/bench_configs.py --nodes 100 500 2000 --family dual --repeat 5 --json
+    python benchmarks/bench_configs.py --nodes 10000 --workers 8 --chunksize 256
+    python benchmarks/bench_configs.py --exact
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NetworkAddressing import ADDRESS_FAMILIES, assign_ip_addresses
+from NetworkConfigGenerator import generate_device_configs
+from NetworkTemplates import create_template_topology
+
+PROTOCOLS = ["OSPF", "EIGRP", "BGP", "STATIC"]
+
+def bench_nodes(nodes, family, repeat, workers=None, chunksize=256, summarize=True):
+    topology = create_template_topology("ring", nodes)
+    assign_ip_addresses(topology["devices"], topology["links"], address_family=family)
+
+    row = {"nodes": nodes, "links": len(topology["links"])}
+    for protocol in PROTOCOLS:
+        best = None
+        for _ in range(repeat):
+            devices = copy.deepcopy(topology["devices"])
+            start = time.perf_counter()
+            generate_device_configs(devices, topology["links"], requested_protocol=protocol, workers=workers, chunksize=chunksize, summarize=summarize)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        row[f"{protocol.lower()}_ms"] = round(best * 1000, 2)
+        row[f"{protocol.lower()}_per_s"] = round(nodes / best) if best else None
+    return row
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--family", choices=ADDRESS_FAMILIES, default="ipv4", help="Address family of the model")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per protocol (best is reported)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (1 renders serially)")
+    parser.add_argument("--chunksize", type=int, default=256, help="Devices per worker task")
+    parser.add_argument("--exact", action="store_true", help="One network statement per link (no summarization)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = [bench_nodes(n, args.family, args.repeat, args.workers, args.chunksize, not args.exact) for n in args.nodes]
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    print(f"{'nodes':>7}" + "".join(f"{protocol + ' ms':>12}{'cfg/s':>10}" for protocol in PROTOCOLS))
+    for row in report:
+        print(f"{row['nodes']:>7}" + "".join(
+            f"{row[protocol.lower() + '_ms']:>12.2f}{row[protocol.lower() + '_per_s']:>10}" for protocol in PROTOCOLS))
+
+if __name__ == "__main__":
+    main()
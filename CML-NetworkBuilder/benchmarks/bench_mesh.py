@@ -0,0 +1,83 @@
+"""Memory/time benchmark for compact mesh link patterns versus materialized link lists.
+
+For each mesh size N this builds the 'N sites in a mesh' topology both ways and reports build
+time, peak traced memory, JSON size (what the LLM cache and session state hold) and the cost of
+streaming every link through iter_links() without keeping them.
+
+Usage:
+    python benchmarks/bench_mesh.py
+    python benchmarks/bench_mesh.py --sizes 50 200 1000 --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NetworkParser import parse_network_text
+from TopologyPatterns import count_links, expand_link_patterns, iter_links
+
+def measure(build):
+    """Run build() under tracemalloc; returns (result, seconds, peak bytes)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+def stream_links(topology):
+    count = 0
+    for _ in iter_links(topology):
+        count += 1
+    return count
+
+def bench_size(n):
+    request = f"{n} sites in a mesh"
+    compact, compact_s, compact_peak = measure(lambda: parse_network_text(request))
+    expanded, expanded_s, expanded_peak = measure(lambda: expand_link_patterns(parse_network_text(request)))
+    streamed, stream_s, stream_peak = measure(lambda: stream_links(compact))
+    assert streamed == count_links(compact) == len(expanded["links"])
+    return {
+        "n": n,
+        "links": streamed,
+        "compact": {
+            "build_ms": round(compact_s * 1000, 3),
+            "peak_kib": round(compact_peak / 1024, 1),
+            "json_kib": round(len(json.dumps(compact)) / 1024, 1)
+        },
+        "materialized": {
+            "build_ms": round(expanded_s * 1000, 3),
+            "peak_kib": round(expanded_peak / 1024, 1),
+            "json_kib": round(len(json.dumps(expanded)) / 1024, 1)
+        },
+        "stream_all_links": {
+            "ms": round(stream_s * 1000, 3),
+            "peak_kib": round(stream_peak / 1024, 1)
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = [bench_size(n) for n in args.sizes]
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    print(f"{'N':>6}{'links':>10}{'compact ms':>12}{'compact KiB':>13}{'JSON KiB':>10}"
+          f"{'full ms':>10}{'full KiB':>11}{'JSON KiB':>10}{'stream ms':>11}{'stream KiB':>12}")
+    for row in report:
+        c, m, s = row["compact"], row["materialized"], row["stream_all_links"]
+        print(f"{row['n']:>6}{row['links']:>10}{c['build_ms']:>12.3f}{c['peak_kib']:>13.1f}{c['json_kib']:>10.1f}"
+              f"{m['build_ms']:>10.3f}{m['peak_kib']:>11.1f}{m['json_kib']:>10.1f}{s['ms']:>11.3f}{s['peak_kib']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Throughput benchmark for the offline request parser (NetworkParser.parse_network_text).
+
+Parses every request of a corpus `--repeat` times and reports requests per second, per-request
+latency percentiles and how many requests ended in each kind of result. No LLM is involved.
+
+Usage:
+    python benchmarks/bench_parser.py
+    python benchmarks/bench_parser.py --repeat 2000 --json
+    python benchmarks/bench_parser.py --corpus tickets.txt
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NetworkParser import parse_network_text
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_corpus(path):
+    # One request per line; a written-out \n (backslash, n) is a line break inside the request
+    with open(path, "r") as f:
+        return [line.strip().replace("\\n", "\n") for line in f if line.strip() and not line.strip().startswith("#")]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+def result_kind(result):
+    if "error" in result:
+        return "error"
+    if "devices" in result:
+        return "topology"
+    return "protocol_only"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(BENCH_DIR, "requests_corpus.txt"))
+    parser.add_argument("--repeat", type=int, default=500, help="Number of passes over the corpus")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    kinds = {}
+    for text in corpus:
+        kind = result_kind(parse_network_text(text))
+        kinds[kind] = kinds.get(kind, 0) + 1
+
+    latencies = []
+    bench_start = time.perf_counter()
+    for _ in range(args.repeat):
+        for text in corpus:
+            start = time.perf_counter()
+            parse_network_text(text)
+            latencies.append(time.perf_counter() - start)
+    wall = time.perf_counter() - bench_start
+
+    report = {
+        "corpus_size": len(corpus),
+        "requests": len(latencies),
+        "wall_seconds": round(wall, 4),
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "results": kinds,
+        "latency_us": {
+            "mean": round(statistics.mean(latencies) * 1e6, 2),
+            "p50": round(percentile(latencies, 50) * 1e6, 2),
+            "p95": round(percentile(latencies, 95) * 1e6, 2),
+            "max": round(max(latencies) * 1e6, 2)
+        }
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    latency = report["latency_us"]
+    print(f"Requests: {report['requests']} ({report['corpus_size']} unique)  wall: {report['wall_seconds']:.3f}s  throughput: {report['throughput_rps']} req/s")
+    print(f"Results per corpus pass: {kinds}")
+    print(f"Latency us  mean {latency['mean']:.2f}  p50 {latency['p50']:.2f}  p95 {latency['p95']:.2f}  max {latency['max']:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Headless end-to-end latency benchmark for the topology generation pipeline.
+
+Replays a corpus of requests through agent -> normalization -> assign_ip_addresses ->
+generate_device_configs -> NetworkValidator and reports per-stage timings and throughput.
+By default the agent uses the offline cassette backend, so no network access or API key is needed.
+
+Usage:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --repeat 5 --no-fast-path
+    python benchmarks/bench_pipeline.py --backend cassette --record   # record real responses once
+"""
+import argparse
+import copy
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LLMBackends import LLM_BACKENDS, create_chat_model
+from NetworkAgent import (
+    SYSTEM_PROMPT, STRUCTURED_SYSTEM_PROMPT, build_agent_runnable, build_network_graph,
+    cached_agent_node, normalize_agent_output
+)
+from NetworkTemplates import create_template_topology, detect_topology_pattern
+from TopologyPatterns import expand_link_patterns, has_links
+from NetworkAddressing import assign_ip_addresses
+from NetworkConfigGenerator import generate_device_configs
+from NetworkValidator import NetworkValidator
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = ["agent", "normalize", "assign_ips", "configs", "validate"]
+
+def load_corpus(path):
+    # One request per line; a written-out \n (backslash, n) is a line break inside the request
+    with open(path, "r") as f:
+        return [line.strip().replace("\\n", "\n") for line in f if line.strip() and not line.strip().startswith("#")]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+def run_request(graph, text):
+    """Run one request through every stage; returns ({stage: seconds}, route, error or None)."""
+    timings = {}
+
+    start = time.perf_counter()
+    result = graph.invoke({"input": text})
+    timings["agent"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    topology = normalize_agent_output(result.get("output"))
+    if topology is None or not has_links(topology):
+        # Same fallback the chat UI applies when the agent output is unusable
+        pattern_result = detect_topology_pattern(text)
+        if pattern_result:
+            topology_type, num_devices, protocol, device_type = pattern_result
+            topology = create_template_topology(topology_type, num_devices, protocol=protocol, device_type=device_type)
+    timings["normalize"] = time.perf_counter() - start
+    if topology is None:
+        return timings, result.get("route"), "no topology"
+
+    # Later stages mutate the model in place; keep cached/fast-path outputs pristine between repeats
+    topology = expand_link_patterns(copy.deepcopy(topology))
+    devices = topology["devices"]
+    links = topology["links"]
+
+    start = time.perf_counter()
+    assign_ip_addresses(devices, links)
+    timings["assign_ips"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    generate_device_configs(devices, links, requested_protocol=topology.get("protocol"))
+    timings["configs"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    NetworkValidator(devices, links).validate_topology()
+    timings["validate"] = time.perf_counter() - start
+
+    return timings, result.get("route"), None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(BENCH_DIR, "requests_corpus.txt"))
+    parser.add_argument("--repeat", type=int, default=3, help="Number of passes over the corpus")
+    parser.add_argument("--backend", choices=LLM_BACKENDS, default="cassette")
+    parser.add_argument("--cassette", default=os.path.join(BENCH_DIR, "cassettes", "agent.json"))
+    parser.add_argument("--record", action="store_true", help="Answer cassette misses with ChatOpenAI and record them")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--agent-mode", choices=["tool_agent", "structured"], default="tool_agent")
+    parser.add_argument("--no-fast-path", action="store_true", help="Send every request to the agent")
+    parser.add_argument("--speculative", action="store_true", help="Race the offline parser against the agent")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    llm = create_chat_model(args.backend, model=args.model, temperature=0, cassette_path=args.cassette, record=args.record)
+    system_prompt = STRUCTURED_SYSTEM_PROMPT if args.agent_mode == "structured" else SYSTEM_PROMPT
+    agent_runnable = build_agent_runnable(llm, system_prompt, agent_mode=args.agent_mode, verbose=False)
+    # No response cache: every pass should exercise the agent
+    graph = build_network_graph(
+        cached_agent_node(agent_runnable, None, args.model, 0, system_prompt, args.backend),
+        speculative=args.speculative,
+        fast_path=not args.no_fast_path
+    )
+
+    stage_times = {stage: [] for stage in STAGES}
+    request_times = []
+    routes = {}
+    errors = []
+    bench_start = time.perf_counter()
+    for _ in range(args.repeat):
+        for text in corpus:
+            try:
+                timings, route, error = run_request(graph, text)
+            except Exception as e:
+                errors.append({"request": text, "error": f"{type(e).__name__}: {e}"})
+                continue
+            routes[route] = routes.get(route, 0) + 1
+            if error:
+                errors.append({"request": text, "error": error})
+            for stage, seconds in timings.items():
+                stage_times[stage].append(seconds)
+            request_times.append(sum(timings.values()))
+    wall = time.perf_counter() - bench_start
+
+    report = {
+        "requests": len(request_times),
+        "wall_seconds": round(wall, 4),
+        "throughput_rps": round(len(request_times) / wall, 2) if wall else 0.0,
+        "routes": routes,
+        "errors": errors,
+        "stages": {
+            stage: {
+                "count": len(times),
+                "mean_ms": round(statistics.mean(times) * 1000, 3),
+                "p50_ms": round(percentile(times, 50) * 1000, 3),
+                "p95_ms": round(percentile(times, 95) * 1000, 3),
+                "max_ms": round(max(times) * 1000, 3)
+            }
+            for stage, times in stage_times.items() if times
+        }
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    print(f"Requests: {report['requests']}  wall: {report['wall_seconds']:.3f}s  throughput: {report['throughput_rps']} req/s")
+    print(f"Routes: {routes}")
+    print(f"{'stage':<12}{'count':>7}{'mean ms':>12}{'p50 ms':>12}{'p95 ms':>12}{'max ms':>12}")
+    for stage, row in report["stages"].items():
+        print(f"{stage:<12}{row['count']:>7}{row['mean_ms']:>12.3f}{row['p50_ms']:>12.3f}{row['p95_ms']:>12.3f}{row['max_ms']:>12.3f}")
+    for error in errors:
+        print(f"! {error['request']}: {error['error']}")
+
+if __name__ == "__main__":
+    main()
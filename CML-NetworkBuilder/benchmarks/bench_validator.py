@@ -0,0 +1,81 @@
+"""Benchmark for pre-deployment validation at template scale.
+
+Builds addressed, configured topologies and times NetworkValidator: building its indices (the
+constructor) and every check of validate_topology() on its own. Router models get routing
+configs; switch models exercise the VLAN/trunk checks.
+
+Usage:
+    python benchmarks/bench_validator.py
+    python benchmarks/bench_validator.py --sizes 100 1000 10000 --topology star --device-type switch --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NetworkAddressing import assign_ip_addresses
+from NetworkConfigGenerator import generate_device_configs
+from NetworkTemplates import create_template_topology
+from NetworkValidator import NetworkValidator
+
+# Report column -> NetworkValidator check
+CHECKS = {
+    "dup_ips": "_check_duplicate_ips",
+    "dup_names": "_check_duplicate_device_names",
+    "routes": "_check_missing_routes",
+    "vlans": "_check_vlan_consistency",
+    "interfaces": "_check_interface_consistency",
+    "protocols": "_check_protocol_configuration",
+}
+
+def build_model(topology_type, nodes, device_type, protocol):
+    topology = create_template_topology(topology_type, nodes, protocol=protocol, device_type=device_type)
+    assign_ip_addresses(topology["devices"], topology["links"])
+    generate_device_configs(topology["devices"], topology["links"], requested_protocol=protocol)
+    return topology["devices"], topology["links"]
+
+def bench_size(nodes, topology_type, device_type, protocol, repeat):
+    devices, links = build_model(topology_type, nodes, device_type, protocol)
+    row = {"nodes": len(devices), "links": len(links)}
+    timings = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        validator = NetworkValidator(devices, links)
+        elapsed = {"index": time.perf_counter() - start}
+        validator.validation_results = []
+        for column, check in CHECKS.items():
+            start = time.perf_counter()
+            getattr(validator, check)()
+            elapsed[column] = time.perf_counter() - start
+        elapsed["total"] = sum(elapsed.values())
+        for key, seconds in elapsed.items():
+            timings[key] = min(seconds, timings.get(key, seconds))
+    row["results"] = len(validator.validation_results)
+    row.update({f"{column}_ms": round(seconds * 1000, 2) for column, seconds in timings.items()})
+    return row
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--topology", default="ring", help="Template topology (ring, star, mesh, bus, line)")
+    parser.add_argument("--device-type", default="router", help="Device type of the template")
+    parser.add_argument("--protocol", default="OSPF", help="Routing protocol of the configs")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size (best is reported)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = [bench_size(n, args.topology, args.device_type, args.protocol, args.repeat) for n in args.sizes]
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    columns = [key for key in report[0] if key.endswith("_ms")]
+    print(f"{'nodes':>7}{'links':>8}{'results':>9}" + "".join(f"{column[:-3] + ' ms':>14}" for column in columns))
+    for row in report:
+        print(f"{row['nodes']:>7}{row['links']:>8}{row['results']:>9}" + "".join(f"{row[column]:>14.2f}" for column in columns))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark for VXLAN fabric addressing with thousands of VTEPs.
+
+Builds multi-site VXLAN topologies (one leaf VTEP and one overlay link per site) and times VTEP
+detection, the full assign_ip_addresses() pass and the incremental IPAM (first run and a no-op
+re-run), all with a /16 loopback pool.
+
+Usage:
+    python benchmarks/bench_vxlan.py
+    python benchmarks/bench_vxlan.py --sites 1000 5000 20000 --loopbacks 10.255.0.0/16 --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NetworkAddressing import VXLANFabricAllocator, assign_ip_addresses, find_vtep_devices
+from NetworkIPAM import update_ip_addresses
+from NetworkTemplates import create_vxlan_multisite_topology
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, round((time.perf_counter() - start) * 1000, 2)
+
+def bench_sites(sites, loopback_network):
+    fabric = VXLANFabricAllocator(loopback_network)
+
+    topology = create_vxlan_multisite_topology(sites)
+    vteps, detect_ms = _timed(find_vtep_devices, topology["devices"], topology["links"])
+    _, assign_ms = _timed(assign_ip_addresses, topology["devices"], topology["links"], fabric=fabric)
+
+    topology = create_vxlan_multisite_topology(sites)
+    _, ipam_ms = _timed(update_ip_addresses, topology, fabric=fabric)
+    _, ipam_rerun_ms = _timed(update_ip_addresses, topology, fabric=fabric)
+
+    return {
+        "sites": sites,
+        "devices": len(topology["devices"]),
+        "links": len(topology["links"]),
+        "vteps": len(vteps),
+        "detect_ms": detect_ms,
+        "assign_ms": assign_ms,
+        "ipam_ms": ipam_ms,
+        "ipam_rerun_ms": ipam_rerun_ms
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--loopbacks", default="10.255.0.0/16", help="VTEP loopback pool")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = [bench_sites(n, args.loopbacks) for n in args.sites]
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    print(f"{'sites':>7}{'devices':>9}{'vteps':>7}{'detect ms':>11}{'assign ms':>11}{'ipam ms':>10}{'rerun ms':>10}")
+    for row in report:
+        print(f"{row['sites']:>7}{row['devices']:>9}{row['vteps']:>7}{row['detect_ms']:>11.2f}"
+              f"{row['assign_ms']:>11.2f}{row['ipam_ms']:>10.2f}{row['ipam_rerun_ms']:>10.2f}")
+
+if __name__ == "__main__":
+    main()